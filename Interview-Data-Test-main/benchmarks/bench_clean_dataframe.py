@@ -0,0 +1,115 @@
+"""
+Benchmark ETLPipeline.clean_dataframe on a generated purchases frame.
+
+Compares the previous per-column loop (kept below as legacy_clean_dataframe)
+with the rule-driven CleaningPlan and prints rows/sec for each.
+
+Usage: python benchmarks/bench_clean_dataframe.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.etl_cleaning import get_cleaning_plan
+
+
+def legacy_clean_dataframe(df):
+    """clean_dataframe as it was before the rule table, kept for comparison."""
+    for column in df.columns:
+
+        if df[column].dtype in ['float64', 'int64']:
+            df.loc[:, column] = df[column].fillna(0)
+
+        if column in ['registration_date', 'birth_date', 'purchase_date', 'shipping_date', 'delivery_date', 'return_date', 'last_login', 'last_update']:
+            df.loc[:, column] = pd.to_datetime(df[column], errors='coerce')
+
+        if column in ['quantity', 'unit_price', 'refund_amount']:
+            df.loc[:, column] = pd.to_numeric(df[column], errors='coerce')
+            df.loc[:, column] = df[column].abs()
+
+        if column == 'phone':
+            df.loc[:, column] = df[column].str.replace(r'\D', '', regex=True)
+
+        if column == 'product_id':
+            df.loc[:, 'product_id'] = pd.to_numeric(df['product_id'], errors='coerce').astype('Int64')
+
+        if df[column].dtype == "object":
+            df.loc[:, column] = df[column].astype(str).str.lower().str.strip()
+            df.loc[:, column] = df[column].fillna("Unknown")
+
+    return df
+
+
+def generate_purchases_frame(rows, seed=42):
+    """Build a purchases frame with the same shape and defects as the source table."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('today').normalize() - pd.to_timedelta(rng.integers(0, 730, rows), unit='D')
+    purchase_dates = pd.Series(days.strftime('%Y-%m-%d'))
+    shipping_dates = pd.Series((days + pd.to_timedelta(rng.integers(1, 6, rows), unit='D')).strftime('%Y-%m-%d'))
+    delivery_dates = pd.Series((days + pd.to_timedelta(rng.integers(2, 16, rows), unit='D')).strftime('%Y-%m-%d'))
+    delivery_dates[rng.random(rows) < 0.05] = None
+
+    quantity = rng.integers(1, 11, rows)
+    unit_price = np.round(rng.uniform(5, 1000, rows), 2)
+    unit_price[rng.random(rows) < 0.05] *= -1
+
+    product_ids = rng.integers(1, 101, rows).astype(str).astype(object)
+
+    def pick(values, null_rate=0.0):
+        picked = pd.Series(np.array(values, dtype=object)[rng.integers(0, len(values), rows)])
+        if null_rate:
+            picked[rng.random(rows) < null_rate] = None
+        return picked
+
+    return pd.DataFrame({
+        'purchase_id': np.arange(1, rows + 1),
+        'client_id': rng.integers(1, 51, rows),
+        'customer_id': rng.integers(1, 201, rows),
+        'product_id': product_ids,
+        'purchase_date': purchase_dates,
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'total_amount': np.round(quantity * unit_price, 2),
+        'payment_method': pick(['Credit Card', 'PayPal', 'Bank Transfer', 'Cash on Delivery', 'Gift Card'], 0.02),
+        'payment_status': pick(['Paid', 'Pending', 'Failed', 'Refunded', 'Partially Paid']),
+        'shipping_address': pick([f"{n} Main Street" for n in range(500)], 0.02),
+        'shipping_city': pick([f"City {n}" for n in range(300)]),
+        'shipping_state': pick([f"State {n}" for n in range(50)]),
+        'shipping_zip': pick([f"{n:05d}" for n in range(1000)], 0.1),
+        'shipping_country': pick([f"Country {n}" for n in range(200)]),
+        'shipping_date': shipping_dates,
+        'delivery_date': delivery_dates,
+        'notes': pick(['Leave at the door.', 'Call before delivery.', 'Gift wrap.'], 0.8),
+        'last_update': pd.Timestamp('today').normalize().date()
+    })
+
+
+def measure(label, clean, df):
+    start = time.perf_counter()
+    clean(df.copy())
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.2f}s  {len(df) / elapsed:>12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark clean_dataframe on a generated purchases frame')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of purchases to generate')
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} purchases...")
+    df = generate_purchases_frame(args.rows)
+
+    before = measure('before', legacy_clean_dataframe, df)
+    after = measure('after', get_cleaning_plan('purchases').apply, df)
+    print(f"speedup    {before / after:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
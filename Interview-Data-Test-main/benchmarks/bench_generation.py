@@ -0,0 +1,50 @@
+"""
+Benchmark purchase generation in Insert_data.
+
+Times the row-by-row generate_purchases on a small sample and the
+vectorized generate_purchases_vectorized at each requested size, and
+prints rows/sec for both.
+
+Usage: python benchmarks/bench_generation.py [--rows 1000000 10000000] [--sample 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import Insert_data
+
+
+def measure(label, generate, rows):
+    start = time.perf_counter()
+    generate(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {rows:>12,} rows {elapsed:8.2f}s  {rows / elapsed:>12,.0f} rows/sec")
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark purchase generation')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000], help='Purchase counts for the vectorized generator')
+    parser.add_argument('--sample', type=int, default=20_000, help='Purchase count for the row-by-row generator')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pools = Insert_data.build_text_pools(args.seed)
+    clients_df = Insert_data.generate_clients_vectorized(rng, pools, 1_000)
+    customers_df = Insert_data.generate_customers_vectorized(rng, pools, clients_df, 50_000)
+    products_df = Insert_data.generate_products_vectorized(rng, pools, 5_000)
+
+    baseline = measure('row-by-row', lambda n: Insert_data.generate_purchases(clients_df, customers_df, products_df, n), args.sample)
+    for rows in args.rows:
+        rate = measure('vectorized', lambda n: Insert_data.generate_purchases_vectorized(rng, pools, clients_df, customers_df, products_df, n), rows)
+        print(f"{'speedup':<12} {rate / baseline:>12.1f}x")
+
+
+if __name__ == '__main__':
+    main()
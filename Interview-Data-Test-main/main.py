@@ -1,10 +1,22 @@
 from scripts.etl_template import ETLPipeline
+from scripts.etl_staging import STAGES
+import argparse
+import json
 import os
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 def main():
+    parser = argparse.ArgumentParser(description='Run the ETL pipeline from the source database into the data warehouse')
+    parser.add_argument('--from-stage', choices=STAGES, default='extract',
+                        help='Resume from the Parquet staging layer instead of the source database (transform or load)')
+    parser.add_argument('--stage-since', default=None,
+                        help='With --from-stage transform, only read staged rows last updated on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--resume', metavar='RUN_ID', default=None,
+                        help='Resume a failed checkpointed run, skipping the stages, tables and chunks it completed')
+    args = parser.parse_args()
+
     # Configuration
     config = {
         'source_server': os.getenv('DB_SERVER', 'localhost,1433'),
@@ -14,7 +26,42 @@ def main():
         'target_server': os.getenv('DW_SERVER', 'localhost,1433'),
         'target_database': os.getenv('DW_NAME', 'interview_dw'),
         'target_username': os.getenv('DW_USER', 'sa'),
-        'target_password': os.getenv('DW_PASSWORD', 'YourStrongPassword123!')
+        'target_password': os.getenv('DW_PASSWORD', 'YourStrongPassword123!'),
+        'incremental': os.getenv('ETL_INCREMENTAL', 'false').lower() == 'true',
+        'watermark_path': os.getenv('ETL_WATERMARK_PATH', os.path.join('data', 'watermarks.json')),
+        'chunk_size': int(os.getenv('ETL_CHUNK_SIZE', '0')) or None,
+        'extract_projection': os.getenv('ETL_EXTRACT_PROJECTION', 'true').lower() == 'true',
+        'extract_pushdown': os.getenv('ETL_EXTRACT_PUSHDOWN', 'true').lower() == 'true',
+        'parallel_extract': os.getenv('ETL_PARALLEL_EXTRACT', 'false').lower() == 'true',
+        'partition_tables': [name.strip() for name in os.getenv('ETL_PARTITION_TABLES', 'purchases,returns').split(',') if name.strip()],
+        'partition_rows': int(os.getenv('ETL_PARTITION_ROWS', '500000')),
+        'max_partitions': int(os.getenv('ETL_MAX_PARTITIONS', '8')),
+        'partition_method': os.getenv('ETL_PARTITION_METHOD', 'minmax'),
+        'pool_size': int(os.getenv('ETL_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('ETL_MAX_OVERFLOW', '10')),
+        'pool_pre_ping': os.getenv('ETL_POOL_PRE_PING', 'true').lower() == 'true',
+        'run_report_path': os.getenv('ETL_RUN_REPORT_PATH', os.path.join('logs', 'etl_run_report.json')),
+        'profile_stage': os.getenv('ETL_PROFILE_STAGE') or None,
+        'trace_memory': os.getenv('ETL_TRACE_MEMORY', 'false').lower() == 'true',
+        'load_mode': os.getenv('ETL_LOAD_MODE', 'upsert'),
+        'load_workers': int(os.getenv('ETL_LOAD_WORKERS', '3')),
+        'writer': os.getenv('ETL_WRITER', 'fast_executemany'),
+        'bulk_dir': os.getenv('ETL_BULK_DIR', os.path.join('data', 'bulk')),
+        'bulk_server_dir': os.getenv('ETL_BULK_SERVER_DIR') or None,
+        'key_index_path': os.getenv('ETL_KEY_INDEX_PATH', os.path.join('data', 'key_index.json')),
+        'fiscal_year_start_month': int(os.getenv('ETL_FISCAL_YEAR_START_MONTH', '7')),
+        'aggregate_mode': os.getenv('ETL_AGGREGATE_MODE', 'incremental'),
+        'quality_thresholds': json.loads(os.getenv('ETL_QUALITY_THRESHOLDS') or '{}'),
+        'quality_sample_rows': int(os.getenv('ETL_QUALITY_SAMPLE_ROWS', '0')) or None,
+        'compact_dtypes': os.getenv('ETL_COMPACT_DTYPES', 'true').lower() == 'true',
+        'staging': os.getenv('ETL_STAGING', 'false').lower() == 'true',
+        'raw_dir': os.getenv('ETL_RAW_DIR', os.path.join('data', 'raw')),
+        'processed_dir': os.getenv('ETL_PROCESSED_DIR', os.path.join('data', 'processed')),
+        'checkpoint': os.getenv('ETL_CHECKPOINT', 'false').lower() == 'true',
+        'checkpoint_dir': os.getenv('ETL_CHECKPOINT_DIR', os.path.join('data', 'checkpoints')),
+        'resume_run_id': args.resume,
+        'from_stage': args.from_stage,
+        'stage_since': args.stage_since
     }
 
     # Create an instance of ETLPipeline
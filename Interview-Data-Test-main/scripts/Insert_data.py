@@ -2,12 +2,21 @@ import pandas as pd
 import numpy as np
 from faker import Faker
 import random
-from datetime import datetime, timedelta
-import pyodbc
+from datetime import date, datetime, timedelta
+import sqlite3
 import os
 import argparse
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
+try:
+    import pyodbc
+except ImportError:  # pyodbc is only needed to talk to SQL Server
+    pyodbc = None
+
 # Load environment variables from .env file, forçando a sobrescrita de variáveis existentes
 load_dotenv(override=True)
 
@@ -23,8 +32,40 @@ database = os.getenv('DB_NAME', 'interview_db')
 username = os.getenv('DB_USER', 'sa')
 password = os.getenv('DB_PASSWORD', 'YourStrongPassword123!')
 
+# Value sets shared by the row-by-row and vectorized generators
+CLIENT_STATUSES = ['Active', 'Inactive', 'Pending', 'Suspended']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y', '%Y/%m/%d']
+LOGIN_DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %I:%M %p', '%m-%d-%Y %H:%M']
+INVALID_LOGIN_FORMATS = ['%Y.%m.%d', 'YYYY-MM-DD', 'DD-MM-YY', 'MM/DD', 'INVALID DATE']
+INVALID_LOGIN_VALUES = ['Invalid date', 'N/A', '0000-00-00', '2023/13/45', '31/02/2022']
+PRODUCT_CATEGORIES = ['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Toys', 'Books', 'Health & Beauty', 'Automotive', 'Grocery', 'Office']
+PRODUCT_SUBCATEGORIES = {
+    'Electronics': ['Smartphones', 'Laptops', 'Tablets', 'TVs', 'Cameras', 'Audio', 'Wearables', 'Gaming'],
+    'Clothing': ['Men\'s', 'Women\'s', 'Children\'s', 'Shoes', 'Accessories', 'Activewear', 'Formal', 'Casual'],
+    'Home & Garden': ['Furniture', 'Decor', 'Kitchen', 'Bathroom', 'Bedding', 'Garden', 'Tools', 'Lighting'],
+    'Sports': ['Fitness', 'Outdoor', 'Team Sports', 'Water Sports', 'Winter Sports', 'Cycling', 'Golf', 'Running'],
+    'Toys': ['Action Figures', 'Dolls', 'Educational', 'Games', 'Puzzles', 'Outdoor Toys', 'Building Sets', 'Remote Control'],
+    'Books': ['Fiction', 'Non-Fiction', 'Children\'s', 'Textbooks', 'Comics', 'Biography', 'Self-Help', 'Cooking'],
+    'Health & Beauty': ['Skincare', 'Makeup', 'Hair Care', 'Fragrance', 'Personal Care', 'Vitamins', 'Bath & Body', 'Men\'s Grooming'],
+    'Automotive': ['Interior', 'Exterior', 'Parts', 'Tools', 'Electronics', 'Accessories', 'Tires', 'Oil & Fluids'],
+    'Grocery': ['Beverages', 'Snacks', 'Canned Goods', 'Dairy', 'Meat', 'Produce', 'Bakery', 'Frozen'],
+    'Office': ['Stationery', 'Furniture', 'Electronics', 'Paper', 'Writing Supplies', 'Organization', 'Printers', 'Ink & Toner']
+}
+APPAREL_CATEGORIES = ['Clothing']
+APPAREL_SUBCATEGORIES = ['Men\'s', 'Women\'s', 'Children\'s', 'Shoes', 'Accessories', 'Activewear', 'Formal', 'Casual']
+PAYMENT_METHODS = ['Credit Card', 'PayPal', 'Bank Transfer', 'Cash on Delivery', 'Gift Card']
+PAYMENT_STATUSES = ['Paid', 'Pending', 'Failed', 'Refunded', 'Partially Paid']
+RETURN_REASONS = [
+    'Defective product', 'Wrong item received', 'Not as described',
+    'Arrived too late', 'No longer needed', 'Better price found elsewhere',
+    'Missing parts', 'Damaged during shipping', 'Changed mind', 'Ordered by mistake'
+]
+RETURN_STATUSES = ['Approved', 'Pending', 'Rejected', 'Completed', 'Processing']
+
 # Function to create database connection
-def create_connection():
+def create_connection(sqlite_path=None):
+    if sqlite_path:
+        return create_sqlite_connection(sqlite_path)
     conn_str = f'DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={server};DATABASE={database};UID={username};PWD={password};TrustServerCertificate=yes;'
     try:
         conn = pyodbc.connect(conn_str)
@@ -33,6 +74,18 @@ def create_connection():
         print(f"Error connecting to database: {e}")
         return None
 
+# Function to open a local SQLite stand-in for the source database, creating the
+# tables of sql_server_setup.sql when they are missing
+def create_sqlite_connection(sqlite_path):
+    conn = sqlite3.connect(sqlite_path)
+    setup_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql_server_setup.sql')
+    with open(setup_path) as f:
+        statements = re.findall(r'CREATE TABLE dbo\.(.*?\n\s*\);)', f.read(), re.S)
+    for statement in statements:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {statement}")
+    conn.commit()
+    return conn
+
 # Function to generate client data
 def generate_clients(num_clients=50, start_id=1):
     clients = []
@@ -53,7 +106,7 @@ def generate_clients(num_clients=50, start_id=1):
         registration_date = fake.date_between(start_date='-5y', end_date='today').strftime('%Y-%m-%d')
         
         # Randomly select status
-        status = random.choice(['Active', 'Inactive', 'Pending', 'Suspended'])
+        status = random.choice(CLIENT_STATUSES)
         
         # Random credit limit between 1000 and 100000
         credit_limit = round(random.uniform(1000, 100000), 2)
@@ -112,26 +165,21 @@ def generate_customers(clients_df, num_customers=200, start_id=1):
         country = fake.country()[:45]
         
         # Intentional issue: inconsistent date formats for birth date
-        birth_date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y', '%Y/%m/%d']
-        birth_date = fake.date_of_birth(minimum_age=18, maximum_age=90).strftime(random.choice(birth_date_formats))
+        birth_date = fake.date_of_birth(minimum_age=18, maximum_age=90).strftime(random.choice(DATE_FORMATS))
         
         # Intentional issue: inconsistent date formats for registration date
-        reg_date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y', '%Y/%m/%d']
-        registration_date = fake.date_between(start_date='-3y', end_date='today').strftime(random.choice(reg_date_formats))
+        registration_date = fake.date_between(start_date='-3y', end_date='today').strftime(random.choice(DATE_FORMATS))
         
         # Intentional issue: inconsistent datetime formats for last login
-        login_date_formats = ['%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %I:%M %p', '%m-%d-%Y %H:%M']
-        invalid_formats = ['%Y.%m.%d', 'YYYY-MM-DD', 'DD-MM-YY', 'MM/DD', 'INVALID DATE']
-        
         if random.random() < 0.8:  # 80% valid dates with inconsistent formats
-            last_login = fake.date_time_between(start_date='-1y', end_date='now').strftime(random.choice(login_date_formats))
+            last_login = fake.date_time_between(start_date='-1y', end_date='now').strftime(random.choice(LOGIN_DATE_FORMATS))
         else:  # 20% completely invalid dates
             if random.random() < 0.5:
                 # Completely invalid format
-                last_login = random.choice(['Invalid date', 'N/A', '0000-00-00', '2023/13/45', '31/02/2022'])
+                last_login = random.choice(INVALID_LOGIN_VALUES)
             else:
                 # Date with wrong format
-                last_login = fake.date_time_between(start_date='-1y', end_date='now').strftime(random.choice(invalid_formats))
+                last_login = fake.date_time_between(start_date='-1y', end_date='now').strftime(random.choice(INVALID_LOGIN_FORMATS))
         
         # Intentional issue: missing client_id for some customers
         if random.random() < 0.05 and len(client_ids) > 0:  # 5% chance of missing client_id
@@ -184,31 +232,10 @@ def generate_customers(clients_df, num_customers=200, start_id=1):
 def generate_products(num_products=100, start_id=1):
     products = []
     
-    # Define categories and subcategories
-    categories = ['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Toys', 'Books', 'Health & Beauty', 'Automotive', 'Grocery', 'Office']
-    
-    # Define subcategories for each category
-    subcategories = {
-        'Electronics': ['Smartphones', 'Laptops', 'Tablets', 'TVs', 'Cameras', 'Audio', 'Wearables', 'Gaming'],
-        'Clothing': ['Men\'s', 'Women\'s', 'Children\'s', 'Shoes', 'Accessories', 'Activewear', 'Formal', 'Casual'],
-        'Home & Garden': ['Furniture', 'Decor', 'Kitchen', 'Bathroom', 'Bedding', 'Garden', 'Tools', 'Lighting'],
-        'Sports': ['Fitness', 'Outdoor', 'Team Sports', 'Water Sports', 'Winter Sports', 'Cycling', 'Golf', 'Running'],
-        'Toys': ['Action Figures', 'Dolls', 'Educational', 'Games', 'Puzzles', 'Outdoor Toys', 'Building Sets', 'Remote Control'],
-        'Books': ['Fiction', 'Non-Fiction', 'Children\'s', 'Textbooks', 'Comics', 'Biography', 'Self-Help', 'Cooking'],
-        'Health & Beauty': ['Skincare', 'Makeup', 'Hair Care', 'Fragrance', 'Personal Care', 'Vitamins', 'Bath & Body', 'Men\'s Grooming'],
-        'Automotive': ['Interior', 'Exterior', 'Parts', 'Tools', 'Electronics', 'Accessories', 'Tires', 'Oil & Fluids'],
-        'Grocery': ['Beverages', 'Snacks', 'Canned Goods', 'Dairy', 'Meat', 'Produce', 'Bakery', 'Frozen'],
-        'Office': ['Stationery', 'Furniture', 'Electronics', 'Paper', 'Writing Supplies', 'Organization', 'Printers', 'Ink & Toner']
-    }
-    
-    # Define apparel categories and subcategories
-    apparel_categories = ['Clothing']
-    apparel_subcategories = ['Men\'s', 'Women\'s', 'Children\'s', 'Shoes', 'Accessories', 'Activewear', 'Formal', 'Casual']
-    
     for i in range(start_id, start_id + num_products):
         # Select random category and subcategory
-        category = random.choice(categories)
-        sub_category = random.choice(subcategories[category])
+        category = random.choice(PRODUCT_CATEGORIES)
+        sub_category = random.choice(PRODUCT_SUBCATEGORIES[category])
         
         # Generate product name
         product_name = f"{fake.word().capitalize()} {sub_category} {fake.word().capitalize()}"[:95]
@@ -240,7 +267,7 @@ def generate_products(num_products=100, start_id=1):
         
         # Determine if the product is apparel based on category and subcategory
         is_apparel = 0
-        if category in apparel_categories or sub_category in apparel_subcategories:
+        if category in APPAREL_CATEGORIES or sub_category in APPAREL_SUBCATEGORIES:
             if random.random() < 0.8:  # 90% chance for apparel categories to be marked as apparel
                 is_apparel = 1
         else:
@@ -351,10 +378,10 @@ def generate_purchases(clients_df, customers_df, products_df, num_purchases=500,
         total_amount = round(quantity * unit_price, 2)
         
         # Select payment method
-        payment_method = random.choice(['Credit Card', 'PayPal', 'Bank Transfer', 'Cash on Delivery', 'Gift Card'])
+        payment_method = random.choice(PAYMENT_METHODS)
         
         # Select payment status
-        payment_status = random.choice(['Paid', 'Pending', 'Failed', 'Refunded', 'Partially Paid'])
+        payment_status = random.choice(PAYMENT_STATUSES)
         
         # Generate notes
         notes = fake.sentence()[:195] if random.random() < 0.3 else None
@@ -423,60 +450,30 @@ def generate_returns(purchases_df, clients_df, customers_df, products_df, num_re
     if missing_columns:
         print(f"Warning: Missing columns in purchases data: {missing_columns}")
         # Adicionar colunas faltantes com valores padrão
-        for col in missing_columns:
-            if col == 'quantity':
-                purchases_df[col] = 1  # Valor padrão para quantity
-            elif col == 'total_amount':
-                purchases_df[col] = 100.0  # Valor padrão para total_amount
-            else:
-                purchases_df[col] = None
+        defaults = {'quantity': 1, 'total_amount': 100.0}
+        purchases_df = purchases_df.assign(**{col: defaults.get(col) for col in missing_columns})
     
-    # Create dictionaries to map purchase IDs to other fields for easy lookup
-    purchase_client_map = dict(zip(purchases_df['purchase_id'], purchases_df['client_id']))
-    purchase_customer_map = dict(zip(purchases_df['purchase_id'], purchases_df['customer_id']))
-    purchase_product_map = dict(zip(purchases_df['purchase_id'], purchases_df['product_id']))
-    
-    # Garantir que quantity e total_amount existam e tenham valores válidos
-    if 'quantity' in purchases_df.columns:
-        purchase_quantity_map = dict(zip(purchases_df['purchase_id'], purchases_df['quantity']))
-    else:
-        # Se a coluna não existir, usar valor padrão 1
-        purchase_quantity_map = {pid: 1 for pid in purchases_df['purchase_id']}
-        
-    if 'total_amount' in purchases_df.columns:
-        purchase_amount_map = dict(zip(purchases_df['purchase_id'], purchases_df['total_amount']))
-    else:
-        # Se a coluna não existir, usar valor padrão 100.0
-        purchase_amount_map = {pid: 100.0 for pid in purchases_df['purchase_id']}
-        
-    purchase_date_map = dict(zip(purchases_df['purchase_id'], purchases_df['purchase_date']))
+    # Join the selected purchases with their fields in one indexed lookup
+    selected = purchases_df.drop_duplicates('purchase_id').set_index('purchase_id').loc[selected_purchase_ids, required_columns]
+    purchase_dates = pd.to_datetime(selected['purchase_date'].astype(str), format='ISO8601', errors='coerce')
+    purchase_quantities = pd.to_numeric(selected['quantity'], errors='coerce').fillna(1).astype(float)
+    purchase_amounts = pd.to_numeric(selected['total_amount'], errors='coerce').fillna(0)
     
     # Get the list of problematic clients from the memory
     problematic_clients = []
-    if len(clients_df) > 0:
+    if clients_df is not None and len(clients_df) > 0:
         client_ids = clients_df['client_id'].tolist()
         problematic_clients = random.sample(client_ids, int(len(client_ids) * 0.3))
     
-    for i, purchase_id in enumerate(selected_purchase_ids, start=start_id):
-        # Get related fields from the purchase
-        client_id = purchase_client_map.get(purchase_id)
-        customer_id = purchase_customer_map.get(purchase_id)
-        product_id = purchase_product_map.get(purchase_id)
-        purchase_quantity = purchase_quantity_map.get(purchase_id, 1)
-        purchase_amount = purchase_amount_map.get(purchase_id, 0)
-        purchase_date = purchase_date_map.get(purchase_id)
-        
+    candidates = zip(selected.index, selected['client_id'], selected['customer_id'], selected['product_id'],
+                     purchase_quantities, purchase_amounts, purchase_dates)
+    for i, (purchase_id, client_id, customer_id, product_id, purchase_quantity, purchase_amount, purchase_date) in enumerate(candidates, start=start_id):
         # Generate return date 1-30 days after purchase date
-        if purchase_date:
-            try:
-                purchase_date_obj = datetime.strptime(purchase_date, '%Y-%m-%d')
-                return_date_obj = purchase_date_obj + timedelta(days=random.randint(1, 30))
-                return_date = return_date_obj.strftime('%Y-%m-%d')
-            except (ValueError, TypeError):
-                # Handle invalid purchase date
-                return_date = fake.date_between(start_date='-1y', end_date='today').strftime('%Y-%m-%d')
+        if pd.notna(purchase_date):
+            return_date_obj = purchase_date + timedelta(days=random.randint(1, 30))
+            return_date = return_date_obj.strftime('%Y-%m-%d')
         else:
-            # Handle missing purchase date
+            # Handle missing or invalid purchase date
             return_date = fake.date_between(start_date='-1y', end_date='today').strftime('%Y-%m-%d')
         
         # Generate return quantity (usually less than or equal to purchase quantity)
@@ -490,14 +487,10 @@ def generate_returns(purchases_df, clients_df, customers_df, products_df, num_re
         refund_amount = round((return_quantity / purchase_quantity) * float(purchase_amount), 2) if purchase_quantity > 0 else 0
         
         # Select reason for return
-        reason = random.choice([
-            'Defective product', 'Wrong item received', 'Not as described',
-            'Arrived too late', 'No longer needed', 'Better price found elsewhere',
-            'Missing parts', 'Damaged during shipping', 'Changed mind', 'Ordered by mistake'
-        ])
+        reason = random.choice(RETURN_REASONS)
         
         # Select return status
-        status = random.choice(['Approved', 'Pending', 'Rejected', 'Completed', 'Processing'])
+        status = random.choice(RETURN_STATUSES)
         
         # Generate notes
         notes = fake.sentence()[:195] if random.random() < 0.3 else None
@@ -527,9 +520,376 @@ def generate_returns(purchases_df, clients_df, customers_df, products_df, num_re
     
     return pd.DataFrame(returns)
 
+# Number of distinct values pre-generated with Faker for each text field in vectorized mode
+DEFAULT_POOL_SIZE = 2000
+
+# Function to pre-generate the Faker text pools sampled by the vectorized generators
+def build_text_pools(seed=42, size=DEFAULT_POOL_SIZE):
+    pool_fake = Faker()
+    pool_fake.seed_instance(seed)
+
+    def pool(make, max_length):
+        return np.array([make()[:max_length] for _ in range(size)], dtype=object)
+
+    return {
+        'company': pool(pool_fake.company, 90),
+        'name': pool(pool_fake.name, 90),
+        'first_name': pool(pool_fake.first_name, 45),
+        'last_name': pool(pool_fake.last_name, 45),
+        'email': pool(pool_fake.email, 90),
+        'phone': pool(pool_fake.phone_number, 15),
+        'address': pool(pool_fake.street_address, 190),
+        'city': pool(pool_fake.city, 45),
+        'state': pool(pool_fake.state, 45),
+        'zip_code': pool(pool_fake.zipcode, 15),
+        'country': pool(pool_fake.country, 45),
+        'word': pool(lambda: pool_fake.word().capitalize(), 45),
+        'paragraph': pool(lambda: pool_fake.paragraph(nb_sentences=3), 495),
+        'sentence': pool(pool_fake.sentence, 195)
+    }
+
+# Function to draw n values from a pool or value list
+def sample_values(rng, values, n):
+    values = np.asarray(values, dtype=object)
+    return values[rng.integers(0, len(values), n)]
+
+# Function to set values to None with a given probability
+def with_nulls(rng, values, rate):
+    values = np.asarray(values, dtype=object)
+    values[rng.random(len(values)) < rate] = None
+    return values
+
+# Function to draw random days between today - days_back and today
+def random_days(rng, n, days_back):
+    today = pd.Timestamp('today').normalize()
+    return today - pd.to_timedelta(rng.integers(0, days_back + 1, n), unit='D')
+
+# Function to draw random timestamps between now - seconds_back and now
+def random_datetimes(rng, n, seconds_back):
+    now = pd.Timestamp('now').floor('s')
+    return now - pd.to_timedelta(rng.integers(0, seconds_back + 1, n), unit='s')
+
+# Function to format each timestamp with a randomly chosen format
+def format_dates(rng, timestamps, formats):
+    timestamps = pd.DatetimeIndex(timestamps)
+    choice = rng.integers(0, len(formats), len(timestamps))
+    formatted = np.empty(len(timestamps), dtype=object)
+    for i, date_format in enumerate(formats):
+        mask = choice == i
+        if mask.any():
+            formatted[mask] = np.asarray(timestamps[mask].strftime(date_format), dtype=object)
+    return formatted
+
+# Function to generate client data with vectorized draws
+def generate_clients_vectorized(rng, pools, num_clients=50, start_id=1):
+    n = num_clients
+    credit_limit = np.round(rng.uniform(1000, 100000, n), 2)
+    credit_limit[rng.random(n) < 0.05] = 0
+
+    return pd.DataFrame({
+        'client_id': np.arange(start_id, start_id + n),
+        'company_name': sample_values(rng, pools['company'], n),
+        'contact_name': sample_values(rng, pools['name'], n),
+        'email': sample_values(rng, pools['email'], n),
+        'phone': with_nulls(rng, sample_values(rng, pools['phone'], n), 0.05),
+        'address': with_nulls(rng, sample_values(rng, pools['address'], n), 0.08),
+        'city': sample_values(rng, pools['city'], n),
+        'state': sample_values(rng, pools['state'], n),
+        'zip_code': with_nulls(rng, sample_values(rng, pools['zip_code'], n), 0.05),
+        'country': sample_values(rng, pools['country'], n),
+        'registration_date': format_dates(rng, random_days(rng, n, 5 * 365), ['%Y-%m-%d']),
+        'status': sample_values(rng, CLIENT_STATUSES, n),
+        'credit_limit': credit_limit,
+        'last_update': pd.to_datetime('today').date()
+    })
+
+# Function to generate customer data with vectorized draws
+def generate_customers_vectorized(rng, pools, clients_df, num_customers=200, start_id=1):
+    n = num_customers
+
+    # Intentional issue: missing client_id for some customers
+    if len(clients_df) == 0:
+        client_id = pd.array([None] * n, dtype='Int64')
+    else:
+        client_id = pd.array(sample_values(rng, clients_df['client_id'].to_numpy(), n), dtype='Int64')
+        client_id[rng.random(n) < 0.05] = None
+
+    # Intentional issue: inconsistent date formats for birth and registration dates
+    birth_days = random_days(rng, n, 72 * 365) - pd.Timedelta(days=18 * 365)
+    birth_date = with_nulls(rng, format_dates(rng, birth_days, DATE_FORMATS), 0.05)
+    registration_date = format_dates(rng, random_days(rng, n, 3 * 365), DATE_FORMATS)
+
+    # Intentional issue: 80% valid logins in inconsistent formats, 10% invalid values, 10% wrong formats
+    login_times = random_datetimes(rng, n, 365 * 24 * 3600)
+    last_login = format_dates(rng, login_times, LOGIN_DATE_FORMATS)
+    kind = rng.random(n)
+    invalid_value = (kind >= 0.8) & (kind < 0.9)
+    wrong_format = kind >= 0.9
+    last_login[invalid_value] = sample_values(rng, INVALID_LOGIN_VALUES, int(invalid_value.sum()))
+    last_login[wrong_format] = format_dates(rng, login_times[wrong_format], INVALID_LOGIN_FORMATS)
+
+    return pd.DataFrame({
+        'customer_id': np.arange(start_id, start_id + n),
+        'client_id': client_id,
+        'first_name': sample_values(rng, pools['first_name'], n),
+        'last_name': sample_values(rng, pools['last_name'], n),
+        'email': sample_values(rng, pools['email'], n),
+        'phone': with_nulls(rng, sample_values(rng, pools['phone'], n), 0.1),
+        'birth_date': birth_date,
+        'address': with_nulls(rng, sample_values(rng, pools['address'], n), 0.08),
+        'city': sample_values(rng, pools['city'], n),
+        'state': sample_values(rng, pools['state'], n),
+        'zip_code': with_nulls(rng, sample_values(rng, pools['zip_code'], n), 0.01),
+        'country': sample_values(rng, pools['country'], n),
+        'registration_date': registration_date,
+        'last_login': with_nulls(rng, last_login, 0.05),
+        'last_update': pd.to_datetime('today').date()
+    })
+
+# Function to generate product data with vectorized draws
+def generate_products_vectorized(rng, pools, num_products=100, start_id=1):
+    n = num_products
+
+    # Select random category and subcategory (every category has 8 subcategories)
+    subcategory_table = np.array([PRODUCT_SUBCATEGORIES[category] for category in PRODUCT_CATEGORIES], dtype=object)
+    category_index = rng.integers(0, len(PRODUCT_CATEGORIES), n)
+    category = np.asarray(PRODUCT_CATEGORIES, dtype=object)[category_index]
+    sub_category = subcategory_table[category_index, rng.integers(0, subcategory_table.shape[1], n)]
+
+    product_name = pd.Series(sample_values(rng, pools['word'], n)) + ' ' + sub_category + ' ' + sample_values(rng, pools['word'], n)
+
+    # Generate prices, with the selling price below cost for 5% of products
+    cost_price = np.round(rng.uniform(10, 500, n), 2)
+    selling_price = np.round(cost_price * rng.uniform(1.1, 2.0, n), 2)
+    below_cost = rng.random(n) < 0.05
+    selling_price[below_cost] = np.round(cost_price[below_cost] * rng.uniform(0.5, 0.9, int(below_cost.sum())), 2)
+
+    stock_quantity = pd.array(rng.integers(0, 501, n), dtype='Int64')
+    stock_quantity[rng.random(n) < 0.01] = None
+    min_stock_level = pd.array(rng.integers(10, 101, n), dtype='Int64')
+    min_stock_level[rng.random(n) < 0.05] = None
+
+    created_at = random_datetimes(rng, n, 2 * 365 * 24 * 3600)
+    now = pd.Timestamp('now').floor('s')
+    updated_at = created_at + pd.to_timedelta((rng.random(n) * (now - created_at).total_seconds()).astype('int64'), unit='s')
+
+    # Apparel flag: 80% for apparel categories, 20% for the others
+    is_apparel_category = np.isin(category, APPAREL_CATEGORIES) | np.isin(sub_category, APPAREL_SUBCATEGORIES)
+    is_apparel = np.where(is_apparel_category, rng.random(n) < 0.8, rng.random(n) < 0.2).astype(int)
+
+    return pd.DataFrame({
+        'product_id': np.arange(start_id, start_id + n),
+        'product_name': product_name.str.slice(0, 95).to_numpy(dtype=object),
+        'description': with_nulls(rng, sample_values(rng, pools['paragraph'], n), 0.05),
+        'category': category,
+        'sub_category': sub_category,
+        'supplier': with_nulls(rng, sample_values(rng, pools['company'], n), 0.05),
+        'cost_price': cost_price,
+        'selling_price': selling_price,
+        'stock_quantity': stock_quantity,
+        'min_stock_level': min_stock_level,
+        'is_active': rng.integers(0, 2, n),
+        'is_apparel': is_apparel,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'last_update': pd.to_datetime('today').date()
+    })
+
+# Function to generate purchase data with vectorized draws
+def generate_purchases_vectorized(rng, pools, clients_df, customers_df, products_df, num_purchases=500, start_id=1, problematic_clients=None):
+    n = num_purchases
+
+    if len(clients_df) == 0 or len(customers_df) == 0 or len(products_df) == 0:
+        return generate_purchases(clients_df, customers_df, products_df, 0, start_id)
+
+    client_ids = clients_df['client_id'].to_numpy()
+    client_id = client_ids[rng.integers(0, len(client_ids), n)]
+    customer_id = sample_values(rng, customers_df['customer_id'].to_numpy(), n).astype('int64')
+    product_index = rng.integers(0, len(products_df), n)
+    product_id = products_df['product_id'].to_numpy()[product_index]
+
+    # Approximately 30% of clients send product names instead of ids
+    if problematic_clients is None:
+        problematic_clients = rng.choice(client_ids, int(len(client_ids) * 0.3), replace=False)
+    product_id_value = np.where(
+        np.isin(client_id, problematic_clients),
+        products_df['product_name'].to_numpy(dtype=object)[product_index],
+        product_id.astype(str).astype(object)
+    )
+
+    # Purchase in the past 2 years, shipped 1-5 days later, delivered 1-10 days after shipping
+    purchase_days = random_days(rng, n, 2 * 365)
+    shipping_days = purchase_days + pd.to_timedelta(rng.integers(1, 6, n), unit='D')
+    delivery_days = shipping_days + pd.to_timedelta(rng.integers(1, 11, n), unit='D')
+
+    quantity = rng.integers(1, 11, n)
+    unit_price = products_df['selling_price'].to_numpy(dtype=float)[product_index]
+
+    # Notes on 30% of purchases, then 15% of those dropped
+    notes = sample_values(rng, pools['sentence'], n)
+    notes[rng.random(n) >= 0.3] = None
+
+    return pd.DataFrame({
+        'purchase_id': np.arange(start_id, start_id + n),
+        'client_id': client_id,
+        'customer_id': customer_id,
+        'product_id': product_id_value,
+        'purchase_date': np.asarray(purchase_days.strftime('%Y-%m-%d'), dtype=object),
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'total_amount': np.round(quantity * unit_price, 2),
+        'payment_method': with_nulls(rng, sample_values(rng, PAYMENT_METHODS, n), 0.02),
+        'payment_status': sample_values(rng, PAYMENT_STATUSES, n),
+        'shipping_address': with_nulls(rng, sample_values(rng, pools['address'], n), 0.02),
+        'shipping_city': sample_values(rng, pools['city'], n),
+        'shipping_state': sample_values(rng, pools['state'], n),
+        'shipping_zip': with_nulls(rng, sample_values(rng, pools['zip_code'], n), 0.1),
+        'shipping_country': sample_values(rng, pools['country'], n),
+        'shipping_date': np.asarray(shipping_days.strftime('%Y-%m-%d'), dtype=object),
+        'delivery_date': with_nulls(rng, np.asarray(delivery_days.strftime('%Y-%m-%d'), dtype=object), 0.05),
+        'notes': with_nulls(rng, notes, 0.15),
+        'last_update': pd.to_datetime('today').date()
+    })
+
+# Function to generate return data with vectorized draws
+def generate_returns_vectorized(rng, pools, purchases_df, num_returns=100, start_id=1):
+    if len(purchases_df) == 0:
+        return generate_returns(purchases_df, None, None, None, 0, start_id)
+
+    # Randomly select purchases to be returned (without replacement to avoid duplicates)
+    n = min(num_returns, len(purchases_df))
+    selected = purchases_df.iloc[np.sort(rng.choice(len(purchases_df), n, replace=False))]
+
+    # Return 1-30 days after the purchase, or in the past year when the purchase date is unusable
+    purchase_days = pd.to_datetime(selected['purchase_date'], format='%Y-%m-%d', errors='coerce')
+    return_days = purchase_days + pd.to_timedelta(rng.integers(1, 31, n), unit='D')
+    return_days = return_days.fillna(pd.Series(random_days(rng, n, 365), index=selected.index))
+
+    # Return quantity between 1 and the purchased quantity, refund proportional to it
+    purchase_quantity = pd.to_numeric(selected['quantity'], errors='coerce').fillna(1).clip(lower=1).to_numpy()
+    return_quantity = np.floor(rng.random(n) * purchase_quantity).astype(int) + 1
+    purchase_amount = pd.to_numeric(selected['total_amount'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    refund_amount = np.round(return_quantity / purchase_quantity * purchase_amount, 2).astype(object)
+    refund_amount[rng.random(n) < 0.01] = None
+
+    notes = sample_values(rng, pools['sentence'], n)
+    notes[rng.random(n) >= 0.3] = None
+
+    return pd.DataFrame({
+        'return_id': np.arange(start_id, start_id + n),
+        'purchase_id': selected['purchase_id'].to_numpy(),
+        'client_id': selected['client_id'].to_numpy(),
+        'customer_id': selected['customer_id'].to_numpy(),
+        'product_id': selected['product_id'].to_numpy(dtype=object),
+        'return_date': np.asarray(return_days.dt.strftime('%Y-%m-%d'), dtype=object),
+        'quantity': return_quantity,
+        'reason': with_nulls(rng, sample_values(rng, RETURN_REASONS, n), 0.1),
+        'status': sample_values(rng, RETURN_STATUSES, n),
+        'refund_amount': refund_amount,
+        'notes': with_nulls(rng, notes, 0.15),
+        'last_update': pd.to_datetime('today').date()
+    })
+
+# Column groups used to coerce values before they are bound as parameters
+NUMERIC_COLUMNS = ['client_id', 'customer_id', 'purchase_id', 'return_id', 'quantity', 'price', 'total_amount', 'cost_price', 'selling_price', 'stock_quantity', 'min_stock_level', 'refund_amount', 'credit_limit']
+FLOAT_COLUMNS = ['price', 'total_amount', 'credit_limit', 'cost_price', 'selling_price', 'refund_amount']
+INTEGER_COLUMNS = ['client_id', 'customer_id', 'purchase_id', 'return_id', 'stock_quantity', 'min_stock_level', 'is_active', 'is_apparel']
+MAX_TEXT_LENGTH = 4000
+
+# Default number of rows sent per executemany call
+DEFAULT_BATCH_SIZE = 1000
+
+# Errors raised by the supported drivers (pyodbc for SQL Server, sqlite3 for local tests)
+DB_ERRORS = (pyodbc.Error, sqlite3.Error) if pyodbc is not None else (sqlite3.Error,)
+
+# Function to coerce a DataFrame column-wise into bindable values
+def coerce_columns(df, columns):
+    coerced = {}
+
+    for column in columns:
+        series = df[column]
+        is_null = series.isna()
+        is_text = series.map(lambda v: isinstance(v, str)) if series.dtype == object else pd.Series(False, index=series.index)
+
+        # Handle text values - limit length to avoid truncation
+        if is_text.any():
+            series = series.where(~is_text, series.str.slice(0, MAX_TEXT_LENGTH))
+
+        # Handle empty strings for numeric columns
+        if column in NUMERIC_COLUMNS:
+            is_empty = is_text & (series == "")
+        else:
+            is_empty = pd.Series(False, index=series.index)
+
+        if column in FLOAT_COLUMNS:
+            # Ensure float values are valid
+            series = pd.to_numeric(series.where(~is_empty), errors='coerce').astype(object)
+            series = series.where(series.notna(), None)
+
+        elif column in INTEGER_COLUMNS:
+            # Ensure integer values are valid (truncated like int())
+            numeric = pd.to_numeric(series.where(~is_empty), errors='coerce')
+            series = np.trunc(numeric).astype('Int64').astype(object)
+            series = series.where(series.notna(), None)
+
+        elif column == 'quantity':
+            # Quantity is always a positive integer, defaulting to 1 when it cannot be parsed
+            numeric = pd.to_numeric(series, errors='coerce')
+            numeric = np.trunc(numeric).fillna(1).clip(lower=1).astype('int64').astype(object)
+            series = numeric.where(~is_null, None)
+
+        elif column == 'product_id':
+            # Only convert numeric strings to int, product names are kept as is
+            if is_text.any():
+                is_digits = is_text & series.str.isdigit().eq(True)
+                digits = pd.to_numeric(series.where(is_digits), errors='coerce').astype('Int64').astype(object)
+                series = digits.where(is_digits, series)
+            series = series.astype(object).where(~series.isna(), None)
+
+        else:
+            series = series.astype(object).where(~is_null, None)
+
+        coerced[column] = series
+
+    return pd.DataFrame(coerced, columns=columns)
+
+# Function to resolve the qualified table name for the connection's dialect
+def qualified_table_name(conn, table_name):
+    if isinstance(conn, sqlite3.Connection):
+        return table_name
+    return f"dbo.{table_name}"
+
+# Function to insert one chunk, bisecting it on failure to isolate bad rows
+def insert_chunk(conn, cursor, query, rows, columns, table_name):
+    try:
+        cursor.executemany(query, rows)
+        conn.commit()
+        return len(rows)
+    except DB_ERRORS as e:
+        conn.rollback()
+        if len(rows) == 1:
+            print(f"Error inserting into {table_name}: {e}")
+            print(f"Row data: {dict(zip(columns, rows[0]))}")
+            return 0
+
+    middle = len(rows) // 2
+    return (insert_chunk(conn, cursor, query, rows[:middle], columns, table_name)
+            + insert_chunk(conn, cursor, query, rows[middle:], columns, table_name))
+
+# Function to bind temporal values as ISO strings on SQLite, which has no native date type
+def to_sqlite_values(conn, values, columns):
+    if isinstance(conn, sqlite3.Connection):
+        for column in columns:
+            values[column] = values[column].map(lambda v: v.isoformat() if isinstance(v, (date, datetime)) else v)
+    return values
+
 # Function to insert data into database
-def insert_data(conn, df, table_name):
+def insert_data(conn, df, table_name, batch_size=DEFAULT_BATCH_SIZE, verbose=True):
     cursor = conn.cursor()
+
+    # Send parameter arrays in one round trip per batch when the driver supports it
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
     
     # Get column names
     columns = df.columns.tolist()
@@ -541,70 +901,304 @@ def insert_data(conn, df, table_name):
     placeholders = ', '.join(['?' for _ in columns])
     
     # Prepare insert query
-    query = f"INSERT INTO dbo.{table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    query = f"INSERT INTO {qualified_table_name(conn, table_name)} ({', '.join(columns)}) VALUES ({placeholders})"
     
-    # Insert data row by row
+    # Process values column-wise to ensure they match expected data types
+    values = to_sqlite_values(conn, coerce_columns(df, columns), columns)
+
+    rows = list(values.itertuples(index=False, name=None))
+
+    # Insert data in batches
     successful_inserts = 0
-    for _, row in df.iterrows():
-        values = [row[col] for col in columns]
-        
-        # Process values to ensure they match expected data types
-        for i, val in enumerate(values):
-            # Handle text values - limit length to avoid truncation
-            if isinstance(val, str) and len(val) > 4000:
-                values[i] = val[:4000]
-            
-            # Handle empty strings for numeric columns
-            if val == "" and columns[i] in ['client_id', 'customer_id', 'purchase_id', 'return_id', 'quantity', 'price', 'total_amount', 'cost_price', 'selling_price', 'stock_quantity', 'min_stock_level', 'refund_amount', 'credit_limit']:
-                values[i] = None
-                
-            # Ensure float values are valid
-            if columns[i] in ['price', 'total_amount', 'credit_limit', 'cost_price', 'selling_price', 'refund_amount'] and val is not None:
-                try:
-                    values[i] = float(val) if val != "" else None
-                except (ValueError, TypeError):
-                    values[i] = None
-                    
-            # Ensure integer values are valid - EXCEPT for product_id which may contain product names
-            if columns[i] in ['client_id', 'customer_id', 'purchase_id', 'return_id', 'stock_quantity', 'min_stock_level', 'is_active', 'is_apparel'] and val is not None:
-                try:
-                    values[i] = int(val) if val != "" else None
-                except (ValueError, TypeError):
-                    values[i] = None
-
-            # Special handling for quantity field to ensure it's always a positive integer
-            if columns[i] == 'quantity' and val is not None:
-                try:
-                    # Converter para inteiro e garantir que seja positivo
-                    quantity_val = int(val) if val != "" else 1
-                    values[i] = max(1, quantity_val)  # Garantir que seja pelo menos 1
-                except (ValueError, TypeError):
-                    values[i] = 1  # Default to 1 if conversion fails
-
-            # Special handling for product_id - only convert to int if it's a numeric string
-            if columns[i] == 'product_id' and val is not None and val != "":
-                if isinstance(val, str) and val.isdigit():
-                    # It's a numeric string, convert to int
-                    values[i] = int(val)
-                # Otherwise, keep it as is (product name for problematic clients)
-        
-        try:
-            cursor.execute(query, values)
-            successful_inserts += 1
-        except pyodbc.Error as e:
-            print(f"Error inserting into {table_name}: {e}")
-            print(f"Row data: {dict(zip(columns, values))}")
-            continue
+    for start in range(0, len(rows), batch_size):
+        successful_inserts += insert_chunk(conn, cursor, query, rows[start:start + batch_size], columns, table_name)
     
-    conn.commit()
-    print(f"Inserted {successful_inserts} rows into {table_name}")
+    if verbose:
+        print(f"Inserted {successful_inserts} rows into {table_name}")
+    return successful_inserts
+
+# Function to update rows in place, matched on a key column
+def update_data(conn, df, table_name, key):
+    cursor = conn.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+
+    columns = [col for col in df.columns if col != key]
+    query = f"UPDATE {qualified_table_name(conn, table_name)} SET {', '.join(f'{col} = ?' for col in columns)} WHERE {key} = ?"
+    values = to_sqlite_values(conn, coerce_columns(df, columns + [key]), columns + [key])
+    rows = list(values.itertuples(index=False, name=None))
+    return insert_chunk(conn, cursor, query, rows, columns + [key], table_name)
+
+# Default number of ids generated per shard in vectorized mode
+DEFAULT_SHARD_SIZE = 100_000
+
+# Entity codes mixed into the shard seeds
+ENTITY_CODES = {'clients': 1, 'customers': 2, 'products': 3, 'purchases': 4, 'returns': 5, 'problematic_clients': 6, 'stream': 7}
+
+# Text pools built once per process and seed
+_process_pools = {}
+
+# Function to derive the random generator of one shard from the run seed
+def shard_rng(seed, entity, shard_index=0):
+    return np.random.default_rng(np.random.SeedSequence([seed, ENTITY_CODES[entity], shard_index]))
+
+# Function to get the text pools of a seed, building them once per process
+def get_text_pools(seed):
+    if seed not in _process_pools:
+        _process_pools[seed] = build_text_pools(seed)
+    return _process_pools[seed]
+
+# Function to generate one shard of an entity (runs in the worker processes)
+def generate_shard(entity, seed, shard_index, start_id, count, context):
+    rng = shard_rng(seed, entity, shard_index)
+    pools = get_text_pools(seed)
+
+    if entity == 'clients':
+        return generate_clients_vectorized(rng, pools, count, start_id=start_id)
+    if entity == 'customers':
+        clients_df = pd.DataFrame({'client_id': np.arange(*context['client_ids'])})
+        return generate_customers_vectorized(rng, pools, clients_df, count, start_id=start_id)
+    if entity == 'products':
+        return generate_products_vectorized(rng, pools, count, start_id=start_id)
+    if entity == 'purchases':
+        clients_df = pd.DataFrame({'client_id': np.arange(*context['client_ids'])})
+        customers_df = pd.DataFrame({'customer_id': np.arange(*context['customer_ids'])})
+        return generate_purchases_vectorized(rng, pools, clients_df, customers_df, context['products'], count,
+                                             start_id=start_id, problematic_clients=context['problematic_clients'])
+    raise ValueError(f"Unknown entity: {entity}")
+
+# Function to generate an entity shard by shard, yielding the shards in id order
+def generate_sharded(executor, entity, count, start_id, seed, shard_size, context=None, max_in_flight=4):
+    shards = [
+        (shard_index, start_id + offset, min(shard_size, count - offset))
+        for shard_index, offset in enumerate(range(0, count, shard_size))
+    ]
+
+    if executor is None:
+        for shard in shards:
+            yield generate_shard(entity, seed, *shard, context)
+        return
+
+    # Keep a bounded number of shards in flight so memory does not grow with the total count
+    pending = deque()
+    for shard in shards:
+        pending.append(executor.submit(generate_shard, entity, seed, *shard, context))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Purchase columns the return generators draw from
+RETURN_CANDIDATE_COLUMNS = ['purchase_id', 'client_id', 'customer_id', 'product_id', 'purchase_date', 'quantity', 'total_amount']
+
+# Function to sample existing purchases as return candidates, reading only the sampled keys
+def fetch_return_candidates(conn, num_returns, seed=42, batch_size=500):
+    cursor = conn.cursor()
+    table_name = qualified_table_name(conn, 'purchases')
+    cursor.execute(f"SELECT MIN(purchase_id), MAX(purchase_id) FROM {table_name}")
+    low, high = cursor.fetchone()
+    if low is None:
+        return pd.DataFrame(columns=RETURN_CANDIDATE_COLUMNS)
+
+    # Oversample the key range, gaps in the ids leave fewer rows than keys drawn
+    rng = shard_rng(seed, 'returns', 2)
+    count = min(high - low + 1, num_returns * 2)
+    keys = np.sort(low + rng.choice(high - low + 1, count, replace=False))
+
+    rows = []
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size].tolist()
+        cursor.execute(
+            f"SELECT {', '.join(RETURN_CANDIDATE_COLUMNS)} FROM {table_name} WHERE purchase_id IN ({', '.join(['?'] * len(batch))})",
+            batch
+        )
+        rows.extend(tuple(row) for row in cursor.fetchall())
+    return pd.DataFrame.from_records(rows, columns=RETURN_CANDIDATE_COLUMNS)
+
+# Function to generate and insert clients, customers, products and purchases in shards
+def generate_and_insert_sharded(conn, start_ids, counts, seed=42, workers=1, shard_size=DEFAULT_SHARD_SIZE, batch_size=DEFAULT_BATCH_SIZE, num_returns=0):
+    client_ids = (start_ids['clients'], start_ids['clients'] + counts['clients'])
+    customer_ids = (start_ids['customers'], start_ids['customers'] + counts['customers'])
+
+    # Approximately 30% of this run's clients send product names instead of ids
+    problematic_clients = shard_rng(seed, 'problematic_clients').choice(
+        np.arange(*client_ids), int(counts['clients'] * 0.3), replace=False
+    )
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    options = {'seed': seed, 'shard_size': shard_size, 'max_in_flight': workers * 2}
+    try:
+        print(f"Generating and inserting client data in shards of {shard_size}...")
+        for shard in generate_sharded(executor, 'clients', counts['clients'], start_ids['clients'], **options):
+            insert_data(conn, shard, 'client', batch_size=batch_size)
+
+        print(f"Generating and inserting customer data in shards of {shard_size}...")
+        context = {'client_ids': client_ids}
+        for shard in generate_sharded(executor, 'customers', counts['customers'], start_ids['customers'], context=context, **options):
+            insert_data(conn, shard, 'customer', batch_size=batch_size)
+
+        # Only the columns purchases need are kept from the products
+        print(f"Generating and inserting product data in shards of {shard_size}...")
+        products = []
+        for shard in generate_sharded(executor, 'products', counts['products'], start_ids['products'], **options):
+            insert_data(conn, shard, 'products', batch_size=batch_size)
+            products.append(shard[['product_id', 'product_name', 'selling_price']])
+        products_df = pd.concat(products, ignore_index=True) if products else pd.DataFrame(columns=['product_id', 'product_name', 'selling_price'])
+
+        # Pick the purchases to return up front, so only those rows of each shard are kept
+        returned_ids = start_ids['purchases'] + shard_rng(seed, 'returns', 1).choice(
+            counts['purchases'], min(num_returns, counts['purchases']), replace=False
+        )
+        return_candidates = []
+
+        print(f"Generating and inserting purchase data in shards of {shard_size}...")
+        context = {
+            'client_ids': client_ids,
+            'customer_ids': customer_ids,
+            'products': products_df,
+            'problematic_clients': problematic_clients
+        }
+        for shard in generate_sharded(executor, 'purchases', counts['purchases'], start_ids['purchases'], context=context, **options):
+            insert_data(conn, shard, 'purchases', batch_size=batch_size)
+            return_candidates.append(shard.loc[shard['purchase_id'].isin(returned_ids), RETURN_CANDIDATE_COLUMNS])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not return_candidates:
+        return pd.DataFrame(columns=RETURN_CANDIDATE_COLUMNS)
+    return pd.concat(return_candidates, ignore_index=True)
+
+# Share of the change feed going to each kind of change
+STREAM_MIX = {'purchases': 0.6, 'returns': 0.15, 'customer_updates': 0.15, 'client_updates': 0.1}
+
+# Recent purchases kept as return candidates by the change feed
+STREAM_RETURN_WINDOW = 10000
+
+# Function to load the ids and products the change feed references
+def load_stream_context(conn):
+    cursor = conn.cursor()
+    context = {}
+    for name, table_name, columns in [
+        ('clients', 'client', ['client_id']),
+        ('customers', 'customer', ['customer_id']),
+        ('products', 'products', ['product_id', 'product_name', 'selling_price'])
+    ]:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {qualified_table_name(conn, table_name)}")
+        context[name] = pd.DataFrame.from_records([tuple(row) for row in cursor.fetchall()], columns=columns)
+
+    for name, table_name, key in [('purchases', 'purchases', 'purchase_id'), ('returns', 'returns', 'return_id')]:
+        cursor.execute(f"SELECT MAX({key}) FROM {qualified_table_name(conn, table_name)}")
+        context[f"next_{key}"] = (cursor.fetchone()[0] or 0) + 1
+    return context
+
+# Function to split a batch size between the kinds of change of the feed
+def split_batch(rng, rows):
+    kinds = list(STREAM_MIX)
+    counts = rng.multinomial(rows, [STREAM_MIX[kind] for kind in kinds])
+    return dict(zip(kinds, counts.tolist()))
+
+# Function to draw new contact attributes for existing customers or clients
+def generate_updates(rng, pools, ids, n, with_status=False):
+    now = datetime.now().replace(microsecond=0)
+    updates = pd.DataFrame({
+        'id': sample_values(rng, ids, n),
+        'email': sample_values(rng, pools['email'], n),
+        'city': sample_values(rng, pools['city'], n),
+        'state': sample_values(rng, pools['state'], n),
+        'last_update': now
+    }).drop_duplicates('id')
+    if with_status:
+        updates['status'] = sample_values(rng, CLIENT_STATUSES, len(updates))
+    return updates
+
+# Function to run a change feed of new purchases and returns and updates to customers
+# and clients at a target rate, printing the achieved throughput and write latencies
+def stream_changes(conn, rate=100, duration=60, interval=1.0, seed=42):
+    context = load_stream_context(conn)
+    if context['clients'].empty or context['customers'].empty or context['products'].empty:
+        print("Error: the change feed needs existing clients, customers and products. Seed the database first.")
+        return None
+
+    # Derive the draws from the database state too, so consecutive feeds do not replay the same changes
+    rng = shard_rng(seed, 'stream', context['next_purchase_id'])
+    pools = get_text_pools(seed)
+    problematic_clients = rng.choice(context['clients']['client_id'].to_numpy(), int(len(context['clients']) * 0.3), replace=False)
+    return_candidates = pd.DataFrame(columns=RETURN_CANDIDATE_COLUMNS)
+    totals = dict.fromkeys(STREAM_MIX, 0)
+    latencies = []
+
+    print(f"Streaming changes at {rate} rows/s for {duration}s ({STREAM_MIX})")
+    started = time.perf_counter()
+    emitted = 0
+    while time.perf_counter() - started < duration:
+        # Rate limiter: each batch carries the rows due since the last one, then waits for its slot
+        due = int(rate * min(duration, time.perf_counter() - started + interval)) - emitted
+        counts = split_batch(rng, max(1, due))
+
+        batch_start = time.perf_counter()
+        if counts['purchases']:
+            purchases = generate_purchases_vectorized(rng, pools, context['clients'], context['customers'], context['products'],
+                                                      counts['purchases'], start_id=context['next_purchase_id'],
+                                                      problematic_clients=problematic_clients)
+            purchases['last_update'] = datetime.now().replace(microsecond=0)
+            totals['purchases'] += insert_data(conn, purchases, 'purchases', verbose=False)
+            context['next_purchase_id'] += counts['purchases']
+            return_candidates = pd.concat([return_candidates, purchases[RETURN_CANDIDATE_COLUMNS]], ignore_index=True).tail(STREAM_RETURN_WINDOW)
+
+        returns_count = min(counts['returns'], len(return_candidates))
+        if returns_count:
+            returns = generate_returns_vectorized(rng, pools, return_candidates, returns_count, start_id=context['next_return_id'])
+            returns['last_update'] = datetime.now().replace(microsecond=0)
+            totals['returns'] += insert_data(conn, returns, 'returns', verbose=False)
+            context['next_return_id'] += returns_count
+            return_candidates = return_candidates[~return_candidates['purchase_id'].isin(returns['purchase_id'])]
+
+        if counts['customer_updates']:
+            updates = generate_updates(rng, pools, context['customers']['customer_id'].to_numpy(), counts['customer_updates'])
+            updates = updates.rename(columns={'id': 'customer_id'}).assign(updated_at=updates['last_update'])
+            totals['customer_updates'] += update_data(conn, updates, 'customer', 'customer_id')
+
+        if counts['client_updates']:
+            updates = generate_updates(rng, pools, context['clients']['client_id'].to_numpy(), counts['client_updates'], with_status=True)
+            totals['client_updates'] += update_data(conn, updates.rename(columns={'id': 'client_id'}), 'client', 'client_id')
+
+        latencies.append(time.perf_counter() - batch_start)
+        emitted += sum(counts.values())
+
+        # Sleep until the rows emitted so far are due
+        delay = emitted / rate - (time.perf_counter() - started)
+        if delay > 0:
+            time.sleep(min(delay, max(0.0, duration - (time.perf_counter() - started))))
+
+    elapsed = time.perf_counter() - started
+    written = sum(totals.values())
+    latency_ms = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    summary = {
+        'rows': written,
+        'elapsed_s': round(elapsed, 2),
+        'target_rows_per_s': rate,
+        'achieved_rows_per_s': round(written / elapsed, 1),
+        'batches': len(latencies),
+        'latency_ms': dict(zip(['p50', 'p95', 'p99'], np.round(latency_ms, 1).tolist())),
+        **totals
+    }
+    print(f"Change feed: {written} rows in {elapsed:.1f}s ({summary['achieved_rows_per_s']} rows/s, target {rate}); "
+          f"batch write latency p50 {summary['latency_ms']['p50']} ms, p95 {summary['latency_ms']['p95']} ms, p99 {summary['latency_ms']['p99']} ms")
+    print(f"  {totals}")
+    return summary
 
 # Function to generate and insert all data
-def main(append_only=False, num_clients=50, num_customers=200, num_products=100, num_purchases=500, num_returns=100):
+def main(append_only=False, num_clients=50, num_customers=200, num_products=100, num_purchases=500, num_returns=100, batch_size=DEFAULT_BATCH_SIZE, vectorized=False, seed=42, workers=1, shard_size=DEFAULT_SHARD_SIZE, sqlite_path=None):
     print(f"Running in {'append-only' if append_only else 'recreate tables'} mode")
+
+    # Seed every generator so the output is reproducible
+    Faker.seed(seed)
+    random.seed(seed)
+    np.random.seed(seed)
     
     # Check if tables exist and have data
-    conn = create_connection()
+    conn = create_connection(sqlite_path)
     if conn is None:
         print("Failed to connect to database. Exiting.")
         return
@@ -666,83 +1260,63 @@ def main(append_only=False, num_clients=50, num_customers=200, num_products=100,
         start_return_id = 1
     
     # Generate data
-    print("Generating client data...")
-    clients_df = generate_clients(num_clients, start_id=start_client_id)
-    
-    print("Inserting client data...")
-    insert_data(conn, clients_df, 'client')
-    
-    print("Generating customer data...")
-    customers_df = generate_customers(clients_df, num_customers, start_id=start_customer_id)
-    
-    print("Inserting customer data...")
-    insert_data(conn, customers_df, 'customer')
-    
-    print("Generating product data...")
-    products_df = generate_products(num_products, start_id=start_product_id)
-    
-    print("Inserting product data...")
-    insert_data(conn, products_df, 'products')
-    
-    print("Generating purchase data...")
-    purchases_df = generate_purchases(clients_df, customers_df, products_df, num_purchases, start_id=start_purchase_id)
-    
-    print("Inserting purchase data...")
-    insert_data(conn, purchases_df, 'purchases')
-    
-    # After inserting purchases, retrieve the actual purchases from the database
-    print("Retrieving actual purchases from database...")
-    try:
-        # Tentar obter todos os campos necessários
-        cursor.execute("SELECT purchase_id, client_id, customer_id, product_id, purchase_date, quantity, total_amount FROM purchases")
-        actual_purchases = []
-        for row in cursor.fetchall():
-            actual_purchases.append({
-                'purchase_id': row[0],
-                'client_id': row[1],
-                'customer_id': row[2],
-                'product_id': row[3],
-                'purchase_date': row[4],
-                'quantity': row[5],
-                'total_amount': row[6]
-            })
-    except Exception as e:
-        print(f"Error retrieving purchases with all fields: {e}")
-        print("Trying with fewer fields...")
+    if vectorized:
+        print(f"Using vectorized generation with {workers} worker(s)")
+        return_candidates = generate_and_insert_sharded(
+            conn,
+            start_ids={'clients': start_client_id, 'customers': start_customer_id, 'products': start_product_id, 'purchases': start_purchase_id},
+            counts={'clients': num_clients, 'customers': num_customers, 'products': num_products, 'purchases': num_purchases},
+            seed=seed, workers=workers, shard_size=shard_size, batch_size=batch_size, num_returns=num_returns
+        )
+    else:
+        print("Generating client data...")
+        clients_df = generate_clients(num_clients, start_id=start_client_id)
         
-        # Tentar com menos campos se a primeira tentativa falhar
-        try:
-            cursor.execute("SELECT purchase_id, client_id, customer_id, product_id, purchase_date FROM purchases")
-            actual_purchases = []
-            for row in cursor.fetchall():
-                actual_purchases.append({
-                    'purchase_id': row[0],
-                    'client_id': row[1],
-                    'customer_id': row[2],
-                    'product_id': row[3],
-                    'purchase_date': row[4],
-                    'quantity': 1,  # Valor padrão para quantity
-                    'total_amount': 100.0  # Valor padrão para total_amount
-                })
-        except Exception as e:
-            print(f"Error retrieving purchases with fewer fields: {e}")
-            actual_purchases = []
+        print("Inserting client data...")
+        insert_data(conn, clients_df, 'client', batch_size=batch_size)
+        
+        print("Generating customer data...")
+        customers_df = generate_customers(clients_df, num_customers, start_id=start_customer_id)
+        
+        print("Inserting customer data...")
+        insert_data(conn, customers_df, 'customer', batch_size=batch_size)
+        
+        print("Generating product data...")
+        products_df = generate_products(num_products, start_id=start_product_id)
+        
+        print("Inserting product data...")
+        insert_data(conn, products_df, 'products', batch_size=batch_size)
+        
+        print("Generating purchase data...")
+        purchases_df = generate_purchases(clients_df, customers_df, products_df, num_purchases, start_id=start_purchase_id)
+        
+        print("Inserting purchase data...")
+        insert_data(conn, purchases_df, 'purchases', batch_size=batch_size)
+        return_candidates = purchases_df[RETURN_CANDIDATE_COLUMNS]
     
-    if not actual_purchases:
-        print("Warning: No purchases available in the database to generate returns.")
+    # Returns are drawn from the purchases generated by this run; an append run
+    # without new purchases samples existing ones by key instead of reading the table
+    if return_candidates.empty and append_only and num_returns > 0:
+        print("Sampling existing purchases from database...")
+        return_candidates = fetch_return_candidates(conn, num_returns, seed=seed)
+    
+    if return_candidates.empty:
+        print("Warning: No purchases available to generate returns.")
     else:
-        print(f"Found {len(actual_purchases)} purchases in database for generating returns.")
-        
-        # Convert to DataFrame
-        actual_purchases_df = pd.DataFrame(actual_purchases)
+        print(f"Using {len(return_candidates)} purchases as return candidates.")
         
-        print("Generating return data based on actual purchases...")
-        returns_df = generate_returns(actual_purchases_df, clients_df, customers_df, products_df, 
-                                      num_returns=min(num_returns, len(actual_purchases)), 
-                                      start_id=start_return_id)
+        print("Generating return data...")
+        if vectorized:
+            returns_df = generate_returns_vectorized(shard_rng(seed, 'returns'), get_text_pools(seed), return_candidates,
+                                                     num_returns=min(num_returns, len(return_candidates)),
+                                                     start_id=start_return_id)
+        else:
+            returns_df = generate_returns(return_candidates, clients_df, customers_df, products_df, 
+                                          num_returns=min(num_returns, len(return_candidates)), 
+                                          start_id=start_return_id)
         
         print("Inserting return data...")
-        insert_data(conn, returns_df, 'returns')
+        insert_data(conn, returns_df, 'returns', batch_size=batch_size)
     
     # Close connection
     conn.close()
@@ -758,14 +1332,39 @@ if __name__ == "__main__":
     parser.add_argument('--products', type=int, default=100, help='Number of products to generate')
     parser.add_argument('--purchases', type=int, default=500, help='Number of purchases to generate')
     parser.add_argument('--returns', type=int, default=100, help='Number of returns to generate')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Number of rows sent to the database per batch')
+    parser.add_argument('--vectorized', action='store_true', help='Generate rows with vectorized NumPy draws (for high volumes)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes generating shards (implies --vectorized)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Number of ids generated per shard (implies --vectorized)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed used by the generators')
+    parser.add_argument('--sqlite', metavar='PATH', help='Write to a local SQLite file instead of SQL Server (tables are created when missing)')
+    parser.add_argument('--stream', action='store_true', help='Run a change feed of new purchases/returns and customer/client updates against existing data')
+    parser.add_argument('--rate', type=float, default=100, help='Target rows per second of the change feed')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds the change feed runs for')
     
     args = parser.parse_args()
     
+    if args.stream:
+        stream_conn = create_connection(args.sqlite)
+        if stream_conn is None:
+            raise SystemExit("Failed to connect to database. Exiting.")
+        try:
+            stream_changes(stream_conn, rate=args.rate, duration=args.duration, seed=args.seed)
+        finally:
+            stream_conn.close()
+        raise SystemExit(0)
+    
     main(
         append_only=args.append,
         num_clients=args.clients,
         num_customers=args.customers,
         num_products=args.products,
         num_purchases=args.purchases,
-        num_returns=args.returns
+        num_returns=args.returns,
+        batch_size=args.batch_size,
+        vectorized=args.vectorized or args.workers > 1 or args.shard_size != DEFAULT_SHARD_SIZE,
+        seed=args.seed,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        sqlite_path=args.sqlite
     )
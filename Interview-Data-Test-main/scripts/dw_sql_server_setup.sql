@@ -21,11 +21,16 @@ SELECT @should_drop_tables = drop_tables FROM #setup_params;
 IF @should_drop_tables = 1
 BEGIN
     PRINT 'Dropping existing tables...';
+    IF OBJECT_ID('dbo.agg_customer_sales', 'U') IS NOT NULL DROP TABLE dbo.agg_customer_sales;
+    IF OBJECT_ID('dbo.agg_monthly_product_sales', 'U') IS NOT NULL DROP TABLE dbo.agg_monthly_product_sales;
+    IF OBJECT_ID('dbo.agg_customer_returns', 'U') IS NOT NULL DROP TABLE dbo.agg_customer_returns;
+    -- Facts first, they reference the dimensions
+    IF OBJECT_ID('dbo.fact_returns', 'U') IS NOT NULL DROP TABLE dbo.fact_returns;
+    IF OBJECT_ID('dbo.fact_sales', 'U') IS NOT NULL DROP TABLE dbo.fact_sales;
     IF OBJECT_ID('dbo.dim_products', 'U') IS NOT NULL DROP TABLE dbo.dim_products;
     IF OBJECT_ID('dbo.dim_customers', 'U') IS NOT NULL DROP TABLE dbo.dim_customers;
     IF OBJECT_ID('dbo.dim_clients', 'U') IS NOT NULL DROP TABLE dbo.dim_clients;
-    IF OBJECT_ID('dbo.fact_returns', 'U') IS NOT NULL DROP TABLE dbo.fact_returns;
-    IF OBJECT_ID('dbo.fact_sales', 'U') IS NOT NULL DROP TABLE dbo.fact_sales;
+    IF OBJECT_ID('dbo.dim_date', 'U') IS NOT NULL DROP TABLE dbo.dim_date;
 END
 ELSE
 BEGIN
@@ -37,7 +42,8 @@ IF OBJECT_ID('dbo.dim_clients', 'U') IS NULL
 BEGIN
     -- Create dim_clients table
     CREATE TABLE dbo.dim_clients (
-        client_id INT PRIMARY KEY,
+        client_key INT PRIMARY KEY,
+        client_id INT NOT NULL,
         company_name NVARCHAR(255),
         contact_name NVARCHAR(255),
         email NVARCHAR(255),
@@ -46,14 +52,22 @@ BEGIN
         state NVARCHAR(100),
         country NVARCHAR(100),
         status NVARCHAR(50),
+        row_hash BIGINT,
+        valid_from DATETIME2,
+        valid_to DATETIME2,
+        is_current BIT NOT NULL DEFAULT 1
     );
+
+    -- Current version lookup of the type 2 history
+    CREATE INDEX ix_dim_clients_client_id ON dbo.dim_clients (client_id, is_current);
 END
 
 IF OBJECT_ID('dbo.dim_customers', 'U') IS NULL
 BEGIN
     -- Create dim_customers table
     CREATE TABLE dbo.dim_customers (
-        customer_id INT PRIMARY KEY,
+        customer_key INT PRIMARY KEY,
+        customer_id INT NOT NULL,
         first_name NVARCHAR(255),
         last_name NVARCHAR(255),
         email NVARCHAR(255),
@@ -62,14 +76,22 @@ BEGIN
         state NVARCHAR(100),
         country NVARCHAR(100),
         birth_date DATE,
+        row_hash BIGINT,
+        valid_from DATETIME2,
+        valid_to DATETIME2,
+        is_current BIT NOT NULL DEFAULT 1
     );
+
+    -- Current version lookup of the type 2 history
+    CREATE INDEX ix_dim_customers_customer_id ON dbo.dim_customers (customer_id, is_current);
 END
 
 IF OBJECT_ID('dbo.dim_products', 'U') IS NULL
 BEGIN
     -- Create dim_products table
     CREATE TABLE dbo.dim_products (
-        product_id INT PRIMARY KEY,
+        product_key INT PRIMARY KEY,
+        product_id INT NOT NULL,
         product_name NVARCHAR(255),
         category NVARCHAR(100),
         sub_category NVARCHAR(100),
@@ -79,24 +101,50 @@ BEGIN
     );
 END
 
+IF OBJECT_ID('dbo.dim_date', 'U') IS NULL
+BEGIN
+    -- Create dim_date table (date_key is yyyymmdd, -1 for unknown dates)
+    CREATE TABLE dbo.dim_date (
+        date_key INT PRIMARY KEY,
+        full_date DATE,
+        year SMALLINT,
+        quarter TINYINT,
+        month TINYINT,
+        month_name NVARCHAR(20),
+        year_month INT,
+        week_of_year TINYINT,
+        day_of_month TINYINT,
+        day_of_year SMALLINT,
+        day_of_week TINYINT,
+        day_name NVARCHAR(20),
+        is_weekend BIT,
+        fiscal_year SMALLINT,
+        fiscal_quarter TINYINT,
+        fiscal_month TINYINT
+    );
+END
+
 IF OBJECT_ID('dbo.fact_sales', 'U') IS NULL
 BEGIN
     -- Create fact_sales table
     CREATE TABLE dbo.fact_sales (
         purchase_id INT PRIMARY KEY,
-        client_id INT,
-        customer_id INT,
-        product_id INT,
-        purchase_date DATE,
+        client_key INT NOT NULL,
+        customer_key INT NOT NULL,
+        product_key INT NOT NULL,
+        purchase_date_key INT NOT NULL,
         quantity INT,
         unit_price DECIMAL(18,2),
         total_amount DECIMAL(18,2),
         payment_method NVARCHAR(50),
         payment_status NVARCHAR(50),
-        FOREIGN KEY (client_id) REFERENCES dim_clients(client_id),
-        FOREIGN KEY (customer_id) REFERENCES dim_customers(customer_id),
-        FOREIGN KEY (product_id) REFERENCES dim_products(product_id)
+        FOREIGN KEY (client_key) REFERENCES dim_clients(client_key),
+        FOREIGN KEY (customer_key) REFERENCES dim_customers(customer_key),
+        FOREIGN KEY (product_key) REFERENCES dim_products(product_key),
+        FOREIGN KEY (purchase_date_key) REFERENCES dim_date(date_key)
     );
+
+    CREATE INDEX ix_fact_sales_purchase_date_key ON dbo.fact_sales (purchase_date_key);
 END
 
 IF OBJECT_ID('dbo.fact_returns', 'U') IS NULL
@@ -105,17 +153,56 @@ BEGIN
     CREATE TABLE dbo.fact_returns (
         return_id INT PRIMARY KEY,
         purchase_id INT,
-        client_id INT,
-        customer_id INT,
-        product_id INT,
-        return_date DATE,
+        client_key INT NOT NULL,
+        customer_key INT NOT NULL,
+        product_key INT NOT NULL,
+        return_date_key INT NOT NULL,
         quantity INT,
         refund_amount DECIMAL(18,2),
         status NVARCHAR(50),
         FOREIGN KEY (purchase_id) REFERENCES fact_sales(purchase_id),
-        FOREIGN KEY (client_id) REFERENCES dim_clients(client_id),
-        FOREIGN KEY (customer_id) REFERENCES dim_customers(customer_id),
-        FOREIGN KEY (product_id) REFERENCES dim_products(product_id)
+        FOREIGN KEY (client_key) REFERENCES dim_clients(client_key),
+        FOREIGN KEY (customer_key) REFERENCES dim_customers(customer_key),
+        FOREIGN KEY (product_key) REFERENCES dim_products(product_key),
+        FOREIGN KEY (return_date_key) REFERENCES dim_date(date_key)
+    );
+
+    CREATE INDEX ix_fact_returns_return_date_key ON dbo.fact_returns (return_date_key);
+END
+
+-- Summary tables maintained by the ETL from each load's delta; the customer
+-- ones are per customer_id, summed over the versions of its history
+IF OBJECT_ID('dbo.agg_customer_sales', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.agg_customer_sales (
+        customer_id INT PRIMARY KEY,
+        purchase_count BIGINT NOT NULL,
+        total_quantity BIGINT NOT NULL,
+        total_amount DECIMAL(18,2) NOT NULL
+    );
+END
+
+IF OBJECT_ID('dbo.agg_monthly_product_sales', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.agg_monthly_product_sales (
+        year_month INT NOT NULL,
+        product_key INT NOT NULL,
+        sales_count BIGINT NOT NULL,
+        total_quantity BIGINT NOT NULL,
+        total_amount DECIMAL(18,2) NOT NULL,
+        total_unit_price DECIMAL(18,2) NOT NULL,
+        PRIMARY KEY (year_month, product_key)
+    );
+END
+
+IF OBJECT_ID('dbo.agg_customer_returns', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.agg_customer_returns (
+        customer_id INT PRIMARY KEY,
+        return_count BIGINT NOT NULL,
+        total_quantity BIGINT NOT NULL,
+        total_refunded DECIMAL(18,2) NOT NULL,
+        risky_return_count BIGINT NOT NULL
     );
 END
 
@@ -0,0 +1,197 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+logger = logging.getLogger('etl_process')
+
+# Summary tables kept for the analysis queries. Each one groups a fact table
+# by the 'group_by' expressions and sums the 'measures' expressions, so it can
+# be maintained from the delta of every load (new rows minus the rows they replace).
+# 'join' adds a table to the rows' FROM clause, {table} standing for the fact
+# (or staging) table: the customer tables group by the customer_id of the
+# version each fact points at, so a customer's totals span its whole type 2 history.
+# 'lookup' names a fact the join reads, {lookup} standing for it (or its staging
+# table): its loads change the measures of the rows referencing the loaded keys
+CUSTOMER_JOIN = "JOIN dim_customers ON dim_customers.customer_key = {table}.customer_key"
+RETURNED_SALE_JOIN = "LEFT JOIN {lookup} AS returned_sale ON returned_sale.purchase_id = {table}.purchase_id"
+
+AGGREGATES = {
+    'agg_customer_sales': {
+        'source': 'fact_sales',
+        'join': CUSTOMER_JOIN,
+        'group_by': {'customer_id': 'dim_customers.customer_id'},
+        'measures': {
+            'purchase_count': '1',
+            'total_quantity': 'quantity',
+            'total_amount': 'total_amount'
+        }
+    },
+    'agg_monthly_product_sales': {
+        'source': 'fact_sales',
+        'group_by': {'year_month': 'purchase_date_key / 100', 'product_key': 'product_key'},
+        'measures': {
+            'sales_count': '1',
+            'total_quantity': 'quantity',
+            'total_amount': 'total_amount',
+            'total_unit_price': 'unit_price'
+        }
+    },
+    'agg_customer_returns': {
+        'source': 'fact_returns',
+        'join': f"{CUSTOMER_JOIN} {RETURNED_SALE_JOIN}",
+        'lookup': {'table': 'fact_sales', 'key': 'purchase_id'},
+        'group_by': {'customer_id': 'dim_customers.customer_id'},
+        'measures': {
+            'return_count': '1',
+            'total_quantity': '{table}.quantity',
+            'total_refunded': 'refund_amount',
+            # Returns of purchases whose payment was refunded or failed
+            'risky_return_count': "CASE WHEN returned_sale.payment_status IN ('refunded', 'failed') THEN 1 ELSE 0 END"
+        }
+    }
+}
+
+
+class AggregateMaintainer:
+    """Maintain the AGGREGATES tables incrementally and check them against a full recompute."""
+
+    def __init__(self, aggregates=AGGREGATES):
+        """
+        Initialize the maintainer.
+
+        Args:
+            aggregates (dict): Aggregate table definitions (see AGGREGATES)
+        """
+        self.aggregates = aggregates
+
+    def tables_of(self, fact_table):
+        """Return the aggregate tables computed from a fact table."""
+        return [name for name, spec in self.aggregates.items() if spec['source'] == fact_table]
+
+    def lookups_of(self, fact_table):
+        """Return the aggregate tables whose measures look up a fact table."""
+        return [name for name, spec in self.aggregates.items() if spec.get('lookup', {}).get('table') == fact_table]
+
+    def select_rows(self, spec, table_name, sign='', where='', lookup_table=None):
+        """Return the SELECT projecting the rows of a table onto an aggregate's groups and measures."""
+        names = {'table': table_name}
+        if 'lookup' in spec:
+            names['lookup'] = lookup_table or spec['lookup']['table']
+        groups = [f"{expression} AS {column}" for column, expression in spec['group_by'].items()]
+        measures = [
+            f"{sign}COALESCE({expression.format(**names)}, 0) AS {column}"
+            for column, expression in spec['measures'].items()
+        ]
+        join = f" {spec['join'].format(**names)}" if 'join' in spec else ''
+        return f"SELECT {', '.join(groups + measures)} FROM {table_name}{join}{where}"
+
+    def grouped(self, spec, rows):
+        """Return the query summing projected rows per group."""
+        groups = ', '.join(spec['group_by'])
+        sums = ', '.join(f"SUM({column}) AS {column}" for column in spec['measures'])
+        return f"SELECT {groups}, {sums} FROM ({rows}) AS rows_ GROUP BY {groups}"
+
+    def apply_delta(self, conn, fact_table, staging_table, key):
+        """
+        Add the effect of a staged fact batch to the aggregates, before the batch is merged.
+
+        The delta is the staged rows minus the fact rows they are about to
+        replace, so updated facts are counted once with their new values.
+        Aggregates looking the fact table up get the rows referencing the
+        staged keys, read against the batch minus the same rows read
+        against the facts it replaces.
+
+        Args:
+            conn (sqlalchemy.engine.Connection): Connection inside the load transaction
+            fact_table (str): Fact table being loaded
+            staging_table (str): Staging table holding the batch
+            key (str): Key column of the fact table
+        """
+        for name in self.tables_of(fact_table):
+            spec = self.aggregates[name]
+            replaced = f" WHERE {fact_table}.{key} IN (SELECT {key} FROM {staging_table})"
+            rows = (
+                f"{self.select_rows(spec, staging_table)} "
+                f"UNION ALL {self.select_rows(spec, fact_table, sign='-', where=replaced)}"
+            )
+            self.add(conn, name, spec, self.grouped(spec, rows))
+
+        for name in self.lookups_of(fact_table):
+            spec = self.aggregates[name]
+            source, lookup_key = spec['source'], spec['lookup']['key']
+            referencing = f" WHERE {source}.{lookup_key} IN (SELECT {lookup_key} FROM {staging_table})"
+            rows = (
+                f"{self.select_rows(spec, source, where=referencing, lookup_table=staging_table)} "
+                f"UNION ALL {self.select_rows(spec, source, sign='-', where=referencing)}"
+            )
+            self.add(conn, name, spec, self.grouped(spec, rows))
+
+    def add(self, conn, name, spec, delta):
+        """Add the measures of a grouped delta query into an aggregate table."""
+        groups = list(spec['group_by'])
+        measures = list(spec['measures'])
+        columns = ', '.join(groups + measures)
+
+        if conn.dialect.name == 'sqlite':
+            query = f"""
+                INSERT INTO {name} ({columns})
+                SELECT {columns} FROM ({delta}) AS delta WHERE true
+                ON CONFLICT ({', '.join(groups)}) DO UPDATE SET
+                {', '.join(f'{column} = {name}.{column} + excluded.{column}' for column in measures)}
+            """
+        else:
+            query = f"""
+                MERGE {name} AS t
+                USING ({delta}) AS s ON {' AND '.join(f't.{column} = s.{column}' for column in groups)}
+                WHEN MATCHED THEN
+                    UPDATE SET {', '.join(f'{column} = t.{column} + s.{column}' for column in measures)}
+                WHEN NOT MATCHED THEN
+                    INSERT ({columns}) VALUES ({', '.join(f's.{column}' for column in groups + measures)});
+            """
+        conn.execute(sqlalchemy.text(query))
+
+    def recompute(self, conn, name):
+        """Return the content of an aggregate table computed from scratch."""
+        spec = self.aggregates[name]
+        return pd.read_sql(sqlalchemy.text(self.grouped(spec, self.select_rows(spec, spec['source']))), conn)
+
+    def rebuild(self, conn):
+        """Replace every aggregate table with a full recompute."""
+        for name, spec in self.aggregates.items():
+            conn.execute(sqlalchemy.text(f"DELETE FROM {name}"))
+            self.add(conn, name, spec, self.grouped(spec, self.select_rows(spec, spec['source'])))
+            logger.info(f"Rebuilt {name}")
+
+    def validate(self, conn, tolerance=0.01):
+        """
+        Compare every aggregate table with a full recompute.
+
+        Args:
+            conn (sqlalchemy.engine.Connection): Warehouse connection
+            tolerance (float): Absolute difference allowed on each measure
+
+        Returns:
+            dict: Aggregate table to the number of groups that differ
+        """
+        mismatches = {}
+        for name, spec in self.aggregates.items():
+            groups = list(spec['group_by'])
+            measures = list(spec['measures'])
+            stored = pd.read_sql(sqlalchemy.text(f"SELECT {', '.join(groups + measures)} FROM {name}"), conn)
+            expected = self.recompute(conn, name)
+
+            compared = stored.merge(expected, on=groups, how='outer', suffixes=('_stored', '_expected'))
+            differs = np.zeros(len(compared), dtype=bool)
+            for column in measures:
+                stored_values = pd.to_numeric(compared[f"{column}_stored"]).fillna(0).to_numpy(float)
+                expected_values = pd.to_numeric(compared[f"{column}_expected"]).fillna(0).to_numpy(float)
+                differs |= np.abs(stored_values - expected_values) > tolerance
+
+            mismatches[name] = int(differs.sum())
+            if mismatches[name]:
+                logger.warning(f"{name}: {mismatches[name]} groups differ from a full recompute")
+            else:
+                logger.info(f"{name}: matches a full recompute ({len(compared)} groups)")
+        return mismatches
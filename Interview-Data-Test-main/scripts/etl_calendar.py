@@ -0,0 +1,139 @@
+import logging
+
+import pandas as pd
+import sqlalchemy
+
+logger = logging.getLogger('etl_process')
+
+# Key of the dim_date row facts without a (valid) date point at
+UNKNOWN_DATE_KEY = -1
+
+DATE_COLUMNS = [
+    'date_key', 'full_date', 'year', 'quarter', 'month', 'month_name', 'year_month',
+    'week_of_year', 'day_of_month', 'day_of_year', 'day_of_week', 'day_name', 'is_weekend',
+    'fiscal_year', 'fiscal_quarter', 'fiscal_month'
+]
+
+
+def date_keys(values):
+    """
+    Convert dates to integer yyyymmdd keys.
+
+    Args:
+        values (pd.Series): Dates (datetime64 or parseable values)
+
+    Returns:
+        pd.Series: int64 keys, UNKNOWN_DATE_KEY where the date is missing
+    """
+    dates = pd.to_datetime(values, errors='coerce')
+    keys = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+    return keys.fillna(UNKNOWN_DATE_KEY).astype('int64')
+
+
+def build_calendar(start, end, fiscal_year_start_month=7):
+    """
+    Generate the dim_date rows of every day between two dates.
+
+    Args:
+        start (datetime): First day
+        end (datetime): Last day (included)
+        fiscal_year_start_month (int): Month the fiscal year starts in; fiscal
+            years are named after the calendar year they end in
+
+    Returns:
+        pd.DataFrame: One row per day with the DATE_COLUMNS
+    """
+    days = pd.Series(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D'))
+    month = days.dt.month
+    fiscal_offset = (month - fiscal_year_start_month) % 12
+
+    return pd.DataFrame({
+        'date_key': date_keys(days),
+        'full_date': days,
+        'year': days.dt.year,
+        'quarter': days.dt.quarter,
+        'month': month,
+        'month_name': days.dt.month_name(),
+        'year_month': days.dt.year * 100 + month,
+        'week_of_year': days.dt.isocalendar().week.astype('int64'),
+        'day_of_month': days.dt.day,
+        'day_of_year': days.dt.dayofyear,
+        'day_of_week': days.dt.dayofweek + 1,
+        'day_name': days.dt.day_name(),
+        'is_weekend': (days.dt.dayofweek >= 5).astype('int64'),
+        'fiscal_year': days.dt.year + (month >= fiscal_year_start_month).astype('int64') * (fiscal_year_start_month > 1),
+        'fiscal_quarter': fiscal_offset // 3 + 1,
+        'fiscal_month': fiscal_offset + 1
+    }, columns=DATE_COLUMNS)
+
+
+def unknown_date():
+    """Build the dim_date row of unknown dates."""
+    row = {column: None for column in DATE_COLUMNS}
+    row.update({'date_key': UNKNOWN_DATE_KEY, 'month_name': 'Unknown', 'day_name': 'Unknown'})
+    return pd.DataFrame([row], columns=DATE_COLUMNS)
+
+
+class DateDimension:
+    """
+    Keep dim_date covering the span of the fact dates.
+
+    The span already in the warehouse is read on first use; dates outside it
+    extend the calendar, so only the missing days are generated and loaded.
+    """
+
+    def __init__(self, fiscal_year_start_month=7):
+        """
+        Initialize the dimension.
+
+        Args:
+            fiscal_year_start_month (int): Month the fiscal year starts in
+        """
+        self.fiscal_year_start_month = fiscal_year_start_month
+        self.span = None
+
+    def load_span(self, conn):
+        """Read the first and last day of the calendar already in the warehouse."""
+        first, last = pd.read_sql(
+            sqlalchemy.text(f"SELECT MIN(date_key), MAX(date_key) FROM dim_date WHERE date_key <> {UNKNOWN_DATE_KEY}"),
+            conn
+        ).iloc[0]
+        if pd.notna(first):
+            self.span = (pd.to_datetime(str(int(first))), pd.to_datetime(str(int(last))))
+
+    def extend(self, dates, conn):
+        """
+        Return the calendar days missing for a batch of fact dates.
+
+        Args:
+            dates (pd.Series): Fact dates (may hold nulls)
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used to read the existing span
+
+        Returns:
+            pd.DataFrame: dim_date rows to load (empty when the span already covers the dates)
+        """
+        dates = pd.to_datetime(dates, errors='coerce').dropna()
+        if dates.empty:
+            return pd.DataFrame(columns=DATE_COLUMNS)
+
+        if self.span is None:
+            self.load_span(conn)
+
+        low, high = dates.min().normalize(), dates.max().normalize()
+        if self.span is None:
+            parts = [build_calendar(low, high, self.fiscal_year_start_month)]
+            self.span = (low, high)
+        else:
+            first, last = self.span
+            parts = []
+            if low < first:
+                parts.append(build_calendar(low, first - pd.Timedelta(days=1), self.fiscal_year_start_month))
+            if high > last:
+                parts.append(build_calendar(last + pd.Timedelta(days=1), high, self.fiscal_year_start_month))
+            self.span = (min(low, first), max(high, last))
+
+        if not parts:
+            return pd.DataFrame(columns=DATE_COLUMNS)
+        calendar = pd.concat(parts, ignore_index=True)
+        logger.info(f"Extending dim_date with {len(calendar)} days ({calendar['full_date'].min():%Y-%m-%d} to {calendar['full_date'].max():%Y-%m-%d})")
+        return calendar
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime
+
+from scripts.etl_staging import ParquetStage
+
+logger = logging.getLogger('etl_process')
+
+# Markers recorded by a run:
+#   extract               : the extracted tables are in <run>/extract/
+#   transform             : the warehouse tables built from them are in <run>/transform/
+#   load:<table>          : a warehouse table was loaded (batch mode)
+#   load:<dataset>        : every chunk of a dataset was loaded (streaming mode)
+# Streaming mode also records, per dataset, the last source key of the chunks
+# already loaded, so a resumed run only reads the rows after it
+EXTRACT = 'extract'
+TRANSFORM = 'transform'
+
+
+def to_json_value(value):
+    """Convert a watermark or key value to a JSON-storable one (dates as ISO strings)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class RunCheckpoint:
+    """
+    Record the completed work of a run so a rerun with the same run id skips it.
+
+    Each run gets a directory under the checkpoint root holding a JSON
+    manifest (the completion markers and the state needed to resume, such
+    as pending watermarks) and the Parquet outputs of the completed stages.
+    The manifest is rewritten atomically after every marker, so a failure
+    loses at most the table or chunk being loaded.
+    """
+
+    def __init__(self, run_id, root=os.path.join('data', 'checkpoints'), resume=False):
+        """
+        Initialize the checkpoint of a run.
+
+        Args:
+            run_id (str): Run identifier, the name of the run's directory
+            root (str): Directory holding the checkpoints of all runs
+            resume (bool): Continue an existing run instead of starting a new one
+
+        Raises:
+            FileNotFoundError: When resuming a run that has no checkpoint
+        """
+        self.run_id = run_id
+        self.resumed = resume
+        self.dir = os.path.join(root, run_id)
+        self.path = os.path.join(self.dir, 'manifest.json')
+        self.lock = threading.Lock()
+        self.frames = ParquetStage(
+            raw_dir=os.path.join(self.dir, EXTRACT),
+            processed_dir=os.path.join(self.dir, TRANSFORM)
+        )
+
+        if resume:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No checkpoint for run {run_id} in {root}")
+            with open(self.path) as f:
+                self.manifest = json.load(f)
+            logger.info(f"Resuming run {run_id}, completed: {sorted(self.manifest['completed'])}")
+        else:
+            self.manifest = {'run_id': run_id, 'status': 'running', 'settings': {}, 'completed': {}, 'state': {}}
+            self.save()
+            logger.info(f"Checkpointing run {run_id} to {self.dir}")
+
+    @staticmethod
+    def new_run_id():
+        """Return an identifier for a new run, based on the current time."""
+        return datetime.now().strftime('%Y%m%dT%H%M%S')
+
+    def check_settings(self, **settings):
+        """
+        Record the settings a run's checkpoint depends on, or check a resumed run uses the same ones.
+
+        Raises:
+            ValueError: When a resumed run changed one of them
+        """
+        saved = self.manifest['settings']
+        changed = {name: (saved[name], value) for name, value in settings.items() if name in saved and saved[name] != value}
+        if changed:
+            raise ValueError(f"Run {self.run_id} was checkpointed with other settings (saved, current): {changed}")
+        saved.update(settings)
+        self.save()
+
+    def is_done(self, marker):
+        """Return whether a unit of work was completed by this run."""
+        return marker in self.manifest['completed']
+
+    def complete(self, marker, **state):
+        """Record a completed unit of work, along with the state to restore on resume."""
+        with self.lock:
+            self.manifest['completed'][marker] = datetime.now().isoformat()
+            self.manifest['state'].update(state)
+            self.save()
+        logger.info(f"Checkpoint {self.run_id}: {marker} done")
+
+    def get_state(self, name, default=None):
+        """Return a piece of state saved with a marker."""
+        return self.manifest['state'].get(name, default)
+
+    def update_state(self, **state):
+        """Save state without completing a marker (e.g. the progress of a stream)."""
+        with self.lock:
+            self.manifest['state'].update(state)
+            self.save()
+
+    def write_frames(self, stage, frames):
+        """Persist the outputs of a stage, one Parquet dataset per table."""
+        for name, df in frames.items():
+            self.frames.write(os.path.join(self.dir, stage, name), df, partitioned=False)
+
+    def read_frames(self, stage, names):
+        """Read back the outputs of a completed stage."""
+        return {name: self.frames.read(os.path.join(self.dir, stage, name)) for name in names}
+
+    def finish(self):
+        """Mark the run as succeeded and drop its stage outputs, keeping the manifest."""
+        with self.lock:
+            self.manifest['status'] = 'succeeded'
+            self.save()
+        for stage in [EXTRACT, TRANSFORM]:
+            shutil.rmtree(os.path.join(self.dir, stage), ignore_errors=True)
+
+    def save(self):
+        """Write the manifest to disk atomically."""
+        os.makedirs(self.dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
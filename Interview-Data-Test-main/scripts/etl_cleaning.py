@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+from scripts.etl_dates import DateNormalizer
+
+# Reusable column rules
+#   type        : 'int' (nullable integer), 'number', 'date' or 'text'
+#   abs         : take the absolute value (negative quantities/prices in the source)
+#   fill        : value used for missing entries
+#   format      : date parsing policy, 'detect' for the DateNormalizer or a format for pd.to_datetime
+#   normalize   : strip whitespace and lowercase
+#   digits_only : drop every non-digit character
+#   snake_case  : replace spaces with underscores (after normalize)
+ID = {'type': 'int'}
+FLAG = {'type': 'int'}
+NUMBER = {'type': 'number', 'fill': 0}
+AMOUNT = {'type': 'number', 'abs': True, 'fill': 0}
+DATE = {'type': 'date', 'format': 'detect'}
+ISO_DATE = {'type': 'date', 'format': 'ISO8601'}
+TEXT = {'type': 'text', 'normalize': True, 'fill': 'Unknown'}
+STATUS = {'type': 'text', 'normalize': True, 'snake_case': True, 'fill': 'Unknown'}
+PHONE = {'type': 'text', 'digits_only': True}
+
+# Cleaning rules for the columns of each dataset; columns not listed are left untouched
+COLUMN_RULES = {
+    'clients': {
+        'client_id': ID,
+        'company_name': TEXT,
+        'contact_name': TEXT,
+        'email': TEXT,
+        'phone': PHONE,
+        'address': TEXT,
+        'city': TEXT,
+        'state': TEXT,
+        'zip_code': TEXT,
+        'country': TEXT,
+        'registration_date': DATE,
+        'status': STATUS,
+        'credit_limit': NUMBER,
+        'last_update': ISO_DATE
+    },
+    'customers': {
+        'customer_id': ID,
+        'client_id': ID,
+        'first_name': TEXT,
+        'last_name': TEXT,
+        'email': TEXT,
+        'phone': PHONE,
+        'birth_date': DATE,
+        'address': TEXT,
+        'city': TEXT,
+        'state': TEXT,
+        'zip_code': TEXT,
+        'country': TEXT,
+        'registration_date': DATE,
+        'last_login': DATE,
+        'updated_at': ISO_DATE,
+        'last_update': ISO_DATE
+    },
+    'products': {
+        'product_id': ID,
+        'product_name': TEXT,
+        'description': TEXT,
+        'category': TEXT,
+        'sub_category': TEXT,
+        'supplier': TEXT,
+        'cost_price': NUMBER,
+        'selling_price': NUMBER,
+        'stock_quantity': NUMBER,
+        'min_stock_level': NUMBER,
+        'is_active': FLAG,
+        'is_apparel': FLAG,
+        'created_at': ISO_DATE,
+        'updated_at': ISO_DATE,
+        'last_update': ISO_DATE
+    },
+    'purchases': {
+        'purchase_id': ID,
+        'client_id': ID,
+        'customer_id': ID,
+        'product_id': ID,
+        'purchase_date': DATE,
+        'quantity': AMOUNT,
+        'unit_price': AMOUNT,
+        'total_amount': NUMBER,
+        'payment_method': TEXT,
+        'payment_status': STATUS,
+        'shipping_address': TEXT,
+        'shipping_city': TEXT,
+        'shipping_state': TEXT,
+        'shipping_zip': TEXT,
+        'shipping_country': TEXT,
+        'shipping_date': DATE,
+        'delivery_date': DATE,
+        'notes': TEXT,
+        'last_update': ISO_DATE
+    },
+    'returns': {
+        'return_id': ID,
+        'purchase_id': ID,
+        'client_id': ID,
+        'customer_id': ID,
+        'product_id': ID,
+        'return_date': DATE,
+        'quantity': AMOUNT,
+        'reason': TEXT,
+        'refund_amount': AMOUNT,
+        'status': STATUS,
+        'processed_by': TEXT,
+        'notes': TEXT,
+        'last_update': ISO_DATE
+    }
+}
+
+
+class CleaningPlan:
+    """Column rules of one dataset compiled into grouped, vectorized operations."""
+
+    def __init__(self, rules, dataset=None):
+        """
+        Compile the rules once so every DataFrame is cleaned in a single pass.
+
+        Args:
+            rules (dict): Column name to rule mapping (see COLUMN_RULES)
+            dataset (str, optional): Dataset name used to label date format counts
+        """
+        self.dataset = dataset
+        self.integers = []
+        self.numbers = []
+        self.absolute = []
+        self.dates = []
+        self.texts = []
+        self.fills = {}
+
+        for column, rule in rules.items():
+            kind = rule['type']
+            if kind == 'int':
+                self.integers.append(column)
+            elif kind == 'number':
+                self.numbers.append(column)
+            elif kind == 'date':
+                self.dates.append((column, rule.get('format')))
+            elif kind == 'text':
+                self.texts.append((column, rule.get('normalize', False), rule.get('digits_only', False), rule.get('snake_case', False)))
+            else:
+                raise ValueError(f"Unknown rule type '{kind}' for column {column}")
+
+            if rule.get('abs'):
+                self.absolute.append(column)
+            if 'fill' in rule:
+                self.fills[column] = rule['fill']
+
+    def apply(self, df, date_normalizer=None, pushed_down=frozenset()):
+        """
+        Clean a DataFrame according to the compiled rules.
+
+        Args:
+            df (pd.DataFrame): Data to clean
+            date_normalizer (DateNormalizer, optional): Parser for 'detect' date columns
+            pushed_down (set, optional): Columns whose text or absolute value rule the
+                extraction query already applied; they only get their type and fill
+
+        Returns:
+            pd.DataFrame: Cleaned data
+        """
+        present = set(df.columns)
+        date_normalizer = date_normalizer or DateNormalizer()
+
+        numbers = [column for column in self.numbers if column in present]
+        if numbers:
+            df[numbers] = df[numbers].apply(pd.to_numeric, errors='coerce')
+
+        integers = [column for column in self.integers if column in present]
+        if integers:
+            df[integers] = df[integers].apply(pd.to_numeric, errors='coerce').astype('Int64')
+
+        absolute = [column for column in self.absolute if column in present and column not in pushed_down]
+        if absolute:
+            df[absolute] = df[absolute].abs()
+
+        for column, date_format in self.dates:
+            # Skip columns already parsed (e.g. a chunk cleaned twice)
+            if column not in present or pd.api.types.is_datetime64_any_dtype(df[column]):
+                continue
+            if date_format == 'detect':
+                label = f"{self.dataset}.{column}" if self.dataset else column
+                df[column] = date_normalizer.parse(df[column], label)
+            else:
+                df[column] = pd.to_datetime(df[column], errors='coerce', format=date_format)
+
+        for column, normalize, digits_only, snake_case in self.texts:
+            if column not in present or column in pushed_down:
+                continue
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                # Clean the distinct values once and recode the rows onto them
+                df[column] = self.clean_categories(df[column], normalize, digits_only, snake_case)
+            elif pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column]):
+                df[column] = self.clean_text(df[column], normalize, digits_only, snake_case)
+
+        fills = {column: value for column, value in self.fills.items() if column in present}
+        for column, value in fills.items():
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype) and value not in values.cat.categories:
+                df[column] = values.cat.add_categories([value])
+        if fills:
+            df = df.fillna(fills)
+
+        return df
+
+    def clean_text(self, values, normalize, digits_only, snake_case):
+        """Apply the text rules to a Series of strings."""
+        if digits_only:
+            values = values.str.replace(r'\D', '', regex=True)
+        if normalize:
+            values = values.str.strip().str.lower()
+        if snake_case:
+            values = values.str.replace(' ', '_', regex=False)
+        return values
+
+    def clean_categories(self, values, normalize, digits_only, snake_case):
+        """Apply the text rules to the categories of a categorical Series, merging those that become equal."""
+        if values.cat.categories.empty:
+            return values
+        categories = pd.Series(values.cat.categories.to_numpy(object), dtype=object)
+        cleaned = self.clean_text(categories.astype(str), normalize, digits_only, snake_case)
+        new_codes, uniques = pd.factorize(cleaned)
+
+        codes = values.cat.codes.to_numpy()
+        codes = np.where(codes >= 0, new_codes[np.maximum(codes, 0)], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=values.index, name=values.name)
+
+
+_plans = {}
+
+
+def get_cleaning_plan(dataset):
+    """Return the compiled cleaning plan of a dataset, compiling it on first use."""
+    if dataset not in _plans:
+        _plans[dataset] = CleaningPlan(COLUMN_RULES[dataset], dataset)
+    return _plans[dataset]
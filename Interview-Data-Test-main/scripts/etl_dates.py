@@ -0,0 +1,111 @@
+import logging
+import threading
+from collections import Counter
+
+import pandas as pd
+
+logger = logging.getLogger('etl_process')
+
+# Date layouts found in the source, matched in order against each raw value.
+# Year-last values follow the generator's separator convention: '/' is
+# day-first (dd/mm/yyyy) and '-' is month-first (mm-dd-yyyy).
+DATE_FORMATS = [
+    ('%Y-%m-%d', r'\d{4}-\d{1,2}-\d{1,2}'),
+    ('%Y/%m/%d', r'\d{4}/\d{1,2}/\d{1,2}'),
+    ('%Y.%m.%d', r'\d{4}\.\d{1,2}\.\d{1,2}'),
+    ('%d/%m/%Y', r'\d{1,2}/\d{1,2}/\d{4}'),
+    ('%m-%d-%Y', r'\d{1,2}-\d{1,2}-\d{4}'),
+    ('%Y-%m-%d %H:%M:%S', r'\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{2}:\d{2}'),
+    ('%Y-%m-%d %I:%M %p', r'\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{2} [AaPp][Mm]'),
+    ('%d/%m/%Y %H:%M', r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}'),
+    ('%m-%d-%Y %H:%M', r'\d{1,2}-\d{1,2}-\d{4} \d{1,2}:\d{2}'),
+    ('ISO8601', r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?')
+]
+
+# Outcome labels for values that do not produce a date
+MISSING = 'missing'
+INVALID = 'invalid'
+UNRECOGNIZED = 'unrecognized'
+
+
+class DateNormalizer:
+    """
+    Parse dirty date columns by classifying each distinct raw value by its
+    layout and parsing each class with an explicit format.
+
+    Parsed values are memoized across calls, so chunks and tables sharing
+    the same raw strings are only parsed once.
+    """
+
+    def __init__(self, max_cache_size=1_000_000):
+        """
+        Initialize the normalizer.
+
+        Args:
+            max_cache_size (int): Number of raw strings kept in the parse cache
+        """
+        self.max_cache_size = max_cache_size
+        self.parsed = {}
+        self.formats = {}
+        self.format_counts = {}
+        # Tables may be transformed on several threads sharing this cache
+        self.lock = threading.Lock()
+
+    def parse(self, values, column=None):
+        """
+        Parse a Series of raw date values.
+
+        Args:
+            values (pd.Series): Raw values (strings, dates or nulls)
+            column (str, optional): Name under which per-format counts are reported
+
+        Returns:
+            pd.Series: datetime64 Series, NaT where the value is missing or invalid
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+
+        raw = values.astype('string').str.strip()
+
+        with self.lock:
+            self.learn(raw.dropna().unique())
+            parsed = raw.map(self.parsed)
+
+            if column is not None:
+                counts = raw.map(self.formats).fillna(MISSING).value_counts()
+                self.format_counts.setdefault(column, Counter()).update(counts.to_dict())
+
+        return pd.to_datetime(parsed)
+
+    def learn(self, raw_values):
+        """Classify and parse the raw values not seen before."""
+        new_values = pd.Series([value for value in raw_values if value not in self.parsed], dtype='string')
+        if new_values.empty:
+            return
+
+        if len(self.parsed) + len(new_values) > self.max_cache_size:
+            self.parsed.clear()
+            self.formats.clear()
+
+        pending = pd.Series(True, index=new_values.index)
+        parsed = pd.Series(pd.NaT, index=new_values.index, dtype='datetime64[ns]')
+        formats = pd.Series(UNRECOGNIZED, index=new_values.index, dtype=object)
+
+        for date_format, pattern in DATE_FORMATS:
+            matches = pending & new_values.str.fullmatch(pattern).fillna(False)
+            if not matches.any():
+                continue
+            parsed[matches] = pd.to_datetime(new_values[matches], format=date_format, errors='coerce')
+            formats[matches] = date_format
+            pending &= ~matches
+
+        # Values with a known layout that still failed to parse (e.g. 31/02/2022)
+        formats[formats.ne(UNRECOGNIZED) & parsed.isna()] = INVALID
+
+        self.parsed.update(zip(new_values, parsed))
+        self.formats.update(zip(new_values, formats))
+
+    def log_format_counts(self):
+        """Log how many values of each column were parsed with each format."""
+        for column, counts in self.format_counts.items():
+            logger.info(f"Date formats in {column}: {dict(counts)}")
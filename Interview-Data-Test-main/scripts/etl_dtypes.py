@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Text columns with few distinct values, held as categoricals (one code per row
+# instead of one Python str); columns not present in a frame are skipped
+CATEGORY_COLUMNS = {
+    'clients': ['state', 'country', 'status'],
+    'customers': ['state', 'country'],
+    'products': ['category', 'sub_category', 'supplier'],
+    'purchases': ['payment_method', 'payment_status', 'shipping_state', 'shipping_country'],
+    'returns': ['reason', 'status', 'processed_by']
+}
+
+# Amounts stored as DECIMAL(18,2) in the warehouse, rounded to the cent
+MONEY_COLUMNS = ['cost_price', 'selling_price', 'unit_price', 'total_amount', 'refund_amount', 'credit_limit']
+
+INT32 = np.iinfo(np.int32)
+
+
+def frame_memory_mb(df):
+    """Return the memory held by a DataFrame in MB, strings included."""
+    return df.memory_usage(index=False, deep=True).sum() / (1024 * 1024)
+
+
+def compact_frame(df, dataset):
+    """
+    Convert the columns of a dataset to memory-compact dtypes.
+
+    Low-cardinality text becomes categorical, integers (ids, quantities)
+    are downcast to 32 bits when their range fits (the warehouse columns
+    are INT), and money columns are rounded to the cent. Other columns are
+    left untouched.
+
+    Args:
+        df (pd.DataFrame): Extracted or transformed data
+        dataset (str): Dataset name ('clients', 'customers', 'products', 'purchases' or 'returns')
+
+    Returns:
+        pd.DataFrame: Data with compact dtypes
+    """
+    changes = {}
+
+    for column in CATEGORY_COLUMNS.get(dataset, []):
+        if column in df.columns and (pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])):
+            changes[column] = df[column].astype('category')
+
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values) and values.dtype.itemsize > 4:
+            low, high = values.min(), values.max()
+            if pd.isna(low) or (low >= INT32.min and high <= INT32.max):
+                nullable = isinstance(values.dtype, pd.api.extensions.ExtensionDtype)
+                changes[column] = values.astype('Int32' if nullable else 'int32')
+        elif column in MONEY_COLUMNS and pd.api.types.is_float_dtype(values):
+            changes[column] = values.round(2)
+
+    return df.assign(**changes) if changes else df
@@ -0,0 +1,134 @@
+import math
+
+from scripts.etl_cleaning import COLUMN_RULES
+
+# Columns of each source table read by the pipeline: those the warehouse
+# tables, the quality rules and the incremental extraction use. Numeric
+# columns name the type the query converts them to, so they arrive as
+# numbers instead of per-row Decimal objects
+EXTRACT_COLUMNS = {
+    'clients': {
+        'client_id': None, 'company_name': None, 'contact_name': None, 'email': None, 'phone': None,
+        'city': None, 'state': None, 'country': None, 'registration_date': None, 'status': None,
+        'credit_limit': 'FLOAT', 'last_update': None
+    },
+    'customers': {
+        'customer_id': None, 'client_id': None, 'first_name': None, 'last_name': None, 'email': None, 'phone': None,
+        'birth_date': None, 'city': None, 'state': None, 'country': None, 'last_update': None
+    },
+    'products': {
+        'product_id': None, 'product_name': None, 'category': None, 'sub_category': None, 'supplier': None,
+        'cost_price': 'FLOAT', 'selling_price': 'FLOAT', 'is_active': None, 'last_update': None
+    },
+    'purchases': {
+        'purchase_id': None, 'client_id': None, 'customer_id': None, 'product_id': None, 'purchase_date': None,
+        'quantity': 'INT', 'unit_price': 'FLOAT', 'total_amount': 'FLOAT', 'payment_method': None,
+        'payment_status': None, 'last_update': None
+    },
+    'returns': {
+        'return_id': None, 'purchase_id': None, 'client_id': None, 'customer_id': None, 'product_id': None,
+        'return_date': None, 'quantity': 'INT', 'refund_amount': 'FLOAT', 'status': None, 'last_update': None
+    }
+}
+
+# SQL of the cleaning operations each source dialect can run in the query
+#   normalize : strip spaces and lowercase (COLUMN_RULES 'normalize')
+#   snake_case: normalize, then replace spaces with underscores
+#   number    : convert to a number, NULL when the value is not one
+#   abs       : convert to a number and take its absolute value
+# Operations missing for a dialect (or dialects missing here) are left to pandas
+PUSHDOWN_SQL = {
+    'mssql': {
+        'normalize': "LOWER(LTRIM(RTRIM({column})))",
+        'snake_case': "REPLACE(LOWER(LTRIM(RTRIM({column}))), ' ', '_')",
+        'number': "TRY_CONVERT({type}, {column})",
+        'abs': "ABS(TRY_CONVERT({type}, {column}))"
+    },
+    # SQLite has no TRY_CONVERT (CAST and ABS turn text into 0, or '12x' into 12),
+    # so conversions stay in pandas
+    'sqlite': {
+        'normalize': "LOWER(TRIM({column}))",
+        'snake_case': "REPLACE(LOWER(TRIM({column})), ' ', '_')"
+    }
+}
+
+
+def pushdown_operation(rule, sql_type):
+    """Return the operation of PUSHDOWN_SQL doing a column rule's cleaning, or None when it can only run in pandas."""
+    if rule['type'] == 'text' and rule.get('normalize') and not rule.get('digits_only'):
+        return 'snake_case' if rule.get('snake_case') else 'normalize'
+    if rule['type'] == 'number' and sql_type:
+        return 'abs' if rule.get('abs') else 'number'
+    return None
+
+
+def build_select_list(dataset, dialect, pushdown=True, extra_columns=()):
+    """
+    Build the select list extracting a dataset's source table.
+
+    Args:
+        dataset (str): Dataset name
+        dialect (str): SQLAlchemy dialect name of the source ('mssql', 'sqlite', ...)
+        pushdown (bool): Run the cleaning operations the dialect supports in the query
+        extra_columns (iterable): Columns to read as they are besides the dataset's (e.g. the watermark column)
+
+    Returns:
+        tuple: Select list SQL and the columns whose cleaning rule the query already applied
+    """
+    columns = dict(EXTRACT_COLUMNS[dataset])
+    for column in extra_columns:
+        columns.setdefault(column, None)
+
+    templates = PUSHDOWN_SQL.get(dialect, {}) if pushdown else {}
+    rules = COLUMN_RULES.get(dataset, {})
+    expressions = []
+    pushed_down = set()
+    for column, sql_type in columns.items():
+        operation = pushdown_operation(rules[column], sql_type) if column in rules else None
+        template = templates.get(operation)
+        if template:
+            expressions.append(f"{template.format(column=column, type=sql_type)} AS {column}")
+            pushed_down.add(column)
+        else:
+            expressions.append(column)
+    return ', '.join(expressions), frozenset(pushed_down)
+
+
+# Tables large enough to be read in key ranges over several connections
+PARTITION_TABLES = ['purchases', 'returns']
+
+# How the key ranges of a partitioned table are cut
+#   minmax: ranges of the same width between the lowest and highest key (two aggregates, fine for dense ids)
+#   ntile : ranges of the same row count, from NTILE over the keys (one scan of the key index, for sparse ids)
+PARTITION_METHODS = ['minmax', 'ntile']
+
+# Row count of a table read from the catalog instead of counting the rows;
+# dialects missing here run COUNT(*)
+ROW_COUNT_SQL = {
+    'mssql': (
+        "SELECT SUM(row_count) FROM sys.dm_db_partition_stats "
+        "WHERE object_id = OBJECT_ID(:table_name) AND index_id IN (0, 1)"
+    )
+}
+
+
+def partition_count(rows, partition_rows, max_partitions):
+    """Return the number of key ranges to read this many rows in, about partition_rows each."""
+    return max(1, min(max_partitions, math.ceil(rows / partition_rows)))
+
+
+def even_bounds(low, high, count):
+    """Split the keys from low to high into count ranges of the same width, returning the lower bound of each."""
+    step = (high - low + 1) / count
+    return sorted({low + int(i * step) for i in range(count)})
+
+
+def key_ranges(lower_bounds):
+    """
+    Turn the sorted lower bounds of the partitions into (low, high) key ranges.
+
+    The first range has no lower bound and the last no upper bound, so the
+    ranges cover every key even if rows arrive after the bounds were read.
+    """
+    bounds = [None] + list(lower_bounds[1:])
+    return list(zip(bounds, bounds[1:] + [None]))
@@ -0,0 +1,262 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger('etl_process')
+
+
+def get_peak_memory_mb():
+    """Return the peak resident set size of the process in MB, or None when unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def get_current_memory_mb():
+    """Return the current resident set size of the process in MB, or None when unavailable (outside Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def count_rows(value):
+    """Return the number of rows in a DataFrame or dict of DataFrames, or None for anything else."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict) and value and all(isinstance(df, pd.DataFrame) for df in value.values()):
+        return sum(len(df) for df in value.values())
+    return None
+
+
+class StageInstrumentation:
+    """
+    Collect wall time, CPU time, row counts and memory per pipeline stage.
+
+    Every stage records the change of the process's current resident memory
+    over its calls (rss_growth_mb). With trace_memory, tracemalloc also
+    measures, for every call, the highest traced memory reached above what
+    was allocated when it started (traced_peak_mb) and what it still held
+    when it ended (traced_net_mb). The tracemalloc peak is reset at the
+    start and end of every stage, after being folded into the stages still
+    running, so nested stages each get their own peak. Both are process
+    wide: stages running on other threads at the same time count in each
+    other's figures.
+    """
+
+    def __init__(self, profile_stage=None, profile_dir='logs', trace_memory=False):
+        """
+        Initialize the collector.
+
+        Args:
+            profile_stage (str, optional): Stage to run under cProfile (e.g. 'transform_purchase_data')
+            profile_dir (str): Directory receiving the cProfile dump
+            trace_memory (bool): Measure the allocations of each stage with tracemalloc,
+                which makes allocation-heavy stages several times slower
+        """
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.started_at = datetime.now()
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.running = []
+        self.started_tracing = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Measure a block of work as one call of a stage.
+
+        Repeated calls (e.g. one per chunk) are summed under the same name.
+
+        Args:
+            name (str): Stage name
+            rows_in (int, optional): Rows handed to the stage
+
+        Yields:
+            dict: Record where the caller can set 'rows_out'
+        """
+        record = {'rows_out': None}
+        profiler = self.start_profiler(name)
+        memory = self.start_memory()
+        rss_before = get_current_memory_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+            rss_after = get_current_memory_mb()
+            self.stop_memory(memory)
+            if profiler is not None:
+                profiler.disable()
+
+            with self.lock:
+                stats = self.stages.setdefault(name, {
+                    'calls': 0, 'wall_time_s': 0.0, 'cpu_time_s': 0.0,
+                    'rows_in': None, 'rows_out': None,
+                    'rss_growth_mb': None, 'traced_peak_mb': None, 'traced_net_mb': None
+                })
+                stats['calls'] += 1
+                stats['wall_time_s'] += wall_time
+                stats['cpu_time_s'] += cpu_time
+                for key, rows in [('rows_in', rows_in), ('rows_out', record['rows_out'])]:
+                    if rows is not None:
+                        stats[key] = (stats[key] or 0) + rows
+                if rss_before is not None:
+                    stats['rss_growth_mb'] = (stats['rss_growth_mb'] or 0.0) + rss_after - rss_before
+                if memory is not None:
+                    # Highest peak of any call, net growth summed over the calls
+                    stats['traced_peak_mb'] = max(stats['traced_peak_mb'] or 0.0, (memory['peak'] - memory['start']) / 2**20)
+                    stats['traced_net_mb'] = (stats['traced_net_mb'] or 0.0) + (memory['end'] - memory['start']) / 2**20
+
+    def start_memory(self):
+        """Start measuring the traced memory of a stage call, returning its record (None when not tracing)."""
+        if not self.trace_memory:
+            return None
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            current = self.fold_peak()
+            memory = {'start': current, 'peak': current, 'end': current}
+            self.running.append(memory)
+        return memory
+
+    def stop_memory(self, memory):
+        """Finish measuring a stage call started by start_memory."""
+        if memory is None:
+            return
+        with self.lock:
+            memory['end'] = self.fold_peak()
+            # By identity: calls can hold equal figures
+            self.running = [running for running in self.running if running is not memory]
+
+    def fold_peak(self):
+        """Record the traced peak in every running stage call, then reset it; returns the current traced memory."""
+        current, peak = tracemalloc.get_traced_memory()
+        for memory in self.running:
+            memory['peak'] = max(memory['peak'], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def stop_tracing(self):
+        """Stop tracemalloc if this collector started it."""
+        with self.lock:
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+    def start_profiler(self, name):
+        """Start cProfile when this stage is the one selected for profiling."""
+        if not self.profile_stage or name.split(':')[0] != self.profile_stage:
+            return None
+        with self.lock:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Already profiling this stage on another thread
+            return None
+        return self.profiler
+
+    def build_report(self, status, **extra):
+        """
+        Build the run report.
+
+        Args:
+            status (str): Final status of the run
+            **extra: Additional top-level entries (timings, counters, ...)
+
+        Returns:
+            dict: JSON-serializable run report
+        """
+        finished_at = datetime.now()
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = {key: round(value, 4) if isinstance(value, float) else value for key, value in stats.items()}
+
+        return {
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'duration_s': round((finished_at - self.started_at).total_seconds(), 4),
+            'peak_memory_mb': get_peak_memory_mb(),
+            'stages': stages,
+            **extra
+        }
+
+    def write_report(self, path, status, **extra):
+        """
+        Write the run report as JSON, plus the cProfile dump when a stage was profiled.
+
+        Args:
+            path (str): Destination of the JSON report
+            status (str): Final status of the run
+            **extra: Additional top-level entries
+
+        Returns:
+            dict: The report written
+        """
+        report = self.build_report(status, **extra)
+        self.stop_tracing()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        logger.info(f"Run report written to {path}")
+
+        if self.profiler is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile_path = os.path.join(self.profile_dir, f"profile_{self.profile_stage}.prof")
+            self.profiler.dump_stats(profile_path)
+            logger.info(f"Profile of {self.profile_stage} written to {profile_path}")
+
+        return report
+
+
+def instrumented(stage, label=None):
+    """
+    Record every call of an ETLPipeline method as a stage of self.instrumentation.
+
+    Args:
+        stage (str): Stage name
+        label (callable, optional): Builds a suffix for the stage name from the call arguments
+            (e.g. the table name of extract_data)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            name = f"{stage}:{label(*args, **kwargs)}" if label else stage
+            rows_in = count_rows(args[0]) if args else None
+            with self.instrumentation.stage(name, rows_in=rows_in) as record:
+                result = method(self, *args, **kwargs)
+                record['rows_out'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+
+import pandas as pd
+import sqlalchemy
+
+logger = logging.getLogger('etl_process')
+
+# Surrogate key of the row each dimension keeps for facts whose reference is unknown
+UNKNOWN_KEY = -1
+
+# Natural and surrogate key columns of each dimension
+DIMENSION_KEYS = {
+    'dim_clients': ('client_id', 'client_key'),
+    'dim_customers': ('customer_id', 'customer_key'),
+    'dim_products': ('product_id', 'product_key')
+}
+
+# Descriptive columns of the unknown-member rows (the others stay NULL)
+UNKNOWN_LABELS = {
+    'dim_clients': {'company_name': 'Unknown', 'contact_name': 'Unknown'},
+    'dim_customers': {'first_name': 'Unknown', 'last_name': 'Unknown'},
+    'dim_products': {'product_name': 'Unknown', 'category': 'Unknown', 'sub_category': 'Unknown'}
+}
+
+
+class DimensionKeyService:
+    """
+    Assign surrogate keys to dimension rows and resolve fact references to them.
+
+    Each dimension keeps a natural id -> surrogate key index in memory. The
+    indexes are persisted in a JSON file after each successful run. As the
+    dimensions commit on their own, a failed run can leave the warehouse
+    ahead of the file, so a saved index is only used when the warehouse
+    still holds the same members and highest key; otherwise (or when the
+    file has no index for it) the dimension's index is rebuilt from the
+    warehouse, so keys never clash with rows already loaded.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the service and load the saved indexes.
+
+        Args:
+            path (str): Path of the JSON file holding the indexes
+        """
+        self.path = path
+        self.indexes = {}
+        self.checked = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for table_name, pairs in json.load(f).items():
+                    natural_ids, keys = zip(*pairs) if pairs else ((), ())
+                    self.indexes[table_name] = pd.Series(keys, index=natural_ids, dtype='int64')
+
+    def get_index(self, table_name, conn):
+        """Return the index of a dimension, checking the saved one against the warehouse on first use."""
+        if table_name not in self.checked:
+            saved = self.indexes.get(table_name)
+            if saved is None or not self.matches_warehouse(table_name, saved, conn):
+                if saved is not None:
+                    logger.warning(f"Saved key index of {table_name} is behind the warehouse, rebuilding it")
+                self.indexes[table_name] = self.read_index(table_name, conn)
+            self.checked.add(table_name)
+        return self.indexes[table_name]
+
+    def matches_warehouse(self, table_name, index, conn):
+        """Return whether the warehouse holds as many members as an index, with the same highest key."""
+        natural, key = DIMENSION_KEYS[table_name]
+        members, max_key = pd.read_sql(
+            sqlalchemy.text(f"SELECT COUNT(DISTINCT {natural}) AS members, MAX({key}) AS max_key FROM {table_name} WHERE {key} <> :unknown"),
+            conn, params={'unknown': UNKNOWN_KEY}
+        ).iloc[0]
+        if pd.isna(max_key):
+            return len(index) == 0
+        return int(members) == len(index) and len(index) > 0 and int(max_key) == int(index.max())
+
+    def read_index(self, table_name, conn):
+        """Read the index of a dimension from the warehouse."""
+        natural, key = DIMENSION_KEYS[table_name]
+        # Keys only grow, so the highest key of a natural id is its current version
+        rows = pd.read_sql(
+            sqlalchemy.text(f"SELECT {natural}, MAX({key}) AS {key} FROM {table_name} WHERE {key} <> :unknown GROUP BY {natural}"),
+            conn, params={'unknown': UNKNOWN_KEY}
+        )
+        return pd.Series(rows[key].to_numpy('int64'), index=rows[natural].to_numpy('int64'))
+
+    def assign(self, table_name, natural_ids, conn):
+        """
+        Return the surrogate keys of dimension rows, assigning new keys to natural ids not seen before.
+
+        Args:
+            table_name (str): Dimension table
+            natural_ids (pd.Series): Natural ids of the rows (without nulls)
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used when the index must be rebuilt
+
+        Returns:
+            pd.Series: Surrogate keys aligned with natural_ids
+        """
+        index = self.get_index(table_name, conn)
+        new_ids = pd.unique(natural_ids[~natural_ids.isin(index.index)].to_numpy('int64'))
+        if len(new_ids):
+            new_keys = pd.Series(self.next_keys(index, len(new_ids)), index=new_ids, dtype='int64')
+            index = self.indexes[table_name] = pd.concat([index, new_keys])
+        return natural_ids.map(index).astype('int64')
+
+    def new_versions(self, table_name, natural_ids, conn):
+        """
+        Assign fresh surrogate keys to new versions of existing members.
+
+        Args:
+            table_name (str): Dimension table
+            natural_ids (pd.Series): Natural ids opening a new version (unique)
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used when the index must be rebuilt
+
+        Returns:
+            pd.Series: New surrogate keys aligned with natural_ids
+        """
+        index = self.get_index(table_name, conn)
+        keys = list(self.next_keys(index, len(natural_ids)))
+        index.loc[natural_ids.to_numpy('int64')] = keys
+        return pd.Series(keys, index=natural_ids.index, dtype='int64')
+
+    def clear(self):
+        """Drop the indexes held in memory, so each one is rebuilt from the warehouse on next use."""
+        self.indexes = {}
+        self.checked = set()
+
+    def next_keys(self, index, count):
+        """Return the next count surrogate keys after the highest one of an index."""
+        start = int(index.max()) + 1 if len(index) else 1
+        return range(start, start + count)
+
+    def lookup(self, table_name, natural_ids, conn):
+        """
+        Resolve fact references to surrogate keys with a vectorized hash lookup.
+
+        Args:
+            table_name (str): Dimension table
+            natural_ids (pd.Series): Natural ids referenced by the facts (may hold nulls)
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used when the index must be rebuilt
+
+        Returns:
+            tuple: Surrogate keys (UNKNOWN_KEY for orphans) and the number of orphans
+        """
+        keys = natural_ids.map(self.get_index(table_name, conn))
+        orphans = int(keys.isna().sum())
+        return keys.fillna(UNKNOWN_KEY).astype('int64'), orphans
+
+    def unknown_member(self, table_name, columns):
+        """Build the unknown-member row of a dimension, labelled 'Unknown' in its name columns."""
+        natural, key = DIMENSION_KEYS[table_name]
+        row = {column: None for column in columns}
+        row.update(UNKNOWN_LABELS.get(table_name, {}))
+        row.update({key: UNKNOWN_KEY, natural: UNKNOWN_KEY})
+        if 'is_current' in row:
+            row['is_current'] = 1
+        return pd.DataFrame([row], columns=columns)
+
+    def save(self):
+        """Write the indexes to disk atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            table_name: [[int(natural_id), int(key)] for natural_id, key in index.items()]
+            for table_name, index in self.indexes.items()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
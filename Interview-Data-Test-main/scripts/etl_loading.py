@@ -0,0 +1,438 @@
+import csv
+import logging
+import os
+import re
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import sqlalchemy
+
+logger = logging.getLogger('etl_process')
+
+# DDL of the warehouse, the source of truth for the foreign keys between its tables
+DW_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'dw_sql_server_setup.sql')
+
+# Bound parameters allowed in one statement (SQL Server caps it at 2100,
+# SQLite builds before 3.32 at 999)
+PARAMETER_LIMITS = {'mssql': 2000, 'sqlite': 999}
+DEFAULT_PARAMETER_LIMIT = 999
+
+# Layout pandas uses for timestamps written to SQLite, kept by every writer so
+# rows staged by different writers compare equal in the upsert
+SQLITE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class TableWriter:
+    """Write a DataFrame into a table with pandas' default to_sql (one INSERT executed per row batch)."""
+
+    def write(self, df, table_name, conn, if_exists='append'):
+        """
+        Write the rows of a DataFrame.
+
+        Args:
+            df (pd.DataFrame): Rows to write
+            table_name (str): Destination table, created from the DataFrame when missing
+            conn (sqlalchemy.engine.Connection): Connection inside the caller's transaction
+            if_exists (str): 'append' or 'replace', as in DataFrame.to_sql
+        """
+        df.to_sql(table_name, conn, if_exists=if_exists, index=False)
+
+    def create_table(self, df, table_name, conn, if_exists):
+        """Create (or empty, with 'replace') the destination table without inserting rows."""
+        df.head(0).to_sql(table_name, conn, if_exists=if_exists, index=False)
+
+    def to_rows(self, df, dialect):
+        """Convert a DataFrame to a list of tuples of driver-native values (None for nulls)."""
+        df = df.copy()
+        for column in df.columns:
+            if dialect == 'sqlite' and pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].dt.strftime(SQLITE_TIMESTAMP_FORMAT)
+        df = df.astype(object).where(df.notna(), None)
+        return list(df.itertuples(index=False, name=None))
+
+    def insert_statement(self, table_name, columns, dialect):
+        """Return the parameterized INSERT of a table in the driver's paramstyle."""
+        placeholder = '?' if dialect in ('sqlite', 'mssql') else '%s'
+        return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})"
+
+
+class MultiRowWriter(TableWriter):
+    """Write with multi-row INSERT ... VALUES statements sized to stay under the parameter limit."""
+
+    def write(self, df, table_name, conn, if_exists='append'):
+        limit = PARAMETER_LIMITS.get(conn.dialect.name, DEFAULT_PARAMETER_LIMIT)
+        chunksize = max(1, limit // max(1, len(df.columns)))
+        df.to_sql(table_name, conn, if_exists=if_exists, index=False, method='multi', chunksize=chunksize)
+
+
+class FastExecuteManyWriter(TableWriter):
+    """
+    Write with a single DBAPI executemany, turning on pyodbc's fast_executemany
+    so SQL Server receives the rows as parameter arrays instead of one round trip per row.
+    """
+
+    def __init__(self, batch_size=10000):
+        """
+        Initialize the writer.
+
+        Args:
+            batch_size (int): Rows sent per executemany call
+        """
+        self.batch_size = batch_size
+
+    def write(self, df, table_name, conn, if_exists='append'):
+        self.create_table(df, table_name, conn, if_exists)
+        if df.empty:
+            return
+
+        dialect = conn.dialect.name
+        query = self.insert_statement(table_name, list(df.columns), dialect)
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, 'fast_executemany'):
+                cursor.fast_executemany = True
+            for start in range(0, len(df), self.batch_size):
+                cursor.executemany(query, self.to_rows(df.iloc[start:start + self.batch_size], dialect))
+        finally:
+            cursor.close()
+
+
+class FileStagedWriter(TableWriter):
+    """
+    Write the rows to a CSV file, then load the file with the database's bulk path:
+    BULK INSERT on SQL Server, a csv-reader executemany on SQLite (which has no bulk statement).
+    """
+
+    def __init__(self, staging_dir=os.path.join('data', 'bulk'), server_dir=None):
+        """
+        Initialize the writer.
+
+        Args:
+            staging_dir (str): Local directory the CSV files are written to
+            server_dir (str, optional): The same directory as seen by the database server
+                (e.g. the docker volume path); defaults to staging_dir
+        """
+        self.staging_dir = staging_dir
+        self.server_dir = server_dir
+
+    def write(self, df, table_name, conn, if_exists='append'):
+        self.create_table(df, table_name, conn, if_exists)
+        if df.empty:
+            return
+
+        dialect = conn.dialect.name
+        os.makedirs(self.staging_dir, exist_ok=True)
+        file_name = f"{table_name}_{uuid.uuid4().hex}.csv"
+        path = os.path.join(self.staging_dir, file_name)
+
+        date_format = SQLITE_TIMESTAMP_FORMAT if dialect == 'sqlite' else '%Y-%m-%d %H:%M:%S'
+        df.to_csv(path, index=False, date_format=date_format, encoding='utf-8')
+        try:
+            if dialect == 'mssql':
+                server_path = os.path.join(self.server_dir, file_name) if self.server_dir else os.path.abspath(path)
+                conn.execute(sqlalchemy.text(self.bulk_insert_statement(table_name, server_path)))
+            else:
+                self.load_csv(path, table_name, list(df.columns), conn)
+        finally:
+            os.remove(path)
+
+    def bulk_insert_statement(self, table_name, server_path):
+        """Return the BULK INSERT loading a CSV file, with the path quoted as a T-SQL string literal."""
+        # BULK INSERT takes no parameters: double the quotes a directory name may hold
+        quoted_path = server_path.replace("'", "''")
+        return (
+            f"BULK INSERT {table_name} FROM '{quoted_path}' "
+            "WITH (FORMAT = 'CSV', FIRSTROW = 2, CODEPAGE = '65001', KEEPNULLS, TABLOCK)"
+        )
+
+    def load_csv(self, path, table_name, columns, conn):
+        """Insert the rows of a CSV file through executemany, reading empty fields as NULL."""
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
+            rows = [tuple(value if value != '' else None for value in row) for row in reader]
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.executemany(self.insert_statement(table_name, columns, conn.dialect.name), rows)
+        finally:
+            cursor.close()
+
+
+def get_writer(config):
+    """
+    Build the table writer selected in the config.
+
+    Args:
+        config (dict): Pipeline config; 'writer' is one of 'default', 'multi',
+            'fast_executemany' (default) or 'file'
+
+    Returns:
+        TableWriter: The writer
+    """
+    name = config.get('writer', 'fast_executemany')
+    if name == 'default':
+        return TableWriter()
+    if name == 'multi':
+        return MultiRowWriter()
+    if name == 'fast_executemany':
+        return FastExecuteManyWriter(batch_size=config.get('writer_batch_size', 10000))
+    if name == 'file':
+        return FileStagedWriter(
+            staging_dir=config.get('bulk_dir', os.path.join('data', 'bulk')),
+            server_dir=config.get('bulk_server_dir')
+        )
+    raise ValueError(f"Unknown writer: {name}")
+
+
+def parse_foreign_keys(sql):
+    """
+    Read the foreign keys between tables from a CREATE TABLE script.
+
+    Args:
+        sql (str): DDL script
+
+    Returns:
+        dict: Table name to the set of tables it references
+    """
+    dependencies = {}
+    for match in re.finditer(r"CREATE TABLE (?:\w+\.)?(\w+)\s*\((.*?)\n\s*\);", sql, re.S | re.I):
+        table_name, body = match.groups()
+        references = re.findall(r"REFERENCES\s+(?:\w+\.)?(\w+)\s*\(", body, re.I)
+        dependencies[table_name] = {reference for reference in references if reference != table_name}
+    return dependencies
+
+
+def load_foreign_keys(path=DW_SCHEMA_PATH):
+    """Return the foreign key graph of the warehouse DDL, or an empty graph when the script is missing."""
+    if not os.path.exists(path):
+        logger.warning(f"Schema script {path} not found, tables will be loaded one at a time")
+        return {}
+    with open(path) as f:
+        return parse_foreign_keys(f.read())
+
+
+class LoadScheduler:
+    """
+    Load tables concurrently while respecting the foreign keys between them.
+
+    A table starts as soon as every table it references within the batch is
+    loaded. When a table fails, the tables depending on it are not started.
+    """
+
+    def __init__(self, dependencies, max_workers=1):
+        """
+        Initialize the scheduler.
+
+        Args:
+            dependencies (dict): Table name to the set of tables it references
+            max_workers (int): Number of tables loaded at the same time
+        """
+        self.dependencies = dependencies
+        self.max_workers = max_workers
+
+    def run(self, tables, load_table):
+        """
+        Load a batch of tables.
+
+        Args:
+            tables (dict): Table name to the DataFrame to load
+            load_table (callable): Called as load_table(table_name, df) for each table
+
+        Returns:
+            dict: Table name to the result of load_table
+        """
+        # Only the references to tables of this batch constrain the order
+        pending = {
+            table_name: self.dependencies.get(table_name, set()) & set(tables)
+            for table_name in tables
+        }
+        results = {}
+
+        if self.max_workers <= 1 or len(tables) == 1:
+            while pending:
+                table_name = self.next_ready(pending, results)
+                results[table_name] = load_table(table_name, tables[table_name])
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='etl-load') as executor:
+            running = {}
+            while pending or running:
+                for table_name in [name for name, references in pending.items() if references <= results.keys()]:
+                    del pending[table_name]
+                    running[executor.submit(load_table, table_name, tables[table_name])] = table_name
+
+                if not running:
+                    self.next_ready(pending, results)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table_name = running.pop(future)
+                    results[table_name] = future.result()
+
+        return results
+
+    def next_ready(self, pending, loaded):
+        """Pop the first pending table whose references are all loaded."""
+        for table_name, references in pending.items():
+            if references <= loaded.keys():
+                del pending[table_name]
+                return table_name
+        raise ValueError(f"Circular foreign keys between tables: {sorted(pending)}")
+
+
+class UpsertLoader:
+    """
+    Load DataFrames into warehouse tables with a staged, set-based upsert.
+
+    Each batch is bulk-loaded into a staging table, then merged into the
+    target on its key: new keys are inserted, changed rows are updated and
+    identical rows are left alone, so a batch can be loaded any number of times.
+    """
+
+    def __init__(self, conn, writer=None):
+        """
+        Initialize the loader.
+
+        Args:
+            conn (sqlalchemy.engine.Connection): Target connection, inside the caller's transaction
+            writer (TableWriter, optional): Writer used to bulk-load the staging table
+        """
+        self.conn = conn
+        self.dialect = conn.dialect.name
+        self.writer = writer or TableWriter()
+
+    def staging_table_name(self, table_name):
+        """Return a staging table name for one load of a warehouse table, unique so concurrent loads never share it."""
+        return f"stg_{table_name}_{uuid.uuid4().hex[:12]}"
+
+    def load(self, df, table_name, key, version_of=None, before_merge=None):
+        """
+        Upsert a DataFrame into a table.
+
+        Args:
+            df (pd.DataFrame): Rows to load, with the table's columns
+            table_name (str): Target table
+            key (str): Key column the rows are matched on
+            version_of (str, optional): Natural key of a type 2 dimension; the current
+                versions superseded by the loaded rows are closed
+            before_merge (callable, optional): Called with the staging table name once the
+                batch is staged and before it is merged (e.g. to maintain aggregates)
+
+        Returns:
+            dict: Number of rows inserted, updated and unchanged (and closed, with version_of)
+        """
+        duplicates = df[key].duplicated(keep='last')
+        if duplicates.any():
+            # MERGE rejects a source holding the same key twice; the last row wins
+            logger.warning(f"Dropping {int(duplicates.sum())} rows with a duplicate {key} before loading {table_name}")
+            df = df[~duplicates]
+
+        if df.empty:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+        staging_table = self.staging_table_name(table_name)
+        columns = list(df.columns)
+
+        # The staging table is created in the caller's transaction, so a crash rolls it back
+        try:
+            self.writer.write(df, staging_table, self.conn, if_exists='replace')
+            if before_merge is not None:
+                before_merge(staging_table)
+            if self.dialect == 'sqlite':
+                counts = self.upsert_sqlite(table_name, staging_table, columns, key)
+            else:
+                counts = self.merge(table_name, staging_table, columns, key)
+            if version_of:
+                counts['closed'] = self.close_versions(table_name, staging_table, key, version_of)
+        finally:
+            self.conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {staging_table}"))
+
+        counts['unchanged'] = len(df) - counts['inserted'] - counts['updated']
+        return counts
+
+    def merge(self, table_name, staging_table, columns, key):
+        """Apply the staged rows with a T-SQL MERGE, counting the actions taken."""
+        values = [column for column in columns if column != key]
+        column_list = ', '.join(columns)
+
+        # INTERSECT compares NULLs as equal, unlike <>
+        changed = f"NOT EXISTS (SELECT {', '.join(f's.{c}' for c in values)} INTERSECT SELECT {', '.join(f't.{c}' for c in values)})"
+        query = f"""
+            MERGE {table_name} AS t
+            USING {staging_table} AS s ON t.{key} = s.{key}
+            WHEN MATCHED AND {changed} THEN
+                UPDATE SET {', '.join(f'{c} = s.{c}' for c in values)}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({column_list}) VALUES ({', '.join(f's.{c}' for c in columns)})
+            OUTPUT $action;
+        """
+        actions = pd.Series([row[0] for row in self.conn.execute(sqlalchemy.text(query))], dtype=object)
+        return {'inserted': int((actions == 'INSERT').sum()), 'updated': int((actions == 'UPDATE').sum())}
+
+    def close_versions(self, table_name, staging_table, key, natural):
+        """
+        Close the current versions replaced by a staged version of the same member.
+
+        The closed row's valid_to is the valid_from of the version replacing it.
+
+        Returns:
+            int: Number of versions closed
+        """
+        result = self.conn.execute(sqlalchemy.text(f"""
+            UPDATE {table_name}
+            SET is_current = 0,
+                valid_to = (SELECT s.valid_from FROM {staging_table} AS s WHERE s.{natural} = {table_name}.{natural})
+            WHERE is_current = 1
+              AND EXISTS (
+                  SELECT 1 FROM {staging_table} AS s
+                  WHERE s.{natural} = {table_name}.{natural} AND s.{key} <> {table_name}.{key}
+              )
+        """))
+        return max(result.rowcount, 0)
+
+    def upsert_sqlite(self, table_name, staging_table, columns, key):
+        """Apply the staged rows with INSERT ... ON CONFLICT, the SQLite counterpart of MERGE."""
+        values = [column for column in columns if column != key]
+        column_list = ', '.join(columns)
+
+        counts = self.conn.execute(sqlalchemy.text(f"""
+            SELECT
+                SUM(CASE WHEN t.{key} IS NULL THEN 1 ELSE 0 END),
+                SUM(CASE WHEN t.{key} IS NOT NULL AND ({' OR '.join(f's.{c} IS NOT t.{c}' for c in values) or '0'}) THEN 1 ELSE 0 END)
+            FROM {staging_table} AS s
+            LEFT JOIN {table_name} AS t ON t.{key} = s.{key}
+        """)).one()
+
+        # WHERE true keeps SQLite from parsing ON CONFLICT as a join constraint
+        update = (
+            f"DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in values)} "
+            f"WHERE {' OR '.join(f'{table_name}.{c} IS NOT excluded.{c}' for c in values)}"
+        ) if values else "DO NOTHING"
+        self.conn.execute(sqlalchemy.text(f"""
+            INSERT INTO {table_name} ({column_list})
+            SELECT {column_list} FROM {staging_table} WHERE true
+            ON CONFLICT ({key}) {update}
+        """))
+
+        return {'inserted': int(counts[0] or 0), 'updated': int(counts[1] or 0)}
+
+
+def create_sqlite_schema(conn, path=DW_SCHEMA_PATH):
+    """
+    Create the warehouse tables and indexes missing from a SQLite target.
+
+    The statements are taken from the SQL Server DDL, whose column types
+    SQLite accepts as they are, so the tables get the same primary keys
+    the upsert's ON CONFLICT clause relies on.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): SQLite connection, inside the caller's transaction
+        path (str): Path of the warehouse DDL script
+    """
+    with open(path) as f:
+        sql = f.read()
+    for statement in re.findall(r"CREATE TABLE dbo\.(.*?\n\s*\);)", sql, re.S):
+        conn.execute(sqlalchemy.text(f"CREATE TABLE IF NOT EXISTS {statement}"))
+    for name, statement in re.findall(r"CREATE INDEX (\w+) ON dbo\.(.*?\);)", sql, re.S):
+        conn.execute(sqlalchemy.text(f"CREATE INDEX IF NOT EXISTS {name} ON {statement}"))
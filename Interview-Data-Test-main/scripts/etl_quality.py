@@ -0,0 +1,194 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('etl_process')
+
+# Rule checks
+#   not_null    : the column has a value
+#   unique      : the value does not repeat an earlier row's
+#   non_negative: the value is >= 0
+#   positive    : the value is > 0
+#   not_future  : the date is not after the run
+#   product     : the column equals the product of the 'factors' columns, within 'tolerance'
+# A rule may set 'max_rate', the share of failing rows above which the run fails;
+# the quality_thresholds config overrides it per '<dataset>.<rule>'
+NOT_NULL = 'not_null'
+UNIQUE = 'unique'
+
+QUALITY_RULES = {
+    'clients': {
+        'client_id_missing': {'check': NOT_NULL, 'column': 'client_id'},
+        'client_id_duplicated': {'check': UNIQUE, 'column': 'client_id'},
+        'registration_date_invalid': {'check': NOT_NULL, 'column': 'registration_date'},
+        'registration_date_in_future': {'check': 'not_future', 'column': 'registration_date'},
+        'credit_limit_negative': {'check': 'non_negative', 'column': 'credit_limit'}
+    },
+    'customers': {
+        'customer_id_missing': {'check': NOT_NULL, 'column': 'customer_id'},
+        'customer_id_duplicated': {'check': UNIQUE, 'column': 'customer_id'},
+        'client_id_missing': {'check': NOT_NULL, 'column': 'client_id'},
+        'birth_date_invalid': {'check': NOT_NULL, 'column': 'birth_date'},
+        'birth_date_in_future': {'check': 'not_future', 'column': 'birth_date'}
+    },
+    'products': {
+        'product_id_missing': {'check': NOT_NULL, 'column': 'product_id'},
+        'product_id_duplicated': {'check': UNIQUE, 'column': 'product_id'},
+        'selling_price_negative': {'check': 'non_negative', 'column': 'selling_price'},
+        'cost_price_negative': {'check': 'non_negative', 'column': 'cost_price'}
+    },
+    'purchases': {
+        'purchase_id_missing': {'check': NOT_NULL, 'column': 'purchase_id'},
+        'purchase_id_duplicated': {'check': UNIQUE, 'column': 'purchase_id'},
+        'customer_id_missing': {'check': NOT_NULL, 'column': 'customer_id'},
+        'purchase_date_invalid': {'check': NOT_NULL, 'column': 'purchase_date'},
+        'purchase_date_in_future': {'check': 'not_future', 'column': 'purchase_date'},
+        'quantity_not_positive': {'check': 'positive', 'column': 'quantity'},
+        'total_amount_mismatch': {'check': 'product', 'column': 'total_amount', 'factors': ['quantity', 'unit_price'], 'tolerance': 0.01}
+    },
+    'returns': {
+        'return_id_missing': {'check': NOT_NULL, 'column': 'return_id'},
+        'return_id_duplicated': {'check': UNIQUE, 'column': 'return_id'},
+        'purchase_id_missing': {'check': NOT_NULL, 'column': 'purchase_id'},
+        'return_date_invalid': {'check': NOT_NULL, 'column': 'return_date'},
+        'quantity_not_positive': {'check': 'positive', 'column': 'quantity'},
+        'refund_amount_negative': {'check': 'non_negative', 'column': 'refund_amount'}
+    }
+}
+
+
+class DataQualityError(Exception):
+    """Raised when the share of rows failing a quality rule is above its threshold."""
+
+
+def to_flags(values):
+    """Turn a boolean Series (possibly nullable) into a numpy mask, missing values counting as passing."""
+    return values.fillna(False).to_numpy(dtype=bool)
+
+
+def numeric(df, column):
+    """Return a column as a float array, NaN where it is missing or not a number."""
+    return pd.to_numeric(df[column], errors='coerce').astype('float64').to_numpy()
+
+
+class QualityEngine:
+    """Evaluate the QUALITY_RULES of a dataset in one vectorized pass and enforce their thresholds."""
+
+    def __init__(self, rules=QUALITY_RULES, thresholds=None, sample_rows=None, sample_keys=5, seed=0):
+        """
+        Initialize the engine.
+
+        Args:
+            rules (dict): Dataset to {rule name: rule} mapping (see QUALITY_RULES)
+            thresholds (dict, optional): '<dataset>.<rule>' to the highest share of failing rows allowed
+            sample_rows (int, optional): Validate a random sample of this many rows of larger frames
+            sample_keys (int): Keys of failing rows kept per rule
+            seed (int): Seed of the row sampling
+        """
+        self.rules = rules
+        self.thresholds = thresholds or {}
+        self.sample_rows = sample_rows
+        self.sample_keys = sample_keys
+        self.seed = seed
+        self.now = pd.Timestamp.now()
+
+    def failure_mask(self, rule, df):
+        """Return the rows of a DataFrame failing a rule."""
+        check = rule['check']
+        column = rule['column']
+        if check == NOT_NULL:
+            return df[column].isna().to_numpy()
+        if check == UNIQUE:
+            return (df[column].duplicated(keep='first') & df[column].notna()).to_numpy()
+        if check == 'non_negative':
+            return numeric(df, column) < 0
+        if check == 'positive':
+            return numeric(df, column) <= 0
+        if check == 'not_future':
+            return to_flags(pd.to_datetime(df[column], errors='coerce') > self.now)
+        if check == 'product':
+            expected = np.prod([numeric(df, factor) for factor in rule['factors']], axis=0)
+            return np.abs(numeric(df, column) - expected) > rule.get('tolerance', 0)
+        raise ValueError(f"Unknown quality check '{check}' for column {column}")
+
+    def evaluate(self, dataset, df, key=None):
+        """
+        Evaluate the rules of a dataset.
+
+        Rules whose columns are not in the frame are skipped. With sample_rows,
+        frames larger than the sample are validated on a random sample, so
+        counts are for the sample (and duplicates across it are undercounted).
+
+        Args:
+            dataset (str): Dataset name
+            df (pd.DataFrame): Transformed data
+            key (str, optional): Column whose values identify the failing rows in the samples
+
+        Returns:
+            dict: Rule name to {'checked', 'failed', 'sample_keys'}
+        """
+        rules = {
+            name: rule for name, rule in self.rules.get(dataset, {}).items()
+            if {rule['column'], *rule.get('factors', [])} <= set(df.columns)
+        }
+        if self.sample_rows and len(df) > self.sample_rows:
+            df = df.sample(n=self.sample_rows, random_state=self.seed)
+        if not rules:
+            return {}
+
+        # One row of failures per rule, counted in a single reduction
+        names = list(rules)
+        failures = np.vstack([self.failure_mask(rules[name], df) for name in names]) if len(df) else np.zeros((len(names), 0), dtype=bool)
+        counts = failures.sum(axis=1)
+        keys = df[key].to_numpy() if key in df.columns else df.index.to_numpy()
+
+        results = {}
+        for index, name in enumerate(names):
+            failed = int(counts[index])
+            sample = keys[np.flatnonzero(failures[index])[:self.sample_keys]] if failed else []
+            results[name] = {
+                'checked': len(df),
+                'failed': failed,
+                'sample_keys': [value.item() if hasattr(value, 'item') else value for value in sample]
+            }
+            if failed:
+                logger.warning(f"{dataset}.{name}: {failed} of {len(df)} rows fail (e.g. {results[name]['sample_keys']})")
+        return results
+
+    def merge(self, totals, results):
+        """Add the results of one chunk's validation into the running totals."""
+        for dataset, rules in results.items():
+            dataset_totals = totals.setdefault(dataset, {})
+            for name, result in rules.items():
+                total = dataset_totals.setdefault(name, {'checked': 0, 'failed': 0, 'sample_keys': []})
+                total['checked'] += result['checked']
+                total['failed'] += result['failed']
+                total['sample_keys'] = (total['sample_keys'] + result['sample_keys'])[:self.sample_keys]
+        return totals
+
+    def get_threshold(self, dataset, name):
+        """Return the highest share of failing rows allowed for a rule, or None when it is not enforced."""
+        return self.thresholds.get(f"{dataset}.{name}", self.rules.get(dataset, {}).get(name, {}).get('max_rate'))
+
+    def enforce(self, results):
+        """
+        Fail the run when a rule's share of failing rows is above its threshold.
+
+        Args:
+            results (dict): Dataset to rule results, as built by evaluate() or merge()
+
+        Raises:
+            DataQualityError: Listing every rule over its threshold
+        """
+        breaches = []
+        for dataset, rules in results.items():
+            for name, result in rules.items():
+                threshold = self.get_threshold(dataset, name)
+                if threshold is None or not result['checked']:
+                    continue
+                rate = result['failed'] / result['checked']
+                if rate > threshold:
+                    breaches.append(f"{dataset}.{name}: {rate:.2%} of rows fail (threshold {threshold:.2%}, e.g. {result['sample_keys']})")
+        if breaches:
+            raise DataQualityError("Data quality thresholds exceeded: " + '; '.join(breaches))
@@ -0,0 +1,195 @@
+import logging
+
+import pandas as pd
+import sqlalchemy
+
+from scripts.etl_keys import DIMENSION_KEYS, UNKNOWN_KEY
+
+logger = logging.getLogger('etl_process')
+
+# Start of validity of the first version of every member
+BEGINNING_OF_TIME = pd.Timestamp('1900-01-01')
+
+# Attributes whose changes open a new version of a type 2 dimension row;
+# changes to the other columns overwrite the current version
+TRACKED_COLUMNS = {
+    'dim_clients': ['email', 'phone', 'city', 'state', 'country', 'status'],
+    'dim_customers': ['email', 'phone', 'city', 'state', 'country']
+}
+
+
+def row_hash(df, columns):
+    """
+    Hash the tracked attributes of every row in one vectorized pass.
+
+    Values are compared as text so the hash does not depend on dtypes, and
+    the unsigned 64-bit hash is stored as a signed BIGINT.
+
+    Args:
+        df (pd.DataFrame): Dimension rows
+        columns (list): Tracked columns
+
+    Returns:
+        pd.Series: int64 hash of each row
+    """
+    values = df[columns].astype('string').fillna('')
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy().view('int64')
+    return pd.Series(hashes, index=df.index)
+
+
+class SCD2Engine:
+    """
+    Version type 2 dimensions by comparing row hashes against the current versions.
+
+    The versions of each dimension are held in memory, read from the
+    warehouse on first use: a hash index of the current version of every
+    natural id, and the validity start of every version. Rows are diffed
+    against the hash index in batches: new ids get a first version valid
+    since BEGINNING_OF_TIME, ids whose hash changed get a new version (new
+    surrogate key, valid from this run) and the others keep their current
+    key and valid_from. Facts are resolved to the version valid on their date.
+    """
+
+    def __init__(self, key_service, batch_size=100_000):
+        """
+        Initialize the engine.
+
+        Args:
+            key_service (DimensionKeyService): Service assigning the surrogate keys
+            batch_size (int): Rows diffed per batch
+        """
+        self.key_service = key_service
+        self.batch_size = batch_size
+        self.current = {}
+        self.history = {}
+        self.changes = {}
+
+    def load_versions(self, table_name, conn):
+        """Read the versions of a dimension from the warehouse, unless already in memory."""
+        if table_name in self.current:
+            return
+        natural, key = DIMENSION_KEYS[table_name]
+        rows = pd.read_sql(
+            sqlalchemy.text(
+                f"SELECT {natural}, {key}, row_hash, valid_from, is_current FROM {table_name} "
+                f"WHERE {key} <> :unknown"
+            ),
+            conn, params={'unknown': UNKNOWN_KEY}
+        )
+        rows['valid_from'] = pd.to_datetime(rows['valid_from']).astype('datetime64[ns]')
+        is_current = rows['is_current'].astype(bool)
+
+        self.current[table_name] = pd.DataFrame({
+            'row_hash': pd.array(rows.loc[is_current, 'row_hash'], dtype='Int64'),
+            'valid_from': rows.loc[is_current, 'valid_from'].to_numpy()
+        }, index=rows.loc[is_current, natural].to_numpy('int64'))
+        self.history[table_name] = pd.DataFrame({
+            'natural_id': rows[natural].to_numpy('int64'),
+            'key': rows[key].to_numpy('int64'),
+            'valid_from': rows['valid_from'].to_numpy()
+        })
+
+    def apply(self, table_name, df, conn, valid_from):
+        """
+        Assign the version columns of dimension rows.
+
+        Args:
+            table_name (str): Dimension table
+            df (pd.DataFrame): Dimension rows, one per natural id
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used to read the versions
+            valid_from (datetime): Start of validity of the new versions opened by this run
+
+        Returns:
+            pd.DataFrame: Rows with their surrogate key, row_hash, valid_from, valid_to and is_current
+        """
+        self.load_versions(table_name, conn)
+        batches = [
+            self.apply_batch(table_name, df.iloc[start:start + self.batch_size], conn, pd.Timestamp(valid_from))
+            for start in range(0, len(df), self.batch_size)
+        ]
+        return pd.concat(batches) if batches else self.apply_batch(table_name, df, conn, pd.Timestamp(valid_from))
+
+    def apply_batch(self, table_name, df, conn, valid_from):
+        """Diff one batch against the current versions and update the in-memory versions."""
+        natural, key = DIMENSION_KEYS[table_name]
+        current = self.current[table_name]
+
+        hashes = row_hash(df, TRACKED_COLUMNS[table_name])
+        previous = current.reindex(df[natural].to_numpy('int64'))
+        # .array keeps the nullable Int64 hashes; to_numpy() would turn them into
+        # float64 when a new id brings a NA, losing the low bits of every hash
+        previous_hash = pd.Series(previous['row_hash'].array, index=df.index, dtype='Int64')
+        previous_from = pd.Series(previous['valid_from'].to_numpy(), index=df.index)
+
+        is_new = previous_hash.isna()
+        changed = ~is_new & previous_hash.ne(hashes).fillna(False)
+
+        keys = self.key_service.assign(table_name, df[natural], conn)
+        if changed.any():
+            keys[changed] = self.key_service.new_versions(table_name, df.loc[changed, natural], conn).to_numpy()
+
+        df = df.assign(**{
+            key: keys,
+            'row_hash': hashes,
+            'valid_from': previous_from.mask(is_new, BEGINNING_OF_TIME).mask(changed, valid_from),
+            'valid_to': pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]'),
+            'is_current': 1
+        })
+
+        opened = is_new | changed
+        if opened.any():
+            natural_ids = df.loc[opened, natural].to_numpy('int64')
+            versions = pd.DataFrame({
+                'row_hash': pd.array(hashes[opened], dtype='Int64'),
+                'valid_from': df.loc[opened, 'valid_from'].to_numpy()
+            }, index=natural_ids)
+            self.current[table_name] = pd.concat([current.drop(natural_ids, errors='ignore'), versions])
+            self.history[table_name] = pd.concat([self.history[table_name], pd.DataFrame({
+                'natural_id': natural_ids,
+                'key': df.loc[opened, key].to_numpy('int64'),
+                'valid_from': versions['valid_from'].to_numpy()
+            })], ignore_index=True)
+
+        counts = self.changes.setdefault(table_name, {'new': 0, 'changed': 0})
+        counts['new'] += int(is_new.sum())
+        counts['changed'] += int(changed.sum())
+        return df
+
+    def lookup(self, table_name, natural_ids, event_dates, conn):
+        """
+        Resolve fact references to the version valid on each fact's date.
+
+        Uses an as-of join on the versions' valid_from; references without a
+        date fall back to the current version.
+
+        Args:
+            table_name (str): Dimension table
+            natural_ids (pd.Series): Natural ids referenced by the facts (may hold nulls)
+            event_dates (pd.Series): Date of each fact (may hold nulls)
+            conn (sqlalchemy.engine.Engine): Warehouse connection, used to read the versions
+
+        Returns:
+            tuple: Surrogate keys (UNKNOWN_KEY for orphans) and the number of orphans
+        """
+        self.load_versions(table_name, conn)
+        keys, orphans = self.key_service.lookup(table_name, natural_ids, conn)
+
+        dated = natural_ids.notna() & event_dates.notna() & keys.ne(UNKNOWN_KEY)
+        if dated.any():
+            facts = pd.DataFrame({
+                'natural_id': natural_ids[dated].to_numpy('int64'),
+                'event_date': pd.to_datetime(event_dates[dated]).to_numpy('datetime64[ns]'),
+                'position': keys.index[dated]
+            }).sort_values('event_date')
+            versions = self.history[table_name].sort_values('valid_from')
+            matched = pd.merge_asof(
+                facts, versions, left_on='event_date', right_on='valid_from', by='natural_id', direction='backward'
+            ).dropna(subset=['key'])
+            keys.loc[matched['position'].to_numpy()] = matched['key'].to_numpy('int64')
+
+        return keys, orphans
+
+    def log_changes(self):
+        """Log how many rows of each dimension were new or opened a new version."""
+        for table_name, counts in self.changes.items():
+            logger.info(f"{table_name}: {counts['new']} new members, {counts['changed']} new versions")
@@ -0,0 +1,124 @@
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow is only needed when the staging layer is enabled
+    pa = None
+    ds = None
+
+logger = logging.getLogger('etl_process')
+
+# Stages a run can start from; 'transform' and 'load' read their input from the staging layer
+STAGES = ['extract', 'transform', 'load']
+
+# Hive partition column derived from last_update on the raw extracts
+PARTITION_COLUMN = 'last_update_date'
+PARTITIONING = None if ds is None else ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+
+
+class ParquetStage:
+    """
+    Persist extracted and transformed frames as Parquet datasets.
+
+    Raw extracts go to <raw_dir>/<table>/, partitioned by the date of their
+    last_update; transformed frames go to <processed_dir>/<dataset>/. Each
+    write replaces what the previous run staged for that table, so the
+    layer always holds the input of the last run's next stage.
+    """
+
+    def __init__(self, raw_dir=os.path.join('data', 'raw'), processed_dir=os.path.join('data', 'processed')):
+        """
+        Initialize the staging layer.
+
+        Args:
+            raw_dir (str): Directory of the extracted tables
+            processed_dir (str): Directory of the transformed datasets
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for the Parquet staging layer (pip install pyarrow)")
+        self.raw_dir = raw_dir
+        self.processed_dir = processed_dir
+
+    def write_raw(self, table_name, df):
+        """Stage an extracted table, partitioned by the date of its last_update."""
+        partitioned = 'last_update' in df.columns
+        if partitioned:
+            dates = pd.to_datetime(df['last_update'], errors='coerce')
+            df = df.assign(**{PARTITION_COLUMN: dates.dt.strftime('%Y-%m-%d')})
+        self.write(os.path.join(self.raw_dir, table_name), df, partitioned)
+
+    def write_processed(self, dataset, df):
+        """Stage a transformed dataset."""
+        self.write(os.path.join(self.processed_dir, dataset), df, partitioned=False)
+
+    def read_raw(self, table_name, columns=None, since=None):
+        """
+        Read a staged extract.
+
+        Args:
+            table_name (str): Source table
+            columns (list, optional): Columns to read; the others are never decoded
+            since (str, optional): Only read the partitions whose last_update date is on or after this 'YYYY-MM-DD'
+
+        Returns:
+            pd.DataFrame: Staged rows
+        """
+        path = os.path.join(self.raw_dir, table_name)
+        predicate = None
+        if since is not None and self.is_partitioned(path):
+            predicate = ds.field(PARTITION_COLUMN) >= since
+        df = self.read(path, columns, predicate)
+        return df.drop(columns=[PARTITION_COLUMN], errors='ignore')
+
+    def read_processed(self, dataset, columns=None):
+        """Read a staged transformed dataset, optionally projected on some columns."""
+        return self.read(os.path.join(self.processed_dir, dataset), columns)
+
+    def write(self, path, df, partitioned):
+        """Replace the dataset at path with the rows of a DataFrame."""
+        table = pa.Table.from_pandas(self.to_arrow_compatible(df), preserve_index=False)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        ds.write_dataset(
+            table, path, format='parquet',
+            partitioning=PARTITIONING if partitioned else None,
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        logger.info(f"Staged {len(df)} rows to {path}")
+
+    def read(self, path, columns=None, predicate=None):
+        """Read a staged dataset, decoding only the projected columns and the matching partitions."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Nothing staged at {path}; run the extract/transform stage with staging enabled first")
+        partitioning = PARTITIONING if self.is_partitioned(path) else None
+        dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+        if columns is not None:
+            columns = [column for column in columns if column in dataset.schema.names]
+        df = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+        logger.info(f"Read {len(df)} staged rows from {path}")
+        return df
+
+    def is_partitioned(self, path):
+        """Return whether a staged dataset is split into last_update date partitions."""
+        return os.path.isdir(path) and any(name.startswith(f"{PARTITION_COLUMN}=") for name in os.listdir(path))
+
+    def to_arrow_compatible(self, df):
+        """
+        Make the object columns of a raw frame storable in Parquet.
+
+        The dirty source columns can mix types (e.g. product ids and names,
+        dates and strings); those are staged as text, which the transforms
+        already handle.
+        """
+        mixed = {}
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                mixed[column] = df[column].map(str, na_action='ignore').astype(object)
+        return df.assign(**mixed) if mixed else df
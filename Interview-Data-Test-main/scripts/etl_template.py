@@ -1,9 +1,26 @@
 import pandas as pd
 import sqlalchemy
 import logging
-from datetime import datetime
+from datetime import date, datetime
+import json
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from scripts.etl_aggregates import AggregateMaintainer
+from scripts.etl_calendar import DATE_COLUMNS, DateDimension, date_keys, unknown_date
+from scripts.etl_checkpoint import EXTRACT, TRANSFORM, RunCheckpoint, to_json_value
+from scripts.etl_cleaning import get_cleaning_plan
+from scripts.etl_dates import DateNormalizer
+from scripts.etl_dtypes import compact_frame, frame_memory_mb
+from scripts.etl_extraction import PARTITION_METHODS, PARTITION_TABLES, ROW_COUNT_SQL, build_select_list, even_bounds, key_ranges, partition_count
+from scripts.etl_keys import DIMENSION_KEYS, UNKNOWN_KEY, DimensionKeyService
+from scripts.etl_quality import QualityEngine
+from scripts.etl_scd import SCD2Engine, TRACKED_COLUMNS
+from scripts.etl_staging import STAGES, ParquetStage
+from scripts.etl_instrumentation import StageInstrumentation, get_peak_memory_mb, instrumented
+from scripts.etl_loading import DW_SCHEMA_PATH, LoadScheduler, UpsertLoader, create_sqlite_schema, get_writer, load_foreign_keys
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +33,153 @@ logging.basicConfig(
 )
 logger = logging.getLogger('etl_process')
 
+# Column used as high-water mark for incremental extraction of each source table
+WATERMARK_COLUMNS = {
+    'client': 'last_update',
+    'customer': 'last_update',
+    'products': 'last_update',
+    'purchases': 'last_update',
+    'returns': 'last_update'
+}
+
+# Source table and primary key behind each dataset of the pipeline
+SOURCE_TABLES = {
+    'clients': 'client',
+    'customers': 'customer',
+    'products': 'products',
+    'purchases': 'purchases',
+    'returns': 'returns'
+}
+SOURCE_DATASETS = {table_name: dataset for dataset, table_name in SOURCE_TABLES.items()}
+PRIMARY_KEYS = {
+    'clients': 'client_id',
+    'customers': 'customer_id',
+    'products': 'product_id',
+    'purchases': 'purchase_id',
+    'returns': 'return_id'
+}
+
+# Warehouse table fed by each dataset and the columns it keeps
+WAREHOUSE_TABLES = {
+    'clients': 'dim_clients',
+    'customers': 'dim_customers',
+    'products': 'dim_products',
+    'purchases': 'fact_sales',
+    'returns': 'fact_returns'
+}
+# Date of each fact, carried as a dim_date key and used to pick the
+# dimension versions valid at that time
+FACT_DATE_COLUMNS = {
+    'fact_sales': 'purchase_date',
+    'fact_returns': 'return_date'
+}
+
+# Dimensions are keyed on their surrogate key, facts on the source primary key
+WAREHOUSE_KEYS = {
+    **{WAREHOUSE_TABLES[dataset]: key for dataset, key in PRIMARY_KEYS.items()},
+    **{table_name: key for table_name, (natural, key) in DIMENSION_KEYS.items()},
+    'dim_date': 'date_key'
+}
+WAREHOUSE_COLUMNS = {
+    'dim_clients': ['client_key', 'client_id', 'company_name', 'contact_name', 'email', 'phone', 'city', 'state', 'country', 'status',
+                    'row_hash', 'valid_from', 'valid_to', 'is_current'],
+    'dim_customers': ['customer_key', 'customer_id', 'first_name','last_name', 'email', 'phone', 'city', 'state', 'country', 'birth_date',
+                      'row_hash', 'valid_from', 'valid_to', 'is_current'],
+    'dim_products': ['product_key', 'product_id', 'product_name', 'category', 'sub_category', 'supplier', 'selling_price', 'is_active'],
+    'dim_date': DATE_COLUMNS,
+    'fact_sales': ['purchase_id', 'client_key', 'customer_key', 'product_key', 'purchase_date_key', 'quantity', 'unit_price', 'total_amount', 'payment_method', 'payment_status'],
+    'fact_returns': ['return_id', 'purchase_id', 'client_key', 'customer_key', 'product_key', 'return_date_key', 'quantity', 'refund_amount', 'status']
+}
+
+# Staged product list the product resolver is rebuilt from when resuming without the source
+PRODUCT_LOOKUP = 'product_lookup'
+
+
+def watermark_order(value):
+    """Return a comparable form of a watermark value, whether read from the source or restored from a checkpoint as text."""
+    if isinstance(value, (str, date)):
+        return pd.Timestamp(value)
+    return value
+
+
+class WatermarkStore:
+    """Persist per-table high-water marks for incremental extraction in a JSON file."""
+
+    def __init__(self, path):
+        """
+        Initialize the store and load any previously saved marks.
+
+        Args:
+            path (str): Path of the JSON file holding the marks
+        """
+        self.path = path
+        self.marks = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.marks = json.load(f)
+
+    def get(self, table_name, column):
+        """Return the saved mark for a table, or None when it was never loaded on that column."""
+        mark = self.marks.get(table_name)
+        if mark is None or mark['column'] != column:
+            return None
+        return mark['value']
+
+    def update(self, table_name, column, value):
+        """Record a new mark for a table (not persisted until save() is called)."""
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif hasattr(value, 'item'):
+            value = value.item()
+        self.marks[table_name] = {'column': column, 'value': value}
+
+    def save(self):
+        """Write the marks to disk atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.marks, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class ProductResolver:
+    """Resolve raw product references (numeric ids or product names) to product ids."""
+
+    def __init__(self, products):
+        """
+        Build the name lookup once.
+
+        Args:
+            products (pd.DataFrame): Products with product_id and product_name columns
+        """
+        names = products['product_name'].astype('string').str.lower().str.strip()
+        lookup = pd.Series(pd.to_numeric(products['product_id']).to_numpy(), index=names.to_numpy())
+        # Unnamed products would match the missing references
+        lookup = lookup[names.notna().to_numpy()]
+        # Same behaviour as a dict built from the rows: the last product with a name wins
+        self.lookup = lookup[~lookup.index.duplicated(keep='last')]
+
+    def resolve(self, values):
+        """
+        Resolve a Series of raw product references.
+
+        Args:
+            values (pd.Series): Numeric ids, numeric strings or product names
+
+        Returns:
+            pd.Series: Nullable integer product ids, <NA> where unresolved
+        """
+        raw = values.astype('string').str.strip()
+        is_numeric = raw.str.fullmatch(r'\d+(\.0+)?').fillna(False)
+
+        ids = pd.to_numeric(raw.where(is_numeric), errors='coerce')
+        names = raw.where(~is_numeric).str.lower().map(self.lookup)
+
+        return ids.fillna(names).astype('Int64')
+
+
 class ETLPipeline:
     def __init__(self, config):
         """
@@ -27,61 +191,397 @@ class ETLPipeline:
         self.config = config
         self.source_conn = None
         self.target_conn = None
+        self.watermarks = WatermarkStore(config.get('watermark_path', os.path.join('data', 'watermarks.json')))
+        self.pending_watermarks = {}
+        self.date_normalizer = DateNormalizer()
+        self.product_resolver = None
+        self.unresolved_products = {}
+        self.pushed_down = {}
+        self.load_counts = {}
+        self.load_scheduler = None
+        self.writer = get_writer(config)
+        self.key_service = DimensionKeyService(config.get('key_index_path', os.path.join('data', 'key_index.json')))
+        self.orphan_references = {}
+        self.frame_memory = {}
+        self.quality = QualityEngine(
+            thresholds=config.get('quality_thresholds'),
+            sample_rows=config.get('quality_sample_rows')
+        )
+        self.validation_results = {}
+        self.calendar = DateDimension(fiscal_year_start_month=config.get('fiscal_year_start_month', 7))
+        self.aggregates = AggregateMaintainer()
+        self.aggregate_mismatches = None
+        self.scd = SCD2Engine(self.key_service, batch_size=config.get('scd_batch_size', 100_000))
+        self.instrumentation = StageInstrumentation(
+            profile_stage=config.get('profile_stage'),
+            profile_dir=config.get('profile_dir', 'logs'),
+            trace_memory=config.get('trace_memory', False)
+        )
+        self.from_stage = config.get('from_stage') or 'extract'
+        if self.from_stage not in STAGES:
+            raise ValueError(f"Unknown stage '{self.from_stage}', expected one of {STAGES}")
+        if config.get('partition_method', 'minmax') not in PARTITION_METHODS:
+            raise ValueError(f"Unknown partition method '{config['partition_method']}', expected one of {PARTITION_METHODS}")
+        self.staging = None
+        if config.get('staging', False) or self.from_stage != 'extract':
+            self.staging = ParquetStage(
+                raw_dir=config.get('raw_dir', os.path.join('data', 'raw')),
+                processed_dir=config.get('processed_dir', os.path.join('data', 'processed'))
+            )
+        self.checkpoint = None
+        resume_run_id = config.get('resume_run_id')
+        if config.get('checkpoint', False) or resume_run_id:
+            if self.from_stage != 'extract':
+                raise ValueError("A run resumes either from its checkpoint or from the staging layer, not both")
+            self.checkpoint = RunCheckpoint(
+                resume_run_id or RunCheckpoint.new_run_id(),
+                root=config.get('checkpoint_dir', os.path.join('data', 'checkpoints')),
+                resume=bool(resume_run_id)
+            )
         
-    def extract_data(self, table_name):
+    def get_watermark_column(self, table_name):
+        """Return the column used as high-water mark for a table, or None in full-load mode."""
+        if not self.config.get('incremental', False):
+            return None
+        columns = {**WATERMARK_COLUMNS, **self.config.get('watermark_columns', {})}
+        return columns.get(table_name)
+
+    def get_select_list(self, table_name, watermark_column=None):
+        """
+        Return the select list extracting a table.
+
+        With extract_projection, only the columns of the table's extraction
+        spec are read, and with extract_pushdown the cleaning operations the
+        source dialect supports run in the query; the columns they cleaned
+        are recorded so the transform skips that work.
+
+        Args:
+            table_name (str): Source table
+            watermark_column (str, optional): Column to read besides the spec's
+
+        Returns:
+            str: Select list SQL
+        """
+        if not self.config.get('extract_projection', True):
+            return '*'
+        dataset = SOURCE_DATASETS[table_name]
+        extra_columns = [watermark_column] if watermark_column else []
+        select_list, pushed_down = build_select_list(
+            dataset, self.source_conn.dialect.name, self.config.get('extract_pushdown', True), extra_columns
+        )
+        self.pushed_down[dataset] = pushed_down
+        return select_list
+
+    def build_extract_filter(self, table_name, key=None, after=None, key_range=None):
+        """
+        Build the WHERE clause selecting the rows of a table to extract.
+
+        Args:
+            table_name (str): Name of the table to extract data from
+            key (str, optional): Key column of after and key_range
+            after (optional): Only select the rows whose key is above this value
+            key_range (tuple, optional): Only select the rows whose key is in [low, high); None leaves a side open
+
+        Returns:
+            tuple: WHERE clause ('' when every row is selected), its parameters, the watermark column and the saved mark
+        """
+        column = self.get_watermark_column(table_name)
+        mark = self.watermarks.get(table_name, column) if column else None
+
+        conditions = []
+        params = {}
+        if mark is not None:
+            # The default marks are DATEs: rows changed later on the day of the mark
+            # must be read again, and the upsert leaves the ones already loaded unchanged
+            conditions.append(f"{column} >= :mark")
+            params['mark'] = mark
+        if after is not None:
+            conditions.append(f"{key} > :after")
+            params['after'] = after
+        if key_range is not None:
+            low, high = key_range
+            if low is not None:
+                conditions.append(f"{key} >= :low")
+                params['low'] = low
+            if high is not None:
+                conditions.append(f"{key} < :high")
+                params['high'] = high
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ''
+        return where, params, column, mark
+
+    def build_extract_query(self, table_name, key=None, after=None, key_range=None, order=False):
+        """
+        Build the extraction query for a table.
+
+        Args:
+            table_name (str): Name of the table to extract data from
+            key (str, optional): Key column of after, key_range and order
+            after (optional): Only read the rows whose key is above this value
+            key_range (tuple, optional): Only read the rows whose key is in [low, high)
+            order (bool): Read the rows in key order
+
+        Returns:
+            tuple: Query, its parameters, the watermark column and the saved mark
+        """
+        where, params, column, mark = self.build_extract_filter(table_name, key, after, key_range)
+        query = f"SELECT {self.get_select_list(table_name, column)} FROM {table_name}{where}"
+        if order:
+            query += f" ORDER BY {key}"
+        return sqlalchemy.text(query), params, column, mark
+
+    def estimate_rows(self, table_name):
+        """Return the row count of a table, from the catalog when the source dialect has one."""
+        sql = ROW_COUNT_SQL.get(self.source_conn.dialect.name)
+        with self.source_conn.connect() as conn:
+            if sql:
+                rows = conn.execute(sqlalchemy.text(sql), {'table_name': table_name}).scalar()
+            else:
+                rows = conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+        return int(rows or 0)
+
+    def get_partition_workers(self):
+        """Return the number of key ranges of a table read at the same time, bounded by the connection pool capacity."""
+        capacity = self.config.get('pool_size', 5) + self.config.get('max_overflow', 10)
+        if self.config.get('parallel_extract', False):
+            # The extractions of the other tables hold connections too
+            partitioned = len(self.config.get('partition_tables', PARTITION_TABLES))
+            capacity = (capacity - len(SOURCE_TABLES)) // max(1, partitioned)
+        return max(1, capacity)
+
+    def plan_key_ranges(self, table_name):
+        """
+        Split the extraction of a large table into primary key ranges.
+
+        The number of ranges follows the table's estimated size (one per
+        partition_rows rows, up to max_partitions); the bounds come from the
+        MIN/MAX of the keys to extract or from NTILE over them
+        (partition_method), within the incremental filter.
+
+        Args:
+            table_name (str): Source table
+
+        Returns:
+            list: (low, high) key ranges, or None when the table is read in one query
+        """
+        if table_name not in self.config.get('partition_tables', PARTITION_TABLES):
+            return None
+        partition_rows = self.config.get('partition_rows', 500_000)
+        count = partition_count(self.estimate_rows(table_name), partition_rows, self.config.get('max_partitions', 8))
+        if count == 1:
+            return None
+
+        key = PRIMARY_KEYS[SOURCE_DATASETS[table_name]]
+        where, params, column, mark = self.build_extract_filter(table_name)
+        with self.source_conn.connect() as conn:
+            if self.config.get('partition_method', 'minmax') == 'ntile':
+                bounds = conn.execute(sqlalchemy.text(
+                    f"SELECT MIN({key}) AS bound FROM "
+                    f"(SELECT {key}, NTILE({count}) OVER (ORDER BY {key}) AS tile FROM {table_name}{where}) tiles "
+                    f"GROUP BY tile ORDER BY bound"
+                ), params).scalars().all()
+            else:
+                low, high = conn.execute(sqlalchemy.text(f"SELECT MIN({key}), MAX({key}) FROM {table_name}{where}"), params).one()
+                if low is None:
+                    return None
+                # An incremental delta spans fewer keys than the table holds rows
+                count = min(count, math.ceil((high - low + 1) / partition_rows))
+                bounds = even_bounds(low, high, count)
+
+        return key_ranges(bounds) if len(bounds) > 1 else None
+
+    def read_key_ranges(self, table_name, ranges):
+        """
+        Read the key ranges of a table concurrently over the pooled engine.
+
+        Args:
+            table_name (str): Source table
+            ranges (list): (low, high) key ranges, as planned by plan_key_ranges()
+
+        Returns:
+            pd.DataFrame: The rows of every range, concatenated in key range order
+        """
+        key = PRIMARY_KEYS[SOURCE_DATASETS[table_name]]
+
+        def read_range(key_range):
+            query, params, column, mark = self.build_extract_query(table_name, key, key_range=key_range)
+            return pd.read_sql(query, self.source_conn, params=params)
+
+        workers = min(len(ranges), self.get_partition_workers())
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"etl-extract-{table_name}") as executor:
+            frames = list(executor.map(read_range, ranges))
+        return pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+
+    def track_watermark(self, table_name, column, df):
+        """Keep the highest watermark value seen for a table pending until commit_watermarks()."""
+        if not column or df[column].dropna().empty:
+            return
+        value = df[column].max()
+        pending = self.pending_watermarks.get(table_name)
+        if pending is None or watermark_order(value) > watermark_order(pending[1]):
+            self.pending_watermarks[table_name] = (column, value)
+
+    def extract_data(self, table_name, chunk_size=None, after=None):
         """
         Extract data from source SQL Server database.
+
+        In incremental mode only rows at or past the table's saved high-water
+        mark are read; the new mark is kept pending until commit_watermarks().
+        Large tables are read in primary key ranges over several connections
+        (see plan_key_ranges).
         
         Args:
             table_name (str): Name of the table to extract data from
+            chunk_size (int, optional): When set, stream the table in chunks of this many rows
+            after (optional): In chunks, only read the rows whose primary key is above this value
             
         Returns:
-            pd.DataFrame: DataFrame containing extracted data
+            pd.DataFrame: DataFrame containing extracted data, or an iterator of
+            DataFrames when chunk_size is set
         """
+        if chunk_size:
+            return self.extract_chunks(table_name, chunk_size, after)
+
         try:
-            query = f"SELECT * FROM {table_name} WHERE last_update > (SELECT MAX(last_update) FROM {table_name})"
-            if pd.read_sql(query, self.source_conn).empty:
-                query = f"SELECT * FROM {table_name}"
+            start = time.perf_counter()
+            with self.instrumentation.stage(f"extract_data:{table_name}") as record:
+                ranges = self.plan_key_ranges(table_name)
+                query, params, column, mark = self.build_extract_query(table_name)
+                if ranges:
+                    df = self.read_key_ranges(table_name, ranges)
+                else:
+                    df = pd.read_sql(query, self.source_conn, params=params)
+                self.track_watermark(table_name, column, df)
+                df = self.compact(df, SOURCE_DATASETS[table_name], 'extracted')
+                record['rows_out'] = len(df)
+            if self.staging:
+                self.staging.write_raw(table_name, df)
 
-            return pd.read_sql(query, self.source_conn)
+            split = f" in {len(ranges)} key ranges" if ranges else ''
+            logger.info(f"Extracted {len(df)} rows from {table_name}{split} in {time.perf_counter() - start:.2f}s (watermark: {mark})")
+            return df
         except Exception as e:
             logger.error(f"Error extracting data from {table_name}: {str(e)}")
             raise
 
-    def get_product_mapping(self):
-        """Fetch product_id mappings from the products table."""
-        
-        query = "SELECT product_name, product_id FROM products"
-        df_products = pd.read_sql(query, self.source_conn)
-        
-        return dict(zip(df_products['product_name'].str.lower().str.strip(), df_products['product_id']))
+    def extract_chunks(self, table_name, chunk_size, after=None):
+        """
+        Stream a table from the source database in chunks.
 
-    def clean_dataframe(self, df):
-        # Load product mapping dynamically
-        for column in df.columns:
+        The rows are read in primary key order, so a key repeated in the
+        source arrives in one run of rows and, on resume, the chunks already
+        loaded are the rows up to the last key recorded.
 
-            if df[column].dtype in ['float64', 'int64']:
-                df.loc[:, column] = df[column].fillna(0)
+        Args:
+            table_name (str): Name of the table to extract data from
+            chunk_size (int): Number of rows per chunk
+            after (optional): Only read the rows whose primary key is above this value
 
-            if column in ['registration_date', 'birth_date', 'purchase_date', 'shipping_date', 'delivery_date', 'return_date', 'last_login', 'last_update']:
-                df.loc[:, column] = pd.to_datetime(df[column], errors='coerce')
+        Yields:
+            pd.DataFrame: Next chunk of extracted data
+        """
+        try:
+            key = PRIMARY_KEYS[SOURCE_DATASETS[table_name]]
+            query, params, column, mark = self.build_extract_query(table_name, key, after, order=True)
+            rows = 0
+            elapsed = 0.0
+            with self.source_conn.connect().execution_options(stream_results=True) as conn:
+                chunks = iter(pd.read_sql(query, conn, params=params, chunksize=chunk_size))
+                while True:
+                    # Only measure the reads, not the work done on each chunk downstream
+                    start = time.perf_counter()
+                    with self.instrumentation.stage(f"extract_data:{table_name}") as record:
+                        chunk = next(chunks, None)
+                        if chunk is not None:
+                            self.track_watermark(table_name, column, chunk)
+                            chunk = self.compact(chunk, SOURCE_DATASETS[table_name], 'extracted')
+                            record['rows_out'] = len(chunk)
+                    elapsed += time.perf_counter() - start
+                    if chunk is None:
+                        break
+                    rows += len(chunk)
+                    yield chunk
 
-            if column in ['quantity', 'unit_price', 'refund_amount']:
-                df.loc[:, column] = pd.to_numeric(df[column], errors='coerce')
-                df.loc[:, column] = df[column].abs()
+            logger.info(f"Extracted {rows} rows from {table_name} in chunks of {chunk_size} in {elapsed:.2f}s (watermark: {mark})")
+        except Exception as e:
+            logger.error(f"Error extracting data from {table_name}: {str(e)}")
+            raise
 
-            if column == 'phone':
-                df.loc[:, column] = df[column].str.replace(r'\D', '', regex=True) 
+    def compact(self, df, dataset, stage):
+        """
+        Convert a frame to memory-compact dtypes and record its memory before and after.
 
-            if column == 'product_id':
-                df.loc[:, 'product_id'] = pd.to_numeric(df['product_id'], errors='coerce').astype('Int64')
+        Args:
+            df (pd.DataFrame): Extracted or transformed data
+            dataset (str): Dataset name
+            stage (str): 'extracted' or 'transformed', the entry of the memory report
 
-            if df[column].dtype == "object":
-                df.loc[:, column] = df[column].astype(str).str.lower().str.strip()
-                df.loc[:, column] = df[column].fillna("Unknown")
+        Returns:
+            pd.DataFrame: Data with compact dtypes (unchanged when compact_dtypes is off)
+        """
+        before = frame_memory_mb(df)
+        if self.config.get('compact_dtypes', True):
+            df = compact_frame(df, dataset)
+        after = frame_memory_mb(df) if self.config.get('compact_dtypes', True) else before
 
+        # Chunks of a table add up to the table's entry
+        totals = self.frame_memory.setdefault(dataset, {}).setdefault(stage, {'rows': 0, 'before_mb': 0.0, 'after_mb': 0.0})
+        totals['rows'] += len(df)
+        totals['before_mb'] += before
+        totals['after_mb'] += after
         return df
 
+    def log_frame_memory(self):
+        """Log the memory held by each table's frames before and after the dtype compaction."""
+        for dataset, stages in self.frame_memory.items():
+            for stage, totals in stages.items():
+                logger.info(
+                    f"{dataset} {stage}: {totals['rows']} rows, {totals['before_mb']:.1f} MB -> {totals['after_mb']:.1f} MB"
+                )
+
+    def checkpointed_watermarks(self):
+        """Return the pending high-water marks in the form saved in the run's checkpoint."""
+        return {
+            table_name: {'column': column, 'value': to_json_value(value)}
+            for table_name, (column, value) in self.pending_watermarks.items()
+        }
+
+    def restore_checkpoint(self):
+        """
+        Restore the state of the checkpointed run being resumed.
+
+        The pending high-water marks of the tables it extracted come back,
+        and the surrogate key indexes are rebuilt from the warehouse, which
+        holds every dimension row the run loaded before failing.
+        """
+        for table_name, mark in self.checkpoint.get_state('watermarks', {}).items():
+            self.pending_watermarks[table_name] = (mark['column'], mark['value'])
+        self.key_service.clear()
+
+    def commit_watermarks(self):
+        """Advance the saved high-water marks once the extracted rows have been loaded."""
+        for table_name, (column, value) in self.pending_watermarks.items():
+            self.watermarks.update(table_name, column, value)
+        self.watermarks.save()
+        self.pending_watermarks = {}
+        logger.info("Watermarks committed")
+
+    def clean_dataframe(self, df, dataset):
+        """
+        Clean a DataFrame using the column rules declared for its dataset.
+
+        Rules the extraction query already applied (see get_select_list) are skipped.
+
+        Args:
+            df (pd.DataFrame): Data to clean
+            dataset (str): Dataset name ('clients', 'customers', 'products', 'purchases' or 'returns')
+
+        Returns:
+            pd.DataFrame: Cleaned data
+        """
+        return get_cleaning_plan(dataset).apply(df, self.date_normalizer, self.pushed_down.get(dataset, frozenset()))
+
+    @instrumented('transform_client_data')
     def transform_client_data(self, df):
         """
         Transform client data.
@@ -95,16 +595,14 @@ class ETLPipeline:
 
         logger.info("🔄 Transforming client data")
         
-        df = self.clean_dataframe(df)
+        df = self.clean_dataframe(df, 'clients')
 
         df = df.drop_duplicates(subset=['client_id'])
 
-        df['registration_date'] = pd.to_datetime(df['registration_date'], errors='coerce')
-        df['status'] = df['status'].str.lower().str.replace(' ', '_')
-        
-        return df
+        return self.compact(df, 'clients', 'transformed')
     
     
+    @instrumented('transform_customer_data')
     def transform_customer_data(self, df):
         """
         Transform customer data.
@@ -120,14 +618,11 @@ class ETLPipeline:
 
         df = df.drop_duplicates(subset=['customer_id'])
 
-        df = self.clean_dataframe(df)
+        df = self.clean_dataframe(df, 'customers')
 
-        df['registration_date'] = pd.to_datetime(df['registration_date'], errors='coerce')
-        df['birth_date'] = pd.to_datetime(df['registration_date'], errors='coerce')
-        df['last_login'] = pd.to_datetime(df['registration_date'], errors='coerce')        
-
-        return df
+        return self.compact(df, 'customers', 'transformed')
     
+    @instrumented('transform_product_data')
     def transform_product_data(self, df):
         """
         Transform product data.
@@ -140,21 +635,66 @@ class ETLPipeline:
         """
         logger.info("🔄 Transforming product data")
 
-        df = self.clean_dataframe(df)
+        df = self.clean_dataframe(df, 'products')
 
         df = df.drop_duplicates(subset=['product_id'])
 
-        return df
+        return self.compact(df, 'products', 'transformed')
     
-    def product_id_processing(self,df):
-        product_mapping = self.get_product_mapping()
+    def get_product_resolver(self):
+        """
+        Return the run's product resolver, reading the product list on first use.
+
+        The list comes from the staging layer in runs started from a later
+        stage, from the warehouse in incremental runs, which have already
+        loaded every product up to the saved mark, and from the source otherwise.
+        """
+        if self.product_resolver is None:
+            if self.from_stage != 'extract':
+                products = self.staging.read_raw(PRODUCT_LOOKUP, columns=['product_id', 'product_name'])
+            elif self.config.get('incremental', False):
+                products = self.read_loaded_products()
+            else:
+                products = pd.read_sql("SELECT product_id, product_name FROM products", self.source_conn)
+                if self.staging:
+                    self.staging.write_raw(PRODUCT_LOOKUP, products)
+            self.product_resolver = ProductResolver(products)
+        return self.product_resolver
+
+    def read_loaded_products(self):
+        """Return the ids and names of the products loaded into the warehouse, without the unknown member."""
+        return pd.read_sql(
+            sqlalchemy.text("SELECT product_id, product_name FROM dim_products WHERE product_key <> :unknown"),
+            self.target_conn,
+            params={'unknown': UNKNOWN_KEY}
+        )
+
+    def product_id_processing(self, df, dataset=None):
+        """
+        Resolve product_id values holding product names or numeric strings to product ids.
+
+        Rows whose product cannot be resolved are dropped and counted.
+
+        Args:
+            df (pd.DataFrame): Purchase or return data
+            dataset (str, optional): Dataset name used to report unresolved products
 
-        df['product_id'] = df['product_id'].apply(lambda x: product_mapping.get(x.lower().strip(), None) if isinstance(x, str) else x)
+        Returns:
+            pd.DataFrame: Data with a numeric product_id
+        """
+        resolved = self.get_product_resolver().resolve(df['product_id'])
 
+        unresolved = int((resolved.isna() & df['product_id'].notna()).sum())
+        if unresolved:
+            self.unresolved_products[dataset] = self.unresolved_products.get(dataset, 0) + unresolved
+            logger.warning(f"{unresolved} product references in {dataset} could not be resolved")
+
+        df['product_id'] = resolved
         df = df.dropna(subset=['product_id'])
 
         return df
 
+    @instrumented('transform_purchase_data')
     def transform_purchase_data(self, df):
         """
         Transform purchase data.
@@ -169,16 +709,15 @@ class ETLPipeline:
         logger.info("🔄 Transforming purchase data")
 
 
-        df = self.product_id_processing(df)
-
-        df = self.clean_dataframe(df)
+        df = self.product_id_processing(df, 'purchases')
 
-        df.loc[:, 'payment_status'] = df['payment_status'].str.lower().str.replace(' ', '_')
+        df = self.clean_dataframe(df, 'purchases')
 
         df = df.drop_duplicates(subset=['purchase_id'])
 
-        return df
+        return self.compact(df, 'purchases', 'transformed')
     
+    @instrumented('transform_return_data')
     def transform_return_data(self, df):
         """
         Transform return data.
@@ -192,75 +731,30 @@ class ETLPipeline:
 
         logger.info("🔄 Transforming return data")
 
-        df = self.product_id_processing(df)
+        df = self.product_id_processing(df, 'returns')
 
-        df = self.clean_dataframe(df)
+        df = self.clean_dataframe(df, 'returns')
 
-        df.loc[:, 'status'] = df['status'].str.lower().str.replace(' ', '_')
         df = df.drop_duplicates(subset=['return_id'])
-        return df
+        return self.compact(df, 'returns', 'transformed')
     
-    def get_product_mapping(self):
-        """Fetch product_id mappings from the products table."""
-        
-        query = "SELECT product_name, product_id FROM interview_db.dbo.products"
-        df_products = pd.read_sql(query, self.source_conn)
-        
-        return dict(zip(df_products['product_name'].str.lower().str.strip(), df_products['product_id']))
-
-
+    @instrumented('validate_data')
     def validate_data(self, transformed_data):
         """
-        Validate transformed data for quality issues.
+        Validate transformed data against the quality rules of each dataset.
         
         Args:
             transformed_data (dict): Dictionary containing transformed DataFrames
             
         Returns:
-            dict: Dictionary containing validation results
+            dict: Failed and checked row counts, with sample failing keys, per dataset and rule
         """
-        validation_results = {}
-        
-        for table_name, df in transformed_data.items():
-            table_results = {
-                'missing_values': self.check_missing_values(df),
-                'duplicates': self.check_duplicates(df),
-                'negative_values': self.check_negative_values(df),
-                'invalid_dates': self.check_invalid_dates(df)
-            }
-            validation_results[table_name] = table_results
-            
-        return validation_results
-    
-    def check_missing_values(self, df):
-        """Check for missing values in DataFrame."""
-        missing_values = df.isnull().sum()
-        missing_dict = missing_values[missing_values > 0].to_dict()
-
-        logger.info(f"Missing values detected: {missing_dict}")
-        return missing_dict
-    
-    def check_duplicates(self, df):
-        duplicate_count = df.duplicated().sum()
-        if duplicate_count > 0:
-            df = df.drop_duplicates()
-    
-    def check_negative_values(self, df):
-        """Check for negative values in numeric columns."""
-        numeric_cols = df.select_dtypes(include=['number'])
-        negatives = (numeric_cols < 0).sum()
-        negative_dict = negatives[negatives > 0].to_dict()
-
-        logger.info(f"Negative values detected: {negative_dict}")
-        return negative_dict
-    
-    def check_invalid_dates(self, df):
-        date_cols = df.select_dtypes(include=['datetime64'])
-        invalid_dates = {col: df[col].isna().sum() for col in date_cols}
-
-        logger.info(f"Invalid dates detected: {invalid_dates}")
-        return invalid_dates
+        return {
+            dataset: self.quality.evaluate(dataset, df, PRIMARY_KEYS.get(dataset))
+            for dataset, df in transformed_data.items()
+        }
     
+    @instrumented('create_dimension_tables')
     def create_dimension_tables(self, transformed_data):
         """
         Create dimension tables for the data warehouse.
@@ -273,47 +767,216 @@ class ETLPipeline:
         """
         dimensions = {}
 
-        dimensions['dim_clients'] = transformed_data['clients'][['client_id', 'company_name', 'contact_name', 'email', 'phone', 'city', 'state', 'country', 'status']]
-        dimensions['dim_customers'] = transformed_data['customers'][['customer_id', 'first_name','last_name', 'email', 'phone', 'city', 'state', 'country', 'birth_date']]
-        dimensions['dim_products'] = transformed_data['products'][['product_id', 'product_name', 'category', 'sub_category', 'supplier', 'selling_price', 'is_active']]
+        for dataset in ['clients', 'customers', 'products']:
+            table_name = WAREHOUSE_TABLES[dataset]
+            dimensions[table_name] = self.build_warehouse_table(dataset, transformed_data[dataset])
+
+        # Calendar days of the fact dates not in dim_date yet
+        fact_dates = pd.concat([
+            transformed_data[dataset][FACT_DATE_COLUMNS[WAREHOUSE_TABLES[dataset]]]
+            for dataset in ['purchases', 'returns']
+        ])
+        dimensions.update(self.extend_date_dimension(fact_dates))
 
         logger.info("✅ Dimension tables created successfully")
         return dimensions
     
+    @instrumented('create_fact_tables')
     def create_fact_tables(self, transformed_data):
         """
         Create fact tables for the data warehouse.
         
         Args:
             transformed_data (dict): Dictionary containing transformed DataFrames
-            dimensions (dict): Dictionary containing dimension tables
             
         Returns:
             dict: Dictionary containing fact tables
         """
         facts = {}
 
-        facts['fact_sales'] = transformed_data['purchases'][['purchase_id', 'client_id', 'customer_id', 'product_id', 'purchase_date', 'quantity', 'unit_price', 'total_amount', 'payment_method', 'payment_status']]
-        facts['fact_returns'] = transformed_data['returns'][['return_id', 'purchase_id', 'client_id', 'customer_id', 'product_id', 'return_date', 'quantity', 'refund_amount', 'status']]
+        for dataset in ['purchases', 'returns']:
+            table_name = WAREHOUSE_TABLES[dataset]
+            facts[table_name] = self.build_warehouse_table(dataset, transformed_data[dataset])
 
         logger.info("✅ Fact tables created successfully")
         return facts
     
+    def build_warehouse_table(self, dataset, df):
+        """
+        Project a transformed dataset onto its warehouse table.
+
+        Dimension rows get their surrogate key from the key service (type 2
+        dimensions through the SCD engine, which versions them); fact rows
+        have their natural references replaced by the dimensions' surrogate
+        keys (the version valid on the fact's date for type 2 dimensions),
+        orphans pointing at the unknown member.
+
+        Args:
+            dataset (str): Dataset name
+            df (pd.DataFrame): Transformed data
+
+        Returns:
+            pd.DataFrame: Rows of the warehouse table
+        """
+        table_name = WAREHOUSE_TABLES[dataset]
+
+        if table_name in DIMENSION_KEYS:
+            natural, key = DIMENSION_KEYS[table_name]
+            missing = df[natural].isna()
+            if missing.any():
+                logger.warning(f"Dropping {int(missing.sum())} {dataset} rows without a {natural}")
+                df = df[~missing]
+            if table_name in TRACKED_COLUMNS:
+                df = self.scd.apply(table_name, df, self.target_conn, self.instrumentation.started_at)
+            else:
+                df = df.assign(**{key: self.key_service.assign(table_name, df[natural], self.target_conn)})
+        else:
+            keys = {}
+            for dimension, (natural, key) in DIMENSION_KEYS.items():
+                if dimension in TRACKED_COLUMNS:
+                    event_dates = df[FACT_DATE_COLUMNS[table_name]]
+                    keys[key], orphans = self.scd.lookup(dimension, df[natural], event_dates, self.target_conn)
+                else:
+                    keys[key], orphans = self.key_service.lookup(dimension, df[natural], self.target_conn)
+                if orphans:
+                    counts = self.orphan_references.setdefault(table_name, {})
+                    counts[natural] = counts.get(natural, 0) + orphans
+                    logger.warning(f"{orphans} {table_name} rows reference an unknown {natural}, routed to the unknown member")
+            date_column = FACT_DATE_COLUMNS[table_name]
+            keys[f"{date_column}_key"] = date_keys(df[date_column])
+            df = df.assign(**keys)
+
+        return df[WAREHOUSE_COLUMNS[table_name]]
+
+    def extend_date_dimension(self, dates):
+        """
+        Build the dim_date rows missing for a batch of fact dates.
+
+        Args:
+            dates (pd.Series): Fact dates
+
+        Returns:
+            dict: {'dim_date': new rows}, or an empty dict when the calendar already covers the dates
+        """
+        calendar = self.calendar.extend(dates, self.target_conn)
+        return {'dim_date': calendar} if not calendar.empty else {}
+
+    def load_unknown_members(self):
+        """Make sure every dimension holds the unknown-member row orphan facts point at."""
+        with self.target_conn.begin() as conn:
+            loader = UpsertLoader(conn, self.writer)
+            for table_name in DIMENSION_KEYS:
+                row = self.key_service.unknown_member(table_name, WAREHOUSE_COLUMNS[table_name])
+                loader.load(row, table_name, WAREHOUSE_KEYS[table_name])
+            loader.load(unknown_date(), 'dim_date', WAREHOUSE_KEYS['dim_date'])
+
+    @instrumented('load_data', label=lambda tables: ','.join(tables))
     def load_data(self, tables):
         """
         Load transformed data into the target database.
+
+        Tables are loaded concurrently in the order given by the foreign keys
+        of the warehouse schema, each in its own transaction: a failing table
+        is rolled back and the tables referencing it are not loaded.
         
         Args:
             tables (dict): Dictionary containing tables to load
         """
         try:
-            for table_name, df in tables.items():
-                df.to_sql(table_name, self.target_conn, if_exists='append', index=False)
-                logger.info(f"Loaded {len(df)} rows into {table_name}")
+            results = self.get_load_scheduler().run(tables, self.load_table)
+            for table_name, counts in results.items():
+                totals = self.load_counts.setdefault(table_name, {'inserted': 0, 'updated': 0, 'unchanged': 0})
+                for action, count in counts.items():
+                    totals[action] = totals.get(action, 0) + count
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             raise
+
+    def load_table(self, table_name, df):
+        """
+        Load one table in its own transaction.
+
+        Tables are upserted on their key, so loading the same rows again
+        updates them instead of failing on the primary key. The 'append' load
+        mode keeps the plain INSERT path for a first load into empty tables.
+
+        Args:
+            table_name (str): Warehouse table
+            df (pd.DataFrame): Rows to load
+
+        Returns:
+            dict: Number of rows inserted, updated and unchanged
+        """
+        start = time.perf_counter()
+        with self.instrumentation.stage(f"load_table:{table_name}", rows_in=len(df)) as record:
+            with self.target_conn.begin() as conn:
+                if self.config.get('load_mode', 'upsert') == 'append':
+                    self.writer.write(df, table_name, conn)
+                    counts = {'inserted': len(df), 'updated': 0, 'unchanged': 0}
+                else:
+                    # Type 2 dimensions close the versions the loaded rows replace
+                    version_of = DIMENSION_KEYS[table_name][0] if table_name in TRACKED_COLUMNS else None
+                    # Facts add their delta to the summary tables in the same transaction
+                    before_merge = None
+                    if self.aggregates.tables_of(table_name) or self.aggregates.lookups_of(table_name):
+                        def before_merge(staging_table):
+                            self.aggregates.apply_delta(conn, table_name, staging_table, WAREHOUSE_KEYS[table_name])
+                    counts = UpsertLoader(conn, self.writer).load(
+                        df, table_name, WAREHOUSE_KEYS[table_name], version_of=version_of, before_merge=before_merge
+                    )
+            record['rows_out'] = counts['inserted'] + counts['updated']
+        # Streaming runs record their progress per chunk instead
+        if self.checkpoint and not self.config.get('chunk_size'):
+            self.checkpoint.complete(f"load:{table_name}")
+
+        elapsed = time.perf_counter() - start
+        closed = f", {counts['closed']} versions closed" if 'closed' in counts else ''
+        logger.info(
+            f"Loaded {len(df)} rows into {table_name} in {elapsed:.2f}s ({len(df) / max(elapsed, 1e-6):.0f} rows/s): "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged{closed}"
+        )
+        return counts
+
+    def maintain_aggregates(self):
+        """
+        Finish the summary tables after the load.
+
+        They are maintained incrementally during upsert loads; append loads
+        and the 'rebuild' aggregate mode recompute them from the facts, and
+        the 'validate' mode checks them against a full recompute.
+        """
+        mode = self.config.get('aggregate_mode', 'incremental')
+        with self.target_conn.begin() as conn:
+            if mode == 'rebuild' or self.config.get('load_mode', 'upsert') == 'append':
+                self.aggregates.rebuild(conn)
+            if mode == 'validate':
+                self.aggregate_mismatches = self.aggregates.validate(conn)
+
+    def get_load_scheduler(self):
+        """Build the load scheduler from the foreign keys of the warehouse schema on first use."""
+        if self.load_scheduler is None:
+            dependencies = load_foreign_keys(self.config.get('dw_schema_path', DW_SCHEMA_PATH))
+            # SQLite allows a single writer, so concurrent loads would only wait on each other
+            if not dependencies or self.target_conn.dialect.name == 'sqlite':
+                workers = 1
+            else:
+                workers = self.config.get('load_workers', 3)
+            self.load_scheduler = LoadScheduler(dependencies, max_workers=workers)
+        return self.load_scheduler
     
+    def get_engine_options(self):
+        """Return the connection pool settings given in the config."""
+        options = {'pool_pre_ping': self.config.get('pool_pre_ping', True)}
+        for key in ['pool_size', 'max_overflow']:
+            if key in self.config:
+                options[key] = self.config[key]
+        return options
+
+    def get_extract_workers(self):
+        """Return the number of extraction threads, bounded by the connection pool capacity."""
+        pool_capacity = self.config.get('pool_size', 5) + self.config.get('max_overflow', 10)
+        return max(1, min(len(SOURCE_TABLES), pool_capacity))
+
     def connect_to_source_database(self):
         """
         Establish connection to the source database.
@@ -324,8 +987,8 @@ class ETLPipeline:
             username = self.config.get('source_username', os.getenv('DB_USER', 'sa'))
             password = self.config.get('source_password', os.getenv('DB_PASSWORD', 'YourStrongPassword123!'))
             
-            connection_string = f"mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
-            self.source_conn = sqlalchemy.create_engine(connection_string)
+            connection_string = self.config.get('source_url') or f"mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
+            self.source_conn = sqlalchemy.create_engine(connection_string, **self.get_engine_options())
             logger.info("Connected to source database")
         except Exception as e:
             logger.error(f"Error connecting to source database: {str(e)}")
@@ -341,8 +1004,12 @@ class ETLPipeline:
             username = self.config.get('target_username', os.getenv('DW_USER', 'sa'))
             password = self.config.get('target_password', os.getenv('DW_PASSWORD', 'YourStrongPassword123!'))
             
-            connection_string = f"mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
-            self.target_conn = sqlalchemy.create_engine(connection_string)
+            connection_string = self.config.get('target_url') or f"mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
+            self.target_conn = sqlalchemy.create_engine(connection_string, **self.get_engine_options())
+            if self.target_conn.dialect.name == 'sqlite':
+                # A local SQLite warehouse has no setup script run against it
+                with self.target_conn.begin() as conn:
+                    create_sqlite_schema(conn, self.config.get('dw_schema_path', DW_SCHEMA_PATH))
             logger.info("Connected to target database")
         except Exception as e:
             logger.error(f"Error connecting to target database: {str(e)}")
@@ -356,59 +1023,328 @@ class ETLPipeline:
             self.target_conn.dispose()
         logger.info("Database connections closed")
     
+    def get_transformers(self):
+        """Return the transform method for each dataset."""
+        return {
+            'clients': self.transform_client_data,
+            'customers': self.transform_customer_data,
+            'products': self.transform_product_data,
+            'purchases': self.transform_purchase_data,
+            'returns': self.transform_return_data
+        }
+
+    def merge_validation_results(self, totals, results):
+        """Add the counts of one chunk's validation results into the running totals."""
+        return self.quality.merge(totals, results)
+
+    def prepare_product_resolver(self, products):
+        """
+        Build the product resolver from the products extract.
+
+        An incremental extract only holds the products changed since the
+        saved mark: the products already loaded are read from the warehouse
+        instead of the whole source table, and the extract's rows override them.
+        """
+        if self.from_stage != 'extract':
+            self.get_product_resolver()
+            return
+
+        products = products[['product_id', 'product_name']]
+        if self.config.get('incremental', False):
+            products = pd.concat([self.read_loaded_products(), products], ignore_index=True)
+        self.product_resolver = ProductResolver(products)
+        if self.staging:
+            self.staging.write_raw(PRODUCT_LOOKUP, products)
+
+    def read_extract(self, table_name):
+        """Return a source table, read from the staging layer when the run starts at the transform stage."""
+        if self.from_stage == 'transform':
+            return self.staging.read_raw(table_name, since=self.config.get('stage_since'))
+        return self.extract_data(table_name)
+
+    def read_transformed(self, dataset):
+        """Read a staged transformed dataset, projected on the columns its warehouse table is built from."""
+        table_name = WAREHOUSE_TABLES[dataset]
+        columns = WAREHOUSE_COLUMNS[table_name] + [natural for natural, key in DIMENSION_KEYS.values()]
+        if table_name in FACT_DATE_COLUMNS:
+            columns.append(FACT_DATE_COLUMNS[table_name])
+        return self.staging.read_processed(dataset, columns=list(dict.fromkeys(columns)))
+
+    def extract_and_transform_parallel(self):
+        """
+        Extract the source tables concurrently and transform each one as soon as it is available.
+
+        Purchases and returns wait for the products extract, which their
+        product resolution depends on.
+
+        Returns:
+            dict: Dictionary containing transformed DataFrames
+        """
+        transformers = self.get_transformers()
+        extracted_data = {}
+        transforms = {}
+        waiting_for_products = []
+
+        with ThreadPoolExecutor(max_workers=self.get_extract_workers(), thread_name_prefix='etl-extract') as executor:
+            extracts = {
+                executor.submit(self.extract_data, table_name): dataset
+                for dataset, table_name in SOURCE_TABLES.items()
+            }
+
+            for future in as_completed(extracts):
+                dataset = extracts[future]
+                extracted_data[dataset] = future.result()
+                if len(extracted_data) == len(SOURCE_TABLES):
+                    self.checkpoint_extracts(extracted_data)
+
+                if dataset == 'products':
+                    # Build the resolver before the products transform changes the frame
+                    self.prepare_product_resolver(extracted_data['products'])
+                    ready = [dataset] + waiting_for_products
+                elif dataset in ('purchases', 'returns') and 'products' not in extracted_data:
+                    waiting_for_products.append(dataset)
+                    ready = []
+                else:
+                    ready = [dataset]
+
+                for name in ready:
+                    transforms[name] = executor.submit(transformers[name], extracted_data[name])
+
+            return {dataset: transforms[dataset].result() for dataset in SOURCE_TABLES}
+
+    def checkpoint_extracts(self, extracted_data):
+        """Persist the extracted tables and their pending high-water marks in the run's checkpoint."""
+        if self.checkpoint:
+            self.checkpoint.write_frames(EXTRACT, extracted_data)
+            self.checkpoint.complete(EXTRACT, watermarks=self.checkpointed_watermarks())
+
+    def run_batch(self):
+        """
+        Extract, transform and load every table as a whole DataFrame.
+
+        With the staging layer, extracts and transformed frames are written to
+        Parquet, and a run starting at the 'transform' or 'load' stage reads
+        them back instead of querying the source database.
+
+        Checkpointed runs persist the extracts and the warehouse tables built
+        from them, and mark each table once loaded; a resumed run starts
+        after the last completed stage and only loads the remaining tables.
+        """
+        if self.checkpoint and self.checkpoint.is_done(TRANSFORM):
+            logger.info(f"Reading the warehouse tables built by run {self.checkpoint.run_id}")
+            tables = self.checkpoint.read_frames(TRANSFORM, self.checkpoint.get_state('tables'))
+            validation_results = self.validation_results = self.checkpoint.get_state('data_quality', {})
+            return self.load_remaining(tables, validation_results)
+
+        resumed_extract = self.checkpoint is not None and self.checkpoint.is_done(EXTRACT)
+        if self.from_stage == 'load':
+            logger.info("Reading transformed data from the staging layer")
+            transformed_data = {dataset: self.read_transformed(dataset) for dataset in SOURCE_TABLES}
+        elif self.config.get('parallel_extract', False) and self.from_stage == 'extract' and not resumed_extract:
+            logger.info("Extracting and transforming data in parallel")
+            transformed_data = self.extract_and_transform_parallel()
+        else:
+            # Extract
+            if resumed_extract:
+                logger.info(f"Reading the data extracted by run {self.checkpoint.run_id}")
+                extracted_data = self.checkpoint.read_frames(EXTRACT, SOURCE_TABLES)
+            else:
+                logger.info("Extracting data from source database" if self.from_stage == 'extract' else "Reading extracted data from the staging layer")
+                extracted_data = {
+                    dataset: self.read_extract(table_name)
+                    for dataset, table_name in SOURCE_TABLES.items()
+                }
+                self.checkpoint_extracts(extracted_data)
+            self.prepare_product_resolver(extracted_data['products'])
+
+            # Transform
+            logger.info("Transforming data")
+            transformers = self.get_transformers()
+            transformed_data = {
+                dataset: transformers[dataset](extracted_data[dataset])
+                for dataset in SOURCE_TABLES
+            }
+
+        if self.staging and self.from_stage != 'load':
+            for dataset, df in transformed_data.items():
+                self.staging.write_processed(dataset, df)
+
+        # Validate; a rule over its threshold fails the run before anything is loaded
+        logger.info("Validating data")
+        validation_results = self.validation_results = self.validate_data(transformed_data)
+        self.quality.enforce(validation_results)
+
+        # Create dimension and fact tables
+        logger.info("Creating dimension tables")
+        dimensions = self.create_dimension_tables(transformed_data)
+
+        logger.info("Creating fact tables")
+        facts = self.create_fact_tables(transformed_data)
+
+        tables = {**dimensions, **facts}
+        if self.checkpoint:
+            self.checkpoint.write_frames(TRANSFORM, tables)
+            self.checkpoint.complete(TRANSFORM, tables=list(tables), data_quality=validation_results)
+
+        return self.load_remaining(tables, validation_results)
+
+    def load_remaining(self, tables, validation_results):
+        """Load the warehouse tables, skipping those a resumed run already loaded."""
+        if self.checkpoint:
+            loaded = [table_name for table_name in tables if self.checkpoint.is_done(f"load:{table_name}")]
+            if loaded:
+                logger.info(f"Skipping tables loaded by run {self.checkpoint.run_id}: {loaded}")
+            tables = {table_name: df for table_name, df in tables.items() if table_name not in loaded}
+
+        # Load; the scheduler loads the dimensions before the facts referencing them
+        logger.info("Loading dimension and fact tables into data warehouse")
+        self.load_data(tables)
+
+        return validation_results
+
+    def run_streaming(self, chunk_size):
+        """
+        Stream every table through extract, transform and load chunk by chunk.
+
+        Only one chunk per table is held in memory at a time. Chunks arrive
+        in primary key order, so the transform drops the duplicated keys of a
+        chunk and the rows of a key continued from the previous chunk are
+        dropped against the highest key loaded so far.
+        Checkpointed runs record the last source key loaded after each chunk,
+        and a resumed run reads each table from there.
+
+        Args:
+            chunk_size (int): Number of rows per chunk
+
+        Returns:
+            dict: Validation results summed over all chunks
+        """
+        validation_results = self.validation_results = {}
+        transformers = self.get_transformers()
+
+        # Dimensions first, then sales before returns to satisfy the foreign keys
+        for dataset, source_table in SOURCE_TABLES.items():
+            if self.checkpoint and self.checkpoint.is_done(f"load:{dataset}"):
+                logger.info(f"Skipping {dataset}, streamed by run {self.checkpoint.run_id}")
+                continue
+            after = self.checkpoint.get_state('streams', {}).get(dataset) if self.checkpoint else None
+            logger.info(f"Streaming {dataset} in chunks of {chunk_size} rows" + (f" after {PRIMARY_KEYS[dataset]} {after}" if after is not None else ''))
+            key = PRIMARY_KEYS[dataset]
+            table_name = WAREHOUSE_TABLES[dataset]
+            loaded_through = None
+
+            for chunk in self.extract_data(source_table, chunk_size=chunk_size, after=after):
+                last_key = chunk[key].max()
+                df = transformers[dataset](chunk)
+                if loaded_through is not None:
+                    # A key continued from the previous chunk was loaded with it
+                    df = df[~df[key].le(loaded_through).fillna(False)]
+                if not df.empty:
+                    loaded_through = df[key].max()
+
+                self.merge_validation_results(validation_results, self.validate_data({dataset: df}))
+                self.quality.enforce(validation_results)
+                tables = {table_name: self.build_warehouse_table(dataset, df)}
+                if table_name in FACT_DATE_COLUMNS:
+                    tables.update(self.extend_date_dimension(df[FACT_DATE_COLUMNS[table_name]]))
+                self.load_data(tables)
+
+                if self.checkpoint:
+                    streams = {**self.checkpoint.get_state('streams', {}), dataset: to_json_value(last_key)}
+                    self.checkpoint.update_state(streams=streams, watermarks=self.checkpointed_watermarks())
+
+            if self.checkpoint:
+                self.checkpoint.complete(f"load:{dataset}", watermarks=self.checkpointed_watermarks())
+
+        return validation_results
+
     def run_pipeline(self):
         """Execute the complete ETL pipeline."""
+        status = 'failed'
         try:
             logger.info("Starting ETL process")
             
-            # Connect to databases
-            self.connect_to_source_database()
+            chunk_size = self.config.get('chunk_size')
+            if chunk_size and self.staging:
+                raise ValueError("The staging layer is only available in batch mode (chunk_size unset)")
+
+            if self.checkpoint:
+                # The checkpoint is only valid for the mode it was written in
+                self.checkpoint.check_settings(
+                    chunk_size=chunk_size,
+                    incremental=self.config.get('incremental', False),
+                    load_mode=self.config.get('load_mode', 'upsert')
+                )
+                if self.checkpoint.resumed:
+                    self.restore_checkpoint()
+
+            # Connect to databases; runs resuming from the staging layer leave the source alone
+            if self.from_stage == 'extract':
+                self.connect_to_source_database()
             self.connect_to_target_database()
 
-            # Extract
-            logger.info("Extracting data from source database")
-            extracted_data = {
-                'clients': self.extract_data('client'),
-                'customers': self.extract_data('customer'),
-                'products': self.extract_data('products'),
-                'purchases': self.extract_data('purchases'),
-                'returns': self.extract_data('returns')
-            }
+            self.load_unknown_members()
+
+            if chunk_size:
+                validation_results = self.run_streaming(chunk_size)
+            else:
+                validation_results = self.run_batch()
+
+            self.maintain_aggregates()
+
+            # Only advance the marks once everything extracted has been loaded
+            if self.config.get('incremental', False) and self.from_stage == 'extract':
+                self.commit_watermarks()
+            self.key_service.save()
+            if self.checkpoint:
+                self.checkpoint.finish()
             
-            # Transform
-            logger.info("Transforming data")
-            transformed_data = {
-                'clients': self.transform_client_data(extracted_data['clients']),
-                'customers': self.transform_customer_data(extracted_data['customers']),
-                'products': self.transform_product_data(extracted_data['products']),
-                'purchases': self.transform_purchase_data(extracted_data['purchases']),
-                'returns': self.transform_return_data(extracted_data['returns'])
+            self.date_normalizer.log_format_counts()
+            self.log_frame_memory()
+            self.scd.log_changes()
+            timings = {
+                name.split(':', 1)[1]: round(stats['wall_time_s'], 3)
+                for name, stats in self.instrumentation.stages.items()
+                if name.startswith('extract_data:')
             }
-            
-            # Validate
-            logger.info("Validating data")
-            validation_results = self.validate_data(transformed_data)
-            
-            # Create dimension and fact tables
-            logger.info("Creating dimension tables")
-            dimensions = self.create_dimension_tables(transformed_data)
-            
-            logger.info("Creating fact tables")
-            facts = self.create_fact_tables(transformed_data)
-            
-            # Load
-            logger.info("Loading dimension tables into data warehouse")
-            self.load_data(dimensions)
-            
-            logger.info("Loading fact tables into data warehouse")
-            self.load_data(facts)
-            
+            logger.info(f"Extraction timings (s): {timings}")
+
             logger.info("ETL process completed successfully")
+
+            peak_memory = get_peak_memory_mb()
+            if peak_memory is not None:
+                logger.info(f"Peak memory usage: {peak_memory:.1f} MB")
+
+            status = 'succeeded'
+            return validation_results
             
         except Exception as e:
             logger.error(f"ETL process failed: {str(e)}")
+            if self.checkpoint:
+                logger.error(f"Resume the run with: python main.py --resume {self.checkpoint.run_id}")
             raise
         finally:
             self.close_connections()
+            self.write_run_report(status)
 
-
+    def write_run_report(self, status):
+        """Write the JSON run report with the per-stage measurements of this run."""
+        try:
+            self.instrumentation.write_report(
+                self.config.get('run_report_path', os.path.join('logs', 'etl_run_report.json')),
+                status,
+                run_id=self.checkpoint.run_id if self.checkpoint else None,
+                unresolved_products=self.unresolved_products,
+                load_counts=self.load_counts,
+                orphan_references=self.orphan_references,
+                scd_changes=self.scd.changes,
+                aggregate_mismatches=self.aggregate_mismatches,
+                data_quality=self.validation_results,
+                frame_memory={
+                    dataset: {stage: {name: round(value, 3) for name, value in totals.items()} for stage, totals in stages.items()}
+                    for dataset, stages in self.frame_memory.items()
+                },
+                date_formats={column: dict(counts) for column, counts in self.date_normalizer.format_counts.items()}
+            )
+        except OSError as e:
+            logger.error(f"Error writing run report: {str(e)}")
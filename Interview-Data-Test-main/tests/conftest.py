@@ -0,0 +1,43 @@
+import pytest
+import sqlalchemy
+
+from scripts import Insert_data
+
+# Rows generated into the test source database
+SOURCE_SIZES = {'num_clients': 10, 'num_customers': 40, 'num_products': 15, 'num_purchases': 200, 'num_returns': 30}
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    """SQLite warehouse in a temporary file, disposed after the test."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def source_template(tmp_path_factory):
+    """SQLite source generated once per session by Insert_data, with its data quality issues."""
+    path = tmp_path_factory.mktemp('source') / 'src.db'
+    Insert_data.main(sqlite_path=str(path), **SOURCE_SIZES)
+    return path
+
+
+@pytest.fixture
+def source(source_template, tmp_path):
+    """Copy of the generated source the test may change."""
+    path = tmp_path / 'src.db'
+    path.write_bytes(source_template.read_bytes())
+    return path
+
+
+@pytest.fixture
+def pipeline_config(source, tmp_path, monkeypatch):
+    """Pipeline config reading the test source into the test warehouse, with every file under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    return {
+        'source_url': f"sqlite:///{source}",
+        'target_url': f"sqlite:///{tmp_path / 'dw.db'}",
+        'writer': 'multi'
+    }
+
@@ -0,0 +1,130 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_aggregates import AggregateMaintainer
+from scripts.etl_loading import UpsertLoader, create_sqlite_schema
+from scripts.etl_template import ETLPipeline
+
+AGGREGATE_TABLES = ['agg_customer_sales', 'agg_monthly_product_sales', 'agg_customer_returns']
+
+
+@pytest.fixture
+def maintainer(warehouse):
+    with warehouse.begin() as conn:
+        create_sqlite_schema(conn)
+        # Customer 7 has two versions, customer 8 one
+        conn.execute(sqlalchemy.text(
+            "INSERT INTO dim_customers (customer_key, customer_id, is_current) VALUES (1, 7, 0), (2, 8, 1), (3, 7, 1)"
+        ))
+    return AggregateMaintainer()
+
+
+def sales(purchase_ids, customer_keys, amounts):
+    return pd.DataFrame({
+        'purchase_id': purchase_ids,
+        'client_key': 1,
+        'customer_key': customer_keys,
+        'product_key': 1,
+        'purchase_date_key': 20250115,
+        'quantity': 2,
+        'unit_price': [amount / 2 for amount in amounts],
+        'total_amount': amounts,
+        'payment_method': 'cash',
+        'payment_status': ['paid'] * (len(amounts) - 1) + ['refunded']
+    })
+
+
+def returns(return_ids, purchase_ids, customer_keys):
+    return pd.DataFrame({
+        'return_id': return_ids,
+        'purchase_id': purchase_ids,
+        'client_key': 1,
+        'customer_key': customer_keys,
+        'product_key': 1,
+        'return_date_key': 20250120,
+        'quantity': 1,
+        'refund_amount': 5.0,
+        'status': 'approved'
+    })
+
+
+def load_facts(warehouse, maintainer, df, table_name, key):
+    with warehouse.begin() as conn:
+        return UpsertLoader(conn).load(
+            df, table_name, key,
+            before_merge=lambda staging_table: maintainer.apply_delta(conn, table_name, staging_table, key)
+        )
+
+
+def load_sales(warehouse, maintainer, df):
+    return load_facts(warehouse, maintainer, df, 'fact_sales', 'purchase_id')
+
+
+def load_returns(warehouse, maintainer, df):
+    return load_facts(warehouse, maintainer, df, 'fact_returns', 'return_id')
+
+
+def read_table(warehouse, table_name, key):
+    return pd.read_sql(f"SELECT * FROM {table_name} ORDER BY {key}", warehouse)
+
+
+def test_customer_totals_span_every_version(warehouse, maintainer):
+    load_sales(warehouse, maintainer, sales([1, 2, 3], [1, 2, 3], [10.0, 20.0, 30.0]))
+
+    totals = read_table(warehouse, 'agg_customer_sales', 'customer_id')
+    assert totals['customer_id'].tolist() == [7, 8]
+    assert totals['purchase_count'].tolist() == [2, 1]
+    assert totals['total_amount'].tolist() == [40.0, 20.0]
+
+
+def test_risky_returns_follow_the_payment_status_of_the_returned_purchase(warehouse, maintainer):
+    # Purchase 3 is refunded, purchases 1 and 2 are paid
+    load_sales(warehouse, maintainer, sales([1, 2, 3], [1, 2, 3], [10.0, 20.0, 30.0]))
+    load_returns(warehouse, maintainer, returns([1, 2, 3], [1, 2, 3], [1, 2, 3]))
+
+    totals = read_table(warehouse, 'agg_customer_returns', 'customer_id')
+    assert totals['return_count'].tolist() == [2, 1]
+    assert totals['risky_return_count'].tolist() == [1, 0]
+
+    # The payment of purchase 2 fails after its return was loaded
+    load_sales(warehouse, maintainer, sales([2, 4], [2, 2], [20.0, 5.0]).assign(payment_status='failed'))
+
+    totals = read_table(warehouse, 'agg_customer_returns', 'customer_id')
+    assert totals['risky_return_count'].tolist() == [1, 1]
+    with warehouse.connect() as conn:
+        assert maintainer.validate(conn)['agg_customer_returns'] == 0
+
+
+def test_incremental_aggregates_match_a_recompute_after_reloads(warehouse, maintainer):
+    load_sales(warehouse, maintainer, sales([1, 2, 3], [1, 2, 3], [10.0, 20.0, 30.0]))
+    # Same batch again, then an update moving a purchase to the other customer
+    load_sales(warehouse, maintainer, sales([1, 2, 3], [1, 2, 3], [10.0, 20.0, 30.0]))
+    load_sales(warehouse, maintainer, sales([2, 4], [3, 2], [25.0, 5.0]))
+
+    with warehouse.connect() as conn:
+        assert maintainer.validate(conn) == {table_name: 0 for table_name in AGGREGATE_TABLES}
+    totals = read_table(warehouse, 'agg_customer_sales', 'customer_id')
+    assert totals['purchase_count'].tolist() == [3, 1]
+    assert totals['total_amount'].tolist() == [65.0, 5.0]
+
+
+def test_rebuild_matches_the_incremental_tables(warehouse, maintainer):
+    load_sales(warehouse, maintainer, sales([1, 2, 3], [1, 2, 3], [10.0, 20.0, 30.0]))
+    load_sales(warehouse, maintainer, sales([2, 4], [3, 2], [25.0, 5.0]))
+    incremental = {table_name: read_table(warehouse, table_name, '1, 2') for table_name in AGGREGATE_TABLES}
+
+    with warehouse.begin() as conn:
+        maintainer.rebuild(conn)
+    for table_name in AGGREGATE_TABLES:
+        pd.testing.assert_frame_equal(read_table(warehouse, table_name, '1, 2'), incremental[table_name], check_dtype=False)
+
+
+@pytest.mark.parametrize('chunk_size', [None, 50])
+def test_pipeline_aggregates_match_a_recompute(pipeline_config, chunk_size):
+    config = {**pipeline_config, 'aggregate_mode': 'validate', 'chunk_size': chunk_size}
+    ETLPipeline(config).run_pipeline()
+
+    pipeline = ETLPipeline(config)
+    pipeline.run_pipeline()
+    assert pipeline.aggregate_mismatches == {table_name: 0 for table_name in AGGREGATE_TABLES}
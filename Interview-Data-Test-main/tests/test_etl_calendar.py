@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from scripts.etl_calendar import UNKNOWN_DATE_KEY, DateDimension, build_calendar, date_keys
+from scripts.etl_loading import create_sqlite_schema
+
+
+def day(calendar, date):
+    return calendar.set_index('full_date').loc[pd.Timestamp(date)]
+
+
+@pytest.mark.parametrize('date, fiscal_year, fiscal_quarter, fiscal_month', [
+    ('2024-06-30', 2024, 4, 12),
+    ('2024-07-01', 2025, 1, 1),
+    ('2024-09-30', 2025, 1, 3),
+    ('2024-10-01', 2025, 2, 4),
+    ('2024-12-31', 2025, 2, 6),
+    ('2025-01-01', 2025, 3, 7),
+    ('2025-06-30', 2025, 4, 12)
+])
+def test_fiscal_year_starts_in_july_and_is_named_after_its_last_day(date, fiscal_year, fiscal_quarter, fiscal_month):
+    row = day(build_calendar('2024-06-01', '2025-07-31'), date)
+    assert (row['fiscal_year'], row['fiscal_quarter'], row['fiscal_month']) == (fiscal_year, fiscal_quarter, fiscal_month)
+
+
+def test_fiscal_year_starting_in_january_is_the_calendar_year():
+    calendar = build_calendar('2024-12-31', '2025-01-01', fiscal_year_start_month=1)
+    assert calendar['fiscal_year'].tolist() == [2024, 2025]
+    assert calendar['fiscal_month'].tolist() == [12, 1]
+    assert calendar['fiscal_quarter'].tolist() == [4, 1]
+
+
+def test_fiscal_year_starting_in_april():
+    calendar = build_calendar('2025-03-31', '2025-04-01', fiscal_year_start_month=4)
+    assert calendar['fiscal_year'].tolist() == [2025, 2026]
+    assert calendar['fiscal_month'].tolist() == [12, 1]
+
+
+def test_calendar_has_one_row_per_day_including_both_ends():
+    calendar = build_calendar(pd.Timestamp('2024-02-27 15:30'), '2024-03-02')
+
+    assert calendar['date_key'].tolist() == [20240227, 20240228, 20240229, 20240301, 20240302]
+    leap_day = day(calendar, '2024-02-29')
+    assert (leap_day['day_of_year'], leap_day['day_name'], leap_day['is_weekend']) == (60, 'Thursday', 0)
+    assert day(calendar, '2024-03-02')['is_weekend'] == 1
+
+
+def test_missing_dates_get_the_unknown_key():
+    assert date_keys(pd.Series(['2024-07-01', None, 'not a date'])).tolist() == [20240701, UNKNOWN_DATE_KEY, UNKNOWN_DATE_KEY]
+
+
+@pytest.fixture
+def dimension(warehouse):
+    with warehouse.begin() as conn:
+        create_sqlite_schema(conn)
+    return DateDimension()
+
+
+def extend(dimension, warehouse, *dates):
+    """Extend the calendar for a batch of dates and load the new days, as the pipeline does."""
+    calendar = dimension.extend(pd.Series(pd.to_datetime(list(dates))), warehouse)
+    with warehouse.begin() as conn:
+        calendar.to_sql('dim_date', conn, if_exists='append', index=False)
+    return calendar['date_key'].tolist()
+
+
+def test_first_batch_generates_the_span_of_its_dates(dimension, warehouse):
+    assert extend(dimension, warehouse, '2024-06-30', None, '2024-07-02') == [20240630, 20240701, 20240702]
+
+
+def test_dates_inside_the_span_add_no_days(dimension, warehouse):
+    extend(dimension, warehouse, '2024-06-28', '2024-07-02')
+    assert extend(dimension, warehouse, '2024-06-30', '2024-07-01') == []
+
+
+def test_dates_outside_the_span_add_only_the_missing_days_on_each_side(dimension, warehouse):
+    extend(dimension, warehouse, '2024-06-30', '2024-07-01')
+    assert extend(dimension, warehouse, '2024-06-28', '2024-07-03') == [20240628, 20240629, 20240702, 20240703]
+
+
+def test_span_already_in_the_warehouse_is_extended_by_a_later_run(dimension, warehouse):
+    extend(dimension, warehouse, '2024-06-30', '2024-07-01')
+
+    later_run = DateDimension()
+    assert extend(later_run, warehouse, '2024-07-01', '2024-07-02') == [20240702]
+    assert later_run.span == (pd.Timestamp('2024-06-30'), pd.Timestamp('2024-07-02'))
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_template import ETLPipeline
+
+WAREHOUSE_TABLES = ['dim_clients', 'dim_customers', 'dim_products', 'fact_sales', 'fact_returns']
+
+
+class FailingPipeline(ETLPipeline):
+    """Pipeline whose n-th load of a table raises, as a crash in the middle of a run would."""
+
+    def __init__(self, config, fail_on, fail_after=1):
+        super().__init__(config)
+        self.fail_on = fail_on
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def load_table(self, table_name, df):
+        if table_name == self.fail_on:
+            self.calls += 1
+            if self.calls == self.fail_after:
+                raise RuntimeError(f"injected failure loading {table_name}")
+        return super().load_table(table_name, df)
+
+
+def read_warehouse(url):
+    engine = sqlalchemy.create_engine(url)
+    try:
+        return {
+            table_name: pd.read_sql(f"SELECT * FROM {table_name} ORDER BY 1", engine)
+            for table_name in WAREHOUSE_TABLES
+        }
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def expected(pipeline_config, tmp_path):
+    """Warehouse content of an uninterrupted run into a separate file."""
+    config = {
+        **pipeline_config,
+        'target_url': f"sqlite:///{tmp_path / 'expected.db'}",
+        'key_index_path': str(tmp_path / 'expected_keys.json')
+    }
+    ETLPipeline(config).run_pipeline()
+    return read_warehouse(config['target_url'])
+
+
+def assert_same_warehouse(url, expected):
+    for table_name, df in read_warehouse(url).items():
+        pd.testing.assert_frame_equal(df, expected[table_name])
+
+
+@pytest.mark.parametrize('load_mode', ['upsert', 'append'])
+def test_resumed_batch_run_skips_the_loaded_tables(pipeline_config, expected, load_mode):
+    config = {**pipeline_config, 'checkpoint': True, 'load_mode': load_mode}
+    failed = FailingPipeline(config, fail_on='fact_sales')
+    with pytest.raises(RuntimeError):
+        failed.run_pipeline()
+    assert failed.checkpoint.is_done('load:dim_customers')
+
+    resumed = ETLPipeline({**config, 'resume_run_id': failed.checkpoint.run_id})
+    resumed.run_pipeline()
+
+    assert set(resumed.load_counts) == {'fact_sales', 'fact_returns'}
+    assert_same_warehouse(config['target_url'], expected)
+
+
+def test_resumed_streaming_run_reads_after_the_last_loaded_key(pipeline_config, expected):
+    config = {**pipeline_config, 'checkpoint': True, 'chunk_size': 50}
+    failed = FailingPipeline(config, fail_on='fact_sales', fail_after=3)
+    with pytest.raises(RuntimeError):
+        failed.run_pipeline()
+    assert 'purchases' in failed.checkpoint.get_state('streams', {})
+
+    resumed = ETLPipeline({**config, 'resume_run_id': failed.checkpoint.run_id})
+    resumed.run_pipeline()
+
+    assert resumed.load_counts['fact_sales']['inserted'] < len(expected['fact_sales'])
+    assert_same_warehouse(config['target_url'], expected)
+
+
+def test_resume_rejects_changed_settings(pipeline_config):
+    config = {**pipeline_config, 'checkpoint': True}
+    failed = FailingPipeline(config, fail_on='fact_sales')
+    with pytest.raises(RuntimeError):
+        failed.run_pipeline()
+
+    with pytest.raises(ValueError):
+        ETLPipeline({**config, 'resume_run_id': failed.checkpoint.run_id, 'load_mode': 'append'}).run_pipeline()
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+from scripts.etl_dates import DATE_FORMATS, INVALID, MISSING, UNRECOGNIZED, DateNormalizer
+
+
+@pytest.mark.parametrize('raw, expected, date_format', [
+    ('2024-03-15', '2024-03-15', '%Y-%m-%d'),
+    ('2024/03/15', '2024-03-15', '%Y/%m/%d'),
+    ('2024.03.15', '2024-03-15', '%Y.%m.%d'),
+    ('15/03/2024', '2024-03-15', '%d/%m/%Y'),
+    ('03-15-2024', '2024-03-15', '%m-%d-%Y'),
+    ('2024-03-15 14:30:05', '2024-03-15 14:30:05', '%Y-%m-%d %H:%M:%S'),
+    ('2024-03-15 02:30 PM', '2024-03-15 14:30:00', '%Y-%m-%d %I:%M %p'),
+    ('15/03/2024 14:30', '2024-03-15 14:30:00', '%d/%m/%Y %H:%M'),
+    ('03-15-2024 14:30', '2024-03-15 14:30:00', '%m-%d-%Y %H:%M'),
+    ('2024-03-15T14:30:05.250', '2024-03-15 14:30:05.250', 'ISO8601')
+])
+def test_each_layout_is_parsed_with_its_format(raw, expected, date_format):
+    normalizer = DateNormalizer()
+    assert normalizer.parse(pd.Series([raw])).tolist() == [pd.Timestamp(expected)]
+    assert normalizer.formats[raw] == date_format
+
+
+def test_every_format_is_covered():
+    assert {date_format for date_format, _ in DATE_FORMATS} == {
+        '%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%d/%m/%Y', '%m-%d-%Y', '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%d %I:%M %p', '%d/%m/%Y %H:%M', '%m-%d-%Y %H:%M', 'ISO8601'
+    }
+
+
+def test_ambiguous_year_last_dates_follow_the_separator():
+    parsed = DateNormalizer().parse(pd.Series(['03/04/2024', '03-04-2024']))
+    # '/' is day-first, '-' is month-first
+    assert parsed.tolist() == [pd.Timestamp('2024-04-03'), pd.Timestamp('2024-03-04')]
+
+
+def test_unparseable_values_become_nat():
+    normalizer = DateNormalizer()
+    parsed = normalizer.parse(pd.Series(['31/02/2022', '13-25-2024', 'not a date', '15.03.2024', None, '']))
+
+    assert parsed.isna().all()
+    assert [normalizer.formats[raw] for raw in ['31/02/2022', '13-25-2024']] == [INVALID, INVALID]
+    assert [normalizer.formats[raw] for raw in ['not a date', '15.03.2024', '']] == [UNRECOGNIZED] * 3
+
+
+def test_surrounding_spaces_are_ignored():
+    assert DateNormalizer().parse(pd.Series([' 2024-03-15 '])).tolist() == [pd.Timestamp('2024-03-15')]
+
+
+def test_datetime_columns_are_returned_as_they_are():
+    values = pd.Series(pd.to_datetime(['2024-03-15', None]))
+    assert DateNormalizer().parse(values) is values
+
+
+def test_format_counts_add_up_per_column_across_calls():
+    normalizer = DateNormalizer()
+    normalizer.parse(pd.Series(['2024-03-15', '15/03/2024', None]), column='purchase_date')
+    normalizer.parse(pd.Series(['2024-03-16', '31/02/2022', 'soon']), column='purchase_date')
+    normalizer.parse(pd.Series(['2024-03-15']), column='return_date')
+    normalizer.parse(pd.Series(['2024-03-15']))
+
+    assert normalizer.format_counts == {
+        'purchase_date': {'%Y-%m-%d': 2, '%d/%m/%Y': 1, MISSING: 1, INVALID: 1, UNRECOGNIZED: 1},
+        'return_date': {'%Y-%m-%d': 1}
+    }
+
+
+def test_values_seen_before_are_read_from_the_cache():
+    normalizer = DateNormalizer()
+    normalizer.parse(pd.Series(['2024-03-15', '15/03/2024']))
+    # A cached value is not parsed again
+    normalizer.parsed['2024-03-15'] = pd.Timestamp('2000-01-01')
+
+    parsed = normalizer.parse(pd.Series(['2024-03-15', '15/03/2024', '2024-03-16']))
+
+    assert parsed.tolist() == [pd.Timestamp('2000-01-01'), pd.Timestamp('2024-03-15'), pd.Timestamp('2024-03-16')]
+    assert len(normalizer.parsed) == 3
+
+
+def test_cache_is_cleared_when_it_would_outgrow_its_size():
+    normalizer = DateNormalizer(max_cache_size=3)
+    normalizer.parse(pd.Series(['2024-03-15', '2024-03-16']))
+    normalizer.parse(pd.Series(['2024-03-17', '2024-03-18']))
+
+    assert set(normalizer.parsed) == {'2024-03-17', '2024-03-18'}
+    assert set(normalizer.formats) == {'2024-03-17', '2024-03-18'}
@@ -0,0 +1,140 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_cleaning import get_cleaning_plan
+from scripts.etl_extraction import EXTRACT_COLUMNS, build_select_list, even_bounds, key_ranges, partition_count
+from scripts.etl_template import ETLPipeline
+
+DIRTY_PURCHASES = pd.DataFrame({
+    'purchase_id': [1, 2, 3, 4, 5],
+    'client_id': [1, 1, 2, 2, 3],
+    'customer_id': [10, 11, 12, 13, 14],
+    'product_id': ['5', 'Laptop', '7', None, '9'],
+    'purchase_date': ['2024-01-05', '05/01/2024', '01-05-2024', None, 'not a date'],
+    'quantity': ['3', '-2', 'abc', '12x', None],
+    'unit_price': [9.5, -4.25, 'n/a', '7.5', None],
+    'total_amount': [28.5, '-8.5', 'oops', 15, None],
+    'payment_method': [' Credit Card ', 'PAYPAL', 'bank transfer', None, 'Cash on Delivery'],
+    'payment_status': ['Paid', ' pending ', 'FAILED', 'Partially Paid', None],
+    'last_update': '2024-02-01'
+})
+
+
+@pytest.fixture
+def dirty_source(warehouse):
+    DIRTY_PURCHASES.astype(object).to_sql('purchases', warehouse, index=False)
+    return warehouse
+
+
+def extract_and_clean(engine, pushdown):
+    select_list, pushed_down = build_select_list('purchases', engine.dialect.name, pushdown=pushdown)
+    df = pd.read_sql(sqlalchemy.text(f"SELECT {select_list} FROM purchases ORDER BY purchase_id"), engine)
+    return get_cleaning_plan('purchases').apply(df, pushed_down=pushed_down)
+
+
+def test_projection_reads_the_extract_columns():
+    select_list, _ = build_select_list('purchases', 'sqlite', pushdown=False)
+    assert select_list.split(', ') == list(EXTRACT_COLUMNS['purchases'])
+
+
+def test_sqlite_only_pushes_text_rules_down():
+    _, pushed_down = build_select_list('purchases', 'sqlite')
+    assert pushed_down == {'payment_method', 'payment_status'}
+
+
+def test_pushdown_cleans_like_pandas_on_sqlite(dirty_source):
+    pushed = extract_and_clean(dirty_source, pushdown=True)
+    in_pandas = extract_and_clean(dirty_source, pushdown=False)
+
+    pd.testing.assert_frame_equal(pushed, in_pandas)
+    # Text that is not a number becomes missing, then the rule's fill, not its digits
+    assert pushed['quantity'].tolist() == [3, 2, 0, 0, 0]
+    assert pushed['unit_price'].tolist() == [9.5, 4.25, 0, 7.5, 0]
+
+
+def ranges_holding(key, ranges):
+    return [key_range for key_range in ranges if (key_range[0] is None or key >= key_range[0]) and (key_range[1] is None or key < key_range[1])]
+
+
+def assert_every_key_in_one_range(keys, ranges):
+    for key in keys:
+        assert len(ranges_holding(key, ranges)) == 1, f"key {key} is in {ranges_holding(key, ranges)}"
+
+
+@pytest.mark.parametrize('rows, expected', [(0, 1), (1, 1), (100, 1), (101, 2), (250, 3), (10_000, 8)])
+def test_partition_count_follows_the_rows_up_to_the_maximum(rows, expected):
+    assert partition_count(rows, partition_rows=100, max_partitions=8) == expected
+
+
+def test_key_ranges_are_open_at_both_ends_and_adjacent():
+    ranges = key_ranges([1, 26, 51, 76])
+    assert ranges == [(None, 26), (26, 51), (51, 76), (76, None)]
+    assert key_ranges([1]) == [(None, None)]
+
+
+@pytest.mark.parametrize('low, high', [(1, 200), (7, 8), (1, 3), (-50, 1_000_003)])
+@pytest.mark.parametrize('count', [2, 3, 7, 8])
+def test_even_bounds_ranges_cover_every_key_once(low, high, count):
+    bounds = even_bounds(low, high, count)
+
+    assert bounds[0] == low
+    assert len(bounds) == min(count, high - low + 1)
+    assert bounds == sorted(set(bounds))
+    ranges = key_ranges(bounds)
+    # The bounds and the keys either side of them, plus keys outside [low, high]
+    edges = {bound + offset for bound in bounds for offset in (-1, 0, 1)} | {low, high, low - 10, high + 10}
+    assert_every_key_in_one_range(sorted(edges), ranges)
+
+
+SPARSE_KEYS = [1, 2, 3, 50, 51, 1_000, 1_001, 1_002, 99_999, 100_000]
+
+
+def test_ranges_over_sparse_keys_cover_every_key_once():
+    for count in range(2, len(SPARSE_KEYS) + 1):
+        ranges = key_ranges(even_bounds(SPARSE_KEYS[0], SPARSE_KEYS[-1], count))
+        assert_every_key_in_one_range(SPARSE_KEYS, ranges)
+
+
+def purchase_ids(source):
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    try:
+        return pd.read_sql("SELECT purchase_id FROM purchases ORDER BY purchase_id", engine)['purchase_id'].tolist()
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def sparse_source(source):
+    """Source whose purchase ids are the squares of the generated ones, leaving growing gaps."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("UPDATE purchases SET purchase_id = -purchase_id"))
+        conn.execute(sqlalchemy.text("UPDATE purchases SET purchase_id = purchase_id * purchase_id"))
+    engine.dispose()
+    return purchase_ids(source)
+
+
+@pytest.mark.parametrize('partition_method', ['minmax', 'ntile'])
+@pytest.mark.parametrize('sparse', [False, True])
+def test_key_range_reads_return_every_row_once(pipeline_config, source, partition_method, sparse, request):
+    keys = request.getfixturevalue('sparse_source') if sparse else purchase_ids(source)
+    pipeline = ETLPipeline({**pipeline_config, 'partition_method': partition_method, 'partition_rows': 30, 'max_partitions': 8})
+    pipeline.connect_to_source_database()
+
+    ranges = pipeline.plan_key_ranges('purchases')
+    df = pipeline.read_key_ranges('purchases', ranges)
+
+    assert len(ranges) == partition_count(len(keys), 30, 8)
+    assert_every_key_in_one_range(keys, ranges)
+    assert df['purchase_id'].tolist() == keys
+
+
+def test_ntile_ranges_hold_the_same_number_of_sparse_keys(pipeline_config, sparse_source):
+    pipeline = ETLPipeline({**pipeline_config, 'partition_method': 'ntile', 'partition_rows': 30, 'max_partitions': 8})
+    pipeline.connect_to_source_database()
+
+    sizes = [len([key for key in sparse_source if ranges_holding(key, [key_range])]) for key_range in pipeline.plan_key_ranges('purchases')]
+
+    assert sum(sizes) == len(sparse_source)
+    assert max(sizes) - min(sizes) <= 1
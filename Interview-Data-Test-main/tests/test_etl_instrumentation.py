@@ -0,0 +1,73 @@
+import tracemalloc
+
+import pytest
+
+from scripts.etl_instrumentation import StageInstrumentation
+
+MB = 2**20
+
+
+@pytest.fixture
+def instrumentation():
+    instrumentation = StageInstrumentation(trace_memory=True)
+    yield instrumentation
+    instrumentation.stop_tracing()
+
+
+def allocate(mb):
+    return bytearray(mb * MB)
+
+
+def test_stage_after_a_larger_one_reports_its_own_peak(instrumentation):
+    with instrumentation.stage('large'):
+        freed = allocate(40)
+        del freed
+    with instrumentation.stage('small'):
+        kept = allocate(8)
+
+    assert instrumentation.stages['large']['traced_peak_mb'] == pytest.approx(40, abs=1)
+    assert instrumentation.stages['large']['traced_net_mb'] == pytest.approx(0, abs=1)
+    assert instrumentation.stages['small']['traced_peak_mb'] == pytest.approx(8, abs=1)
+    assert instrumentation.stages['small']['traced_net_mb'] == pytest.approx(8, abs=1)
+    del kept
+
+
+def test_nested_stages_each_get_their_peak(instrumentation):
+    with instrumentation.stage('outer'):
+        with instrumentation.stage('inner'):
+            freed = allocate(30)
+            del freed
+        kept = allocate(10)
+
+    assert instrumentation.stages['inner']['traced_peak_mb'] == pytest.approx(30, abs=1)
+    assert instrumentation.stages['outer']['traced_peak_mb'] == pytest.approx(30, abs=1)
+    assert instrumentation.stages['outer']['traced_net_mb'] == pytest.approx(10, abs=1)
+    del kept
+
+
+def test_repeated_calls_keep_the_highest_peak_and_sum_the_growth(instrumentation):
+    chunks = []
+    for mb in [5, 20, 5]:
+        with instrumentation.stage('chunk'):
+            chunks.append(allocate(mb))
+
+    stats = instrumentation.stages['chunk']
+    assert stats['calls'] == 3
+    assert stats['traced_peak_mb'] == pytest.approx(20, abs=1)
+    assert stats['traced_net_mb'] == pytest.approx(30, abs=1)
+
+
+def test_tracing_is_off_by_default_and_stopped_after_the_report(tmp_path):
+    untraced = StageInstrumentation()
+    with untraced.stage('untraced'):
+        allocate(1)
+    assert not tracemalloc.is_tracing()
+    assert untraced.stages['untraced']['traced_peak_mb'] is None
+    assert untraced.stages['untraced']['rss_growth_mb'] is not None
+
+    instrumentation = StageInstrumentation(trace_memory=True)
+    with instrumentation.stage('traced'):
+        allocate(1)
+    report = instrumentation.write_report(str(tmp_path / 'report.json'), 'succeeded')
+    assert not tracemalloc.is_tracing()
+    assert report['stages']['traced']['traced_peak_mb'] > 0
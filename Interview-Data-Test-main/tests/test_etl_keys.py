@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_keys import UNKNOWN_KEY, DimensionKeyService
+
+
+@pytest.fixture
+def index_path(warehouse, tmp_path):
+    with warehouse.begin() as conn:
+        conn.execute(sqlalchemy.text(
+            "CREATE TABLE dim_customers (customer_key INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL)"
+        ))
+        conn.execute(sqlalchemy.text("INSERT INTO dim_customers VALUES (:unknown, :unknown)"), {'unknown': UNKNOWN_KEY})
+    return str(tmp_path / 'key_index.json')
+
+
+def ids(*values):
+    return pd.Series(values, dtype='int64')
+
+
+def load(warehouse, natural_ids, keys):
+    """Commit dimension rows the way a dimension load does, independently of the index file."""
+    with warehouse.begin() as conn:
+        conn.execute(
+            sqlalchemy.text("INSERT INTO dim_customers (customer_key, customer_id) VALUES (:key, :natural_id)"),
+            [{'key': int(key), 'natural_id': int(natural_id)} for natural_id, key in zip(natural_ids, keys)]
+        )
+
+
+def test_keys_continue_across_runs(warehouse, index_path):
+    service = DimensionKeyService(index_path)
+    keys = service.assign('dim_customers', ids(10, 20, 30), warehouse)
+    load(warehouse, [10, 20, 30], keys)
+    service.save()
+
+    service = DimensionKeyService(index_path)
+    assert service.assign('dim_customers', ids(20, 40), warehouse).tolist() == [2, 4]
+
+
+def test_index_is_rebuilt_when_a_failed_run_left_the_warehouse_ahead_of_the_file(warehouse, index_path):
+    service = DimensionKeyService(index_path)
+    load(warehouse, [10, 20, 30], service.assign('dim_customers', ids(10, 20, 30), warehouse))
+    service.save()
+
+    # Run that committed its dimensions, then failed before saving the index
+    service = DimensionKeyService(index_path)
+    load(warehouse, [40], service.assign('dim_customers', ids(40), warehouse))
+    load(warehouse, [10], service.new_versions('dim_customers', ids(10), warehouse))
+
+    service = DimensionKeyService(index_path)
+    keys, orphans = service.lookup('dim_customers', ids(10, 20, 40), warehouse)
+    assert keys.tolist() == [5, 2, 4]
+    assert orphans == 0
+    assert service.assign('dim_customers', ids(50), warehouse).tolist() == [6]
+
+
+def test_index_is_rebuilt_when_the_warehouse_was_recreated(warehouse, index_path):
+    service = DimensionKeyService(index_path)
+    service.assign('dim_customers', ids(10, 20), warehouse)
+    service.save()
+
+    service = DimensionKeyService(index_path)
+    assert service.assign('dim_customers', ids(30), warehouse).tolist() == [1]
@@ -0,0 +1,196 @@
+import threading
+
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_loading import FastExecuteManyWriter, FileStagedWriter, LoadScheduler, MultiRowWriter, TableWriter, UpsertLoader, get_writer, load_foreign_keys
+
+WRITERS = ['default', 'multi', 'fast_executemany', 'file']
+
+
+@pytest.fixture
+def products(warehouse):
+    with warehouse.begin() as conn:
+        conn.execute(sqlalchemy.text(
+            "CREATE TABLE dim_products (product_key INTEGER PRIMARY KEY, product_name TEXT, selling_price REAL)"
+        ))
+    return pd.DataFrame({
+        'product_key': [1, 2, 3],
+        'product_name': ['chair', 'desk', None],
+        'selling_price': [10.5, 99.0, 5.25]
+    })
+
+
+def upsert(warehouse, df, writer, tmp_path):
+    with warehouse.begin() as conn:
+        loader = UpsertLoader(conn, get_writer({'writer': writer, 'bulk_dir': str(tmp_path / 'bulk')}))
+        return loader.load(df, 'dim_products', 'product_key')
+
+
+def read_products(warehouse):
+    return pd.read_sql("SELECT * FROM dim_products ORDER BY product_key", warehouse)
+
+
+@pytest.mark.parametrize('writer', WRITERS)
+def test_upsert_rerun_is_idempotent(warehouse, products, writer, tmp_path):
+    assert upsert(warehouse, products, writer, tmp_path) == {'inserted': 3, 'updated': 0, 'unchanged': 0}
+    loaded = read_products(warehouse)
+
+    assert upsert(warehouse, products, writer, tmp_path) == {'inserted': 0, 'updated': 0, 'unchanged': 3}
+    pd.testing.assert_frame_equal(read_products(warehouse), loaded)
+
+
+@pytest.mark.parametrize('writer', WRITERS)
+def test_upsert_updates_changed_rows_and_inserts_new_ones(warehouse, products, writer, tmp_path):
+    upsert(warehouse, products, writer, tmp_path)
+
+    batch = pd.DataFrame({
+        'product_key': [2, 3, 4],
+        'product_name': ['desk', 'lamp', 'shelf'],
+        'selling_price': [89.0, 5.25, 30.0]
+    })
+    assert upsert(warehouse, batch, writer, tmp_path) == {'inserted': 1, 'updated': 2, 'unchanged': 0}
+
+    loaded = read_products(warehouse)
+    assert loaded['product_name'].tolist() == ['chair', 'desk', 'lamp', 'shelf']
+    assert loaded['selling_price'].tolist() == [10.5, 89.0, 5.25, 30.0]
+
+
+def test_upsert_keeps_the_last_row_of_a_duplicated_key(warehouse, products, tmp_path):
+    batch = pd.concat([products, products.assign(product_name='renamed')], ignore_index=True)
+    assert upsert(warehouse, batch, 'default', tmp_path)['inserted'] == 3
+    assert set(read_products(warehouse)['product_name']) == {'renamed'}
+
+
+def staging_tables(conn):
+    return [table_name for table_name in sqlalchemy.inspect(conn).get_table_names() if table_name.startswith('stg_')]
+
+
+def test_upsert_drops_its_staging_table(warehouse, products, tmp_path):
+    upsert(warehouse, products, 'default', tmp_path)
+    assert staging_tables(warehouse) == []
+
+
+def test_concurrent_loads_of_a_table_stage_into_separate_tables(warehouse, products):
+    with warehouse.begin() as conn:
+        assert UpsertLoader(conn).staging_table_name('dim_products') != UpsertLoader(conn).staging_table_name('dim_products')
+
+
+@pytest.mark.parametrize('writer', WRITERS)
+def test_upsert_drops_its_staging_table_when_the_load_fails(warehouse, products, writer, tmp_path):
+    staged = []
+
+    def failing_merge(staging_table):
+        staged.append(staging_table)
+        raise RuntimeError('injected failure')
+
+    with warehouse.begin() as conn:
+        loader = UpsertLoader(conn, get_writer({'writer': writer, 'bulk_dir': str(tmp_path / 'bulk')}))
+        with pytest.raises(RuntimeError):
+            loader.load(products, 'dim_products', 'product_key', before_merge=failing_merge)
+        assert staged and staging_tables(conn) == []
+
+
+@pytest.mark.parametrize('name, writer_class', [
+    ('default', TableWriter),
+    ('multi', MultiRowWriter),
+    ('fast_executemany', FastExecuteManyWriter),
+    ('file', FileStagedWriter)
+])
+def test_get_writer_builds_the_named_writer(name, writer_class):
+    assert type(get_writer({'writer': name})) is writer_class
+
+
+def test_get_writer_passes_the_writer_options():
+    assert isinstance(get_writer({}), FastExecuteManyWriter)
+    assert get_writer({'writer_batch_size': 500}).batch_size == 500
+
+    writer = get_writer({'writer': 'file', 'bulk_dir': 'staged', 'bulk_server_dir': '/var/opt/mssql/bulk'})
+    assert (writer.staging_dir, writer.server_dir) == ('staged', '/var/opt/mssql/bulk')
+
+
+def test_get_writer_rejects_an_unknown_writer():
+    with pytest.raises(ValueError):
+        get_writer({'writer': 'bcp'})
+
+
+def test_bulk_insert_quotes_the_file_path():
+    statement = FileStagedWriter().bulk_insert_statement('stg_dim_products', "/data/o'brien/stg.csv")
+    assert "FROM '/data/o''brien/stg.csv' WITH" in statement
+
+
+# Tables of one pipeline batch, in an order that breaks the foreign keys
+BATCH = ['fact_returns', 'fact_sales', 'dim_products', 'dim_customers', 'dim_clients', 'dim_date']
+
+
+def recording_loader(delay=0):
+    """Return a load_table callable appending ('start'|'end', table) events, and the events."""
+    events = []
+    lock = threading.Lock()
+
+    def load_table(table_name, df):
+        with lock:
+            events.append(('start', table_name))
+        threading.Event().wait(delay)
+        with lock:
+            events.append(('end', table_name))
+        return table_name
+
+    return load_table, events
+
+
+def assert_references_loaded_first(events, dependencies):
+    for table_name in BATCH:
+        started = events.index(('start', table_name))
+        for reference in dependencies[table_name]:
+            assert events.index(('end', reference)) < started, f"{table_name} started before {reference} was loaded"
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_scheduler_loads_referenced_tables_first(max_workers):
+    dependencies = load_foreign_keys()
+    assert {'dim_customers', 'dim_date'} <= dependencies['fact_sales'] and 'fact_sales' in dependencies['fact_returns']
+    load_table, events = recording_loader(delay=0.01)
+
+    results = LoadScheduler(dependencies, max_workers).run({table_name: None for table_name in BATCH}, load_table)
+
+    assert results == {table_name: table_name for table_name in BATCH}
+    assert_references_loaded_first(events, dependencies)
+
+
+def test_scheduler_runs_independent_tables_at_the_same_time():
+    load_table, events = recording_loader(delay=0.05)
+    LoadScheduler({'fact_sales': {'dim_clients', 'dim_customers'}}, max_workers=4).run(
+        {'dim_clients': None, 'dim_customers': None, 'fact_sales': None}, load_table
+    )
+    assert set(events[:2]) == {('start', 'dim_clients'), ('start', 'dim_customers')}
+
+
+def test_scheduler_ignores_references_outside_the_batch():
+    load_table, events = recording_loader()
+    results = LoadScheduler(load_foreign_keys(), max_workers=2).run({'fact_sales': None}, load_table)
+    assert results == {'fact_sales': 'fact_sales'}
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_scheduler_does_not_start_the_dependents_of_a_failed_table(max_workers):
+    load_table, events = recording_loader()
+
+    def failing_load(table_name, df):
+        if table_name == 'dim_customers':
+            raise RuntimeError('injected failure')
+        return load_table(table_name, df)
+
+    with pytest.raises(RuntimeError):
+        LoadScheduler(load_foreign_keys(), max_workers).run({table_name: None for table_name in BATCH}, failing_load)
+    assert ('start', 'fact_sales') not in events
+    assert ('start', 'fact_returns') not in events
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_scheduler_rejects_circular_foreign_keys(max_workers):
+    load_table, events = recording_loader()
+    with pytest.raises(ValueError):
+        LoadScheduler({'a': {'b'}, 'b': {'a'}}, max_workers).run({'a': None, 'b': None}, load_table)
+    assert events == []
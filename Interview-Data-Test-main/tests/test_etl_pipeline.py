@@ -0,0 +1,96 @@
+import pytest
+import sqlalchemy
+
+from scripts.etl_template import ETLPipeline
+
+WAREHOUSE_TABLES = ['dim_clients', 'dim_customers', 'dim_products', 'dim_date', 'fact_sales', 'fact_returns']
+
+
+def table_counts(url):
+    engine = sqlalchemy.create_engine(url)
+    try:
+        with engine.connect() as conn:
+            return {
+                table_name: conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+                for table_name in WAREHOUSE_TABLES
+            }
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.parametrize('load_mode', ['upsert', 'append'])
+def test_run_creates_a_missing_sqlite_warehouse(pipeline_config, load_mode):
+    ETLPipeline({**pipeline_config, 'load_mode': load_mode}).run_pipeline()
+
+    counts = table_counts(pipeline_config['target_url'])
+    assert all(counts[table_name] > 1 for table_name in WAREHOUSE_TABLES)
+
+
+def test_rerun_on_an_unchanged_source_leaves_the_warehouse_as_it_was(pipeline_config):
+    ETLPipeline(pipeline_config).run_pipeline()
+    counts = table_counts(pipeline_config['target_url'])
+
+    pipeline = ETLPipeline(pipeline_config)
+    pipeline.run_pipeline()
+
+    assert table_counts(pipeline_config['target_url']) == counts
+    assert all(
+        totals['inserted'] == 0 and totals['updated'] == 0
+        for totals in pipeline.load_counts.values()
+    )
+
+
+def test_streaming_drops_a_key_repeated_across_chunks(pipeline_config, source):
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    with engine.begin() as conn:
+        # Rebuild purchases without its primary key, then repeat the last key of the first chunk
+        conn.execute(sqlalchemy.text("CREATE TABLE purchases_copy AS SELECT * FROM purchases"))
+        conn.execute(sqlalchemy.text("DROP TABLE purchases"))
+        conn.execute(sqlalchemy.text("ALTER TABLE purchases_copy RENAME TO purchases"))
+        conn.execute(sqlalchemy.text("INSERT INTO purchases SELECT * FROM purchases WHERE purchase_id = 50"))
+        purchases = conn.execute(sqlalchemy.text("SELECT COUNT(DISTINCT purchase_id) FROM purchases")).scalar()
+    engine.dispose()
+
+    pipeline = ETLPipeline({**pipeline_config, 'chunk_size': 50})
+    pipeline.run_pipeline()
+
+    assert pipeline.load_counts['fact_sales']['unchanged'] == 0
+    assert pipeline.load_counts['fact_sales']['inserted'] <= purchases
+    assert table_counts(pipeline_config['target_url'])['fact_sales'] == pipeline.load_counts['fact_sales']['inserted']
+
+
+def test_incremental_run_reads_rows_added_on_the_day_of_the_mark(pipeline_config, source):
+    config = {**pipeline_config, 'incremental': True}
+    ETLPipeline(config).run_pipeline()
+
+    # A purchase written after the run, on the same day as the saved mark
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    with engine.begin() as conn:
+        purchase_id = conn.execute(sqlalchemy.text("SELECT MAX(purchase_id) + 1 FROM purchases")).scalar()
+        conn.execute(sqlalchemy.text(
+            "INSERT INTO purchases SELECT :purchase_id, client_id, customer_id, product_id, purchase_date, quantity, "
+            "unit_price, total_amount, payment_method, payment_status, shipping_address, shipping_city, shipping_state, "
+            "shipping_zip, shipping_country, shipping_date, delivery_date, notes, "
+            "(SELECT MAX(last_update) FROM purchases) FROM purchases WHERE purchase_id = :copied"
+        ), {'purchase_id': purchase_id, 'copied': copied_purchase(config['target_url'])})
+    engine.dispose()
+
+    pipeline = ETLPipeline(config)
+    pipeline.run_pipeline()
+
+    assert pipeline.load_counts['fact_sales']['inserted'] == 1
+    engine = sqlalchemy.create_engine(config['target_url'])
+    with engine.connect() as conn:
+        loaded = conn.execute(sqlalchemy.text("SELECT COUNT(*) FROM fact_sales WHERE purchase_id = :purchase_id"), {'purchase_id': purchase_id})
+        assert loaded.scalar() == 1
+    engine.dispose()
+
+
+def copied_purchase(url):
+    """Return the id of a purchase the warehouse holds, so a copy of it passes the cleaning rules."""
+    engine = sqlalchemy.create_engine(url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(sqlalchemy.text("SELECT MIN(purchase_id) FROM fact_sales")).scalar()
+    finally:
+        engine.dispose()
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_template import ETLPipeline, ProductResolver
+
+
+@pytest.fixture
+def resolver():
+    return ProductResolver(pd.DataFrame({
+        'product_id': [1, 2, 3, 4],
+        'product_name': ['Oak Chair Deluxe', 'Steel Desk Pro', None, 'Oak Chair Deluxe']
+    }))
+
+
+def resolve(resolver, *values):
+    return [None if pd.isna(product_id) else product_id for product_id in resolver.resolve(pd.Series(values, dtype=object))]
+
+
+def test_ids_resolve_to_themselves(resolver):
+    assert resolve(resolver, 2, '2', ' 3 ', '4.0') == [2, 2, 3, 4]
+
+
+def test_names_resolve_to_their_product(resolver):
+    assert resolve(resolver, 'Steel Desk Pro') == [2]
+
+
+def test_names_match_regardless_of_case_and_surrounding_spaces(resolver):
+    assert resolve(resolver, '  steel DESK pro ', 'STEEL DESK PRO') == [2, 2]
+
+
+def test_a_name_shared_by_several_products_resolves_to_the_last_one(resolver):
+    assert resolve(resolver, 'oak chair deluxe') == [4]
+
+
+def test_misspelled_and_unknown_names_are_unresolved(resolver):
+    assert resolve(resolver, 'Steel Desk Pr0', 'Steel  Desk Pro', 'Glass Lamp', '', None) == [None] * 5
+
+
+def test_unknown_ids_are_kept_for_the_key_lookup(resolver):
+    # The fact load maps ids missing from dim_products to the unknown member
+    assert resolve(resolver, 999, '-1', '2.5') == [999, None, None]
+
+
+def test_unresolved_rows_are_dropped_and_counted(pipeline_config):
+    pipeline = ETLPipeline(pipeline_config)
+    pipeline.product_resolver = ProductResolver(pd.DataFrame({'product_id': [1], 'product_name': ['Oak Chair']}))
+    df = pd.DataFrame({'purchase_id': [1, 2, 3, 4], 'product_id': ['oak chair', 'Oak Chiar', 7, None]})
+
+    df = pipeline.product_id_processing(df, 'purchases')
+
+    assert df['purchase_id'].tolist() == [1, 3]
+    assert df['product_id'].tolist() == [1, 7]
+    assert pipeline.unresolved_products == {'purchases': 1}
+
+
+def test_incremental_runs_resolve_names_from_the_loaded_products(pipeline_config, source):
+    config = {**pipeline_config, 'incremental': True}
+    ETLPipeline(config).run_pipeline()
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    with engine.begin() as conn:
+        purchase_id, product_name = conn.execute(sqlalchemy.text(
+            "SELECT MAX(purchase_id) + 1, (SELECT product_name FROM products ORDER BY product_id LIMIT 1) FROM purchases"
+        )).one()
+        # A new purchase naming its product; the source products table is emptied,
+        # so the name can only be resolved from the warehouse
+        conn.execute(sqlalchemy.text(
+            "INSERT INTO purchases SELECT :purchase_id, client_id, customer_id, :product_name, purchase_date, quantity, "
+            "unit_price, total_amount, payment_method, payment_status, shipping_address, shipping_city, shipping_state, "
+            "shipping_zip, shipping_country, shipping_date, delivery_date, notes, last_update "
+            "FROM purchases WHERE purchase_id = (SELECT MIN(purchase_id) FROM purchases WHERE purchase_id > 0)"
+        ), {'purchase_id': purchase_id, 'product_name': product_name})
+        conn.execute(sqlalchemy.text("DELETE FROM products"))
+    engine.dispose()
+
+    pipeline = ETLPipeline(config)
+    pipeline.run_pipeline()
+
+    assert pipeline.unresolved_products.get('purchases', 0) == 0
+    assert pipeline.load_counts['fact_sales']['inserted'] == 1
@@ -0,0 +1,137 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_quality import DataQualityError, QualityEngine
+from scripts.etl_template import ETLPipeline
+
+RULES = {
+    'purchases': {
+        'purchase_id_duplicated': {'check': 'unique', 'column': 'purchase_id'},
+        'quantity_not_positive': {'check': 'positive', 'column': 'quantity', 'max_rate': 0.5},
+        'total_amount_mismatch': {'check': 'product', 'column': 'total_amount', 'factors': ['quantity', 'unit_price'], 'tolerance': 0.01}
+    }
+}
+
+
+def purchases(rows=10, bad_quantities=0):
+    return pd.DataFrame({
+        'purchase_id': range(rows),
+        'quantity': [0] * bad_quantities + [2] * (rows - bad_quantities),
+        'unit_price': 5.0,
+        'total_amount': [0.0] * bad_quantities + [10.0] * (rows - bad_quantities)
+    })
+
+
+def test_evaluate_counts_the_failing_rows_of_each_rule():
+    df = purchases(bad_quantities=2)
+    df.loc[9, 'purchase_id'] = 0
+    df.loc[8, 'total_amount'] = 10.5
+
+    results = QualityEngine(RULES).evaluate('purchases', df, key='purchase_id')
+
+    assert {name: result['failed'] for name, result in results.items()} == {
+        'purchase_id_duplicated': 1, 'quantity_not_positive': 2, 'total_amount_mismatch': 1
+    }
+    assert results['quantity_not_positive']['sample_keys'] == [0, 1]
+
+
+def test_rule_over_its_threshold_fails_the_run():
+    engine = QualityEngine(RULES, thresholds={'purchases.total_amount_mismatch': 0.1})
+    df = purchases()
+    df.loc[[3, 4], 'total_amount'] = 99.0
+
+    with pytest.raises(DataQualityError, match='purchases.total_amount_mismatch'):
+        engine.enforce({'purchases': engine.evaluate('purchases', df)})
+
+
+def test_rule_at_its_threshold_passes():
+    engine = QualityEngine(RULES, thresholds={'purchases.total_amount_mismatch': 0.2})
+    df = purchases()
+    df.loc[[3, 4], 'total_amount'] = 99.0
+
+    engine.enforce({'purchases': engine.evaluate('purchases', df)})
+
+
+def test_configured_threshold_overrides_the_rule_max_rate():
+    results = {'purchases': QualityEngine(RULES).evaluate('purchases', purchases(bad_quantities=3))}
+
+    QualityEngine(RULES).enforce(results)
+    with pytest.raises(DataQualityError, match='quantity_not_positive'):
+        QualityEngine(RULES, thresholds={'purchases.quantity_not_positive': 0.25}).enforce(results)
+
+
+def test_rules_without_a_threshold_never_fail_the_run():
+    results = {'purchases': QualityEngine(RULES).evaluate('purchases', purchases().assign(total_amount=1.0))}
+    QualityEngine(RULES).enforce(results)
+
+
+def test_thresholds_apply_to_the_totals_of_every_chunk():
+    engine = QualityEngine(RULES, thresholds={'purchases.quantity_not_positive': 0.25})
+    totals = {}
+    engine.merge(totals, {'purchases': engine.evaluate('purchases', purchases(bad_quantities=2))})
+    engine.enforce(totals)
+
+    engine.merge(totals, {'purchases': engine.evaluate('purchases', purchases(bad_quantities=4))})
+    assert totals['purchases']['quantity_not_positive']['checked'] == 20
+    with pytest.raises(DataQualityError):
+        engine.enforce(totals)
+
+
+def test_sampling_checks_only_the_configured_number_of_rows():
+    engine = QualityEngine(RULES, sample_rows=25)
+
+    results = engine.evaluate('purchases', purchases(rows=100, bad_quantities=100))
+
+    assert {result['checked'] for result in results.values()} == {25}
+    assert results['quantity_not_positive']['failed'] == 25
+
+
+def test_sampling_is_repeatable_and_leaves_small_frames_whole():
+    df = purchases(rows=100, bad_quantities=30)
+    first = QualityEngine(RULES, sample_rows=25).evaluate('purchases', df, key='purchase_id')
+    second = QualityEngine(RULES, sample_rows=25).evaluate('purchases', df, key='purchase_id')
+    assert first == second
+
+    small = QualityEngine(RULES, sample_rows=25).evaluate('purchases', purchases(rows=20))
+    assert small['quantity_not_positive']['checked'] == 20
+
+
+def break_purchase_dates(source):
+    """Make a quarter of the source purchases carry an unparseable date."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{source}")
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("UPDATE purchases SET purchase_date = 'not a date' WHERE purchase_id % 4 = 0"))
+    engine.dispose()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 50])
+def test_pipeline_fails_before_loading_when_a_threshold_is_exceeded(pipeline_config, source, chunk_size):
+    break_purchase_dates(source)
+    config = {**pipeline_config, 'chunk_size': chunk_size, 'quality_thresholds': {'purchases.purchase_date_invalid': 0.1}}
+
+    pipeline = ETLPipeline(config)
+    with pytest.raises(DataQualityError, match='purchases.purchase_date_invalid'):
+        pipeline.run_pipeline()
+    assert 'fact_sales' not in pipeline.load_counts
+
+
+def test_pipeline_passes_under_the_threshold(pipeline_config, source):
+    break_purchase_dates(source)
+    config = {**pipeline_config, 'quality_thresholds': {'purchases.purchase_date_invalid': 0.5}}
+
+    pipeline = ETLPipeline(config)
+    pipeline.run_pipeline()
+    assert pipeline.validation_results['purchases']['purchase_date_invalid']['failed'] > 0
+
+
+def test_pipeline_validates_a_sample_of_each_table(pipeline_config):
+    pipeline = ETLPipeline({**pipeline_config, 'quality_sample_rows': 25})
+    pipeline.run_pipeline()
+
+    checked = {
+        dataset: {result['checked'] for result in rules.values()}
+        for dataset, rules in pipeline.validation_results.items()
+    }
+    assert checked['purchases'] == {25}
+    assert checked['clients'] == {10}
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from scripts.etl_keys import DimensionKeyService
+from scripts.etl_scd import BEGINNING_OF_TIME, SCD2Engine
+
+RUN_AT = pd.Timestamp('2025-06-01')
+
+
+@pytest.fixture
+def engine(warehouse, tmp_path):
+    with warehouse.begin() as conn:
+        conn.execute(sqlalchemy.text(
+            "CREATE TABLE dim_customers (customer_key INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, "
+            "row_hash BIGINT, valid_from TIMESTAMP, is_current INTEGER NOT NULL DEFAULT 1)"
+        ))
+    return SCD2Engine(DimensionKeyService(str(tmp_path / 'key_index.json')))
+
+
+def customers(ids, city='lisbon'):
+    return pd.DataFrame({
+        'customer_id': ids,
+        'email': [f"c{i}@example.com" for i in ids],
+        'phone': [f"555-{i:04d}" for i in ids],
+        'city': city,
+        'state': 'lx',
+        'country': 'pt'
+    })
+
+
+def test_first_batch_opens_a_version_per_member(engine, warehouse):
+    result = engine.apply('dim_customers', customers([1, 2, 3]), warehouse, RUN_AT)
+
+    assert result['customer_key'].tolist() == [1, 2, 3]
+    assert (result['valid_from'] == BEGINNING_OF_TIME).all()
+    assert engine.changes['dim_customers'] == {'new': 3, 'changed': 0}
+
+
+def test_batch_mixing_new_and_unchanged_members_keeps_the_unchanged_versions(engine, warehouse):
+    first = engine.apply('dim_customers', customers(list(range(1, 101))), warehouse, RUN_AT)
+
+    # A new id in the batch reindexes the current hashes with a missing value
+    second = engine.apply('dim_customers', customers(list(range(1, 106))), warehouse, RUN_AT)
+
+    assert engine.changes['dim_customers'] == {'new': 105, 'changed': 0}
+    assert second['customer_key'].iloc[:100].tolist() == first['customer_key'].tolist()
+    assert second['customer_key'].iloc[100:].tolist() == [101, 102, 103, 104, 105]
+    assert (second['valid_from'] == BEGINNING_OF_TIME).all()
+
+
+def test_changed_tracked_attribute_opens_a_new_version(engine, warehouse):
+    engine.apply('dim_customers', customers([1, 2, 3]), warehouse, RUN_AT)
+
+    batch = pd.concat([customers([1, 2]), customers([3], city='porto'), customers([4])], ignore_index=True)
+    result = engine.apply('dim_customers', batch, warehouse, RUN_AT)
+
+    assert engine.changes['dim_customers'] == {'new': 4, 'changed': 1}
+    assert result['customer_key'].tolist() == [1, 2, 5, 4]
+    assert result['valid_from'].tolist() == [BEGINNING_OF_TIME, BEGINNING_OF_TIME, RUN_AT, BEGINNING_OF_TIME]
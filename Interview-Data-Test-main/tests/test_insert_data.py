@@ -0,0 +1,43 @@
+import sqlite3
+
+from scripts.Insert_data import insert_chunk
+
+COLUMNS = ['id', 'name']
+QUERY = "INSERT INTO items (id, name) VALUES (?, ?)"
+
+
+def make_connection():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    return conn
+
+
+def test_insert_chunk_inserts_a_clean_batch_at_once():
+    conn = make_connection()
+    rows = [(i, f"item {i}") for i in range(10)]
+
+    assert insert_chunk(conn, conn.cursor(), QUERY, rows, COLUMNS, 'items') == 10
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 10
+
+
+def test_insert_chunk_bisects_a_failing_batch_down_to_the_bad_rows(capsys):
+    conn = make_connection()
+    rows = [(i, f"item {i}") for i in range(10)]
+    rows[3] = (3, None)
+    rows[8] = (2, 'duplicate id')
+
+    assert insert_chunk(conn, conn.cursor(), QUERY, rows, COLUMNS, 'items') == 8
+    ids = [row[0] for row in conn.execute("SELECT id FROM items ORDER BY id")]
+    assert ids == [0, 1, 2, 4, 5, 6, 7, 9]
+    assert capsys.readouterr().out.count('Error inserting into items') == 2
+
+
+def test_insert_chunk_keeps_the_rows_committed_before_a_failure():
+    conn = make_connection()
+    conn.execute("INSERT INTO items VALUES (100, 'existing')")
+    conn.commit()
+
+    rows = [(100, 'clash'), (101, 'new')]
+    assert insert_chunk(conn, conn.cursor(), QUERY, rows, COLUMNS, 'items') == 1
+    assert conn.execute("SELECT name FROM items WHERE id = 100").fetchone()[0] == 'existing'
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2